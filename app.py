@@ -41,6 +41,14 @@ app.register_blueprint(spots_bp)
 app.register_blueprint(sea_spots_bp)
 app.register_blueprint(gallery_bp)
 
+# CLI Commands (flask almanac precompute など)
+from commands import almanac_cli, weather_cli, iss_cli, spots_cli, tide_cli
+app.cli.add_command(almanac_cli)
+app.cli.add_command(weather_cli)
+app.cli.add_command(iss_cli)
+app.cli.add_command(spots_cli)
+app.cli.add_command(tide_cli)
+
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
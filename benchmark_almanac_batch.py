@@ -0,0 +1,97 @@
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from skyfield import almanac
+from skyfield.api import wgs84
+from models.astro_calc import (
+    PREF_COORDS, ts, eph, tz, _find_discrete_sun_month, _find_discrete_moon_month,
+    _compute_month_batch, _observer_vectors, _apparent_itrs, _topocentric_altitude,
+    _solve_crossings, GRID_STEP_DAYS
+)
+
+def _minutes(time_str):
+    if time_str == '-':
+        return None
+    hour, minute = time_str.split(':')
+    return int(hour) * 60 + int(minute)
+
+def check_root_precision(pref="東京(東京都)", year=2026, month=5):
+    """find_discrete が返す時刻と、独自ソルバーの根を秒単位で比較する"""
+    lat, lon = PREF_COORDS[pref]
+    location = wgs84.latlon(lat, lon)
+    dt_start = datetime(year, month, 1, tzinfo=tz)
+    t0 = ts.from_datetime(dt_start)
+    t1 = ts.from_datetime((dt_start + timedelta(days=32)).replace(day=1))
+
+    reference = []
+    for f in (almanac.dark_twilight_day(eph, location), almanac.risings_and_settings(eph, eph['moon'], location)):
+        times, _ = almanac.find_discrete(t0, t1, f)
+        reference.extend(times.tt)
+
+    jd_grid = np.append(np.arange(t0.tt, t1.tt, GRID_STEP_DAYS), t1.tt)
+    obs_xyz, up = _observer_vectors([(lat, lon)])
+    altitudes = {
+        body: _topocentric_altitude(_apparent_itrs(body, jd_grid)[:, None, :], obs_xyz[:, :, None], up[:, :, None])
+        for body in ('sun', 'moon')
+    }
+    _, _, roots, _ = _solve_crossings(jd_grid, altitudes, obs_xyz, up)
+
+    diffs = [np.min(np.abs(roots - jd)) * 86400 for jd in reference]
+    print(f"Root precision ({pref}): {len(reference)} events, max |Δ| = {max(diffs):.2f}s")
+    assert len(reference) == len(roots)
+    assert max(diffs) < 3.0
+
+def benchmark(year=2026, month=5):
+    prefs = list(PREF_COORDS.keys())
+    latlons = [PREF_COORDS[p] for p in prefs]
+
+    print(f"--- Benchmarking almanac for {len(prefs)} locations, {year}/{month} ---")
+
+    # 1. 地点ごとのループ (almanac.find_discrete)
+    start = time.time()
+    loop_sun = [_find_discrete_sun_month(lat, lon, year, month) for lat, lon in latlons]
+    loop_moon = [_find_discrete_moon_month(lat, lon, year, month) for lat, lon in latlons]
+    loop_elapsed = time.time() - start
+    print(f"find_discrete loop:     {loop_elapsed:.3f}s ({loop_elapsed / len(prefs) * 1000:.0f}ms / location-month)")
+
+    # 2. 独自ソルバーを1地点ずつ (get_*_month のキャッシュミス時と同じ経路)
+    start = time.time()
+    for latlon in latlons:
+        _compute_month_batch([latlon], year, month)
+    single_elapsed = time.time() - start
+    print(f"Solver, one location:   {single_elapsed:.3f}s ({single_elapsed / len(prefs) * 1000:.0f}ms / location-month, "
+          f"{loop_elapsed / single_elapsed:.1f}x faster)")
+
+    # 3. 全地点をベクトル化して一括計算
+    start = time.time()
+    batch_sun, batch_moon = _compute_month_batch(latlons, year, month)
+    batch_elapsed = time.time() - start
+    print(f"Solver, all locations:  {batch_elapsed:.3f}s ({loop_elapsed / batch_elapsed:.1f}x faster)")
+
+    # Data Consistency Check
+    # 秒の切り捨てで分が変わる境界があるため、1分以内の差は一致とみなす
+    compared = 0
+    exact = 0
+    max_diff = 0
+    for i, pref in enumerate(prefs):
+        for day in loop_sun[i]:
+            pairs = [(loop_sun[i][day][k], batch_sun[i][day][k]) for k in loop_sun[i][day] if k != '撮影可能時間帯']
+            pairs += [(loop_moon[i][day][k], batch_moon[i][day][k]) for k in ('rise', 'set')]
+            for expected, actual in pairs:
+                compared += 1
+                if expected == actual:
+                    exact += 1
+                    continue
+                e, a = _minutes(expected), _minutes(actual)
+                assert e is not None and a is not None, f"{pref} {month}/{day}: {expected} != {actual}"
+                max_diff = max(max_diff, abs(e - a))
+            assert loop_moon[i][day]['age'] == batch_moon[i][day]['age'], f"{pref} {month}/{day}: age mismatch"
+
+    print(f"{exact}/{compared} events identical, max difference {max_diff} min")
+    assert max_diff <= 1
+
+    check_root_precision()
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    benchmark()
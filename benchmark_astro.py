@@ -1,6 +1,5 @@
 import time
 from models.astro_calc import get_moon_data_month, get_sun_events_month, get_moon_data, get_sun_events
-from datetime import date
 
 def benchmark():
     pref = "東京(東京都)"
@@ -50,4 +49,7 @@ def benchmark():
     print("\nData consistency verified!")
 
 if __name__ == "__main__":
-    benchmark()
+    # almanac_days (moon_data.db) を使うため Flask のアプリケーションコンテキスト内で実行する
+    from app import app
+    with app.app_context():
+        benchmark()
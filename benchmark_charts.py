@@ -0,0 +1,66 @@
+"""
+SVG グラフ (models.charts) の確認。
+合成した天気・太陽の入力で、描画にかかる時間とキャッシュヒット時の時間、SVG の大きさを測り、
+同じ入力は同じハッシュ (ETag) になること、入力が変われば別のハッシュになること、
+出力が整形式の XML であることを確かめます。
+"""
+import time
+import copy
+import xml.etree.ElementTree as ET
+
+from models.charts import get_chart, chart_inputs, chart_key, render_chart, get_stats
+from models.weather import _parse_weather_response
+
+DATE = '2026-10-18'
+ROUNDS = 200
+
+def synthetic_inputs():
+    hours = [f"2026-10-{d}T{h:02d}:00" for d in (18, 19) for h in range(24)]
+    weather = _parse_weather_response({'hourly': {
+        'time': hours, 'cloud_cover': [(i * 17) % 100 for i in range(48)], 'weather_code': [0] * 48,
+    }}, DATE)
+    sun = {'sunset': '17:02', 'astro_dusk': '18:27', 'astro_dawn': '04:24', 'sunrise': '05:49'}
+    next_sun = {'sunset': '17:01', 'astro_dusk': '18:26', 'astro_dawn': '04:25', 'sunrise': '05:50'}
+    return weather, sun, next_sun
+
+def benchmark():
+    weather, sun, next_sun = synthetic_inputs()
+    inputs = chart_inputs(DATE, weather, sun, next_sun)
+
+    # キャッシュなし: 入力の正規化 + ハッシュ + 描画
+    started = time.time()
+    for _ in range(ROUNDS):
+        normalized = chart_inputs(DATE, weather, sun, next_sun)
+        uncached_key = chart_key(normalized)
+        svg = render_chart(normalized)
+    render_time = (time.time() - started) / ROUNDS
+
+    svg, key = get_chart(DATE, weather, sun, next_sun)
+    started = time.time()
+    for _ in range(ROUNDS):
+        cached, cached_key = get_chart(DATE, weather, sun, next_sun)
+    hit_time = (time.time() - started) / ROUNDS
+    assert cached == svg and cached_key == key == uncached_key
+    assert get_stats()['hits'] >= ROUNDS
+
+    # 入力が変われば別のハッシュになる
+    changed = copy.deepcopy(weather)
+    changed['hourly'][20]['starry_index'] += 1
+    assert get_chart(DATE, changed, sun, next_sun)[1] != key
+    assert chart_key(chart_inputs(DATE, weather, None, None)) != key
+
+    # どの組み合わせでも整形式の SVG
+    for args in [(weather, sun, next_sun), (weather, None, None), (None, sun, None), (None, None, None)]:
+        root = ET.fromstring(get_chart(DATE, *args)[0])
+        assert root.tag == '{http://www.w3.org/2000/svg}svg'
+    bars = ET.fromstring(svg).findall('{http://www.w3.org/2000/svg}rect')
+    assert len(bars) == 3 + len(inputs['starry'])  # 背景・薄明・暗い時間帯 + 毎時の棒
+
+    print(f"--- Night chart: {len(inputs['starry'])} hourly bars ---")
+    print(f"SVG size:        {len(svg.encode('utf-8')) / 1024:.1f} KB")
+    print(f"Uncached:        {render_time * 1000:.2f} ms (normalize + hash + render)")
+    print(f"Cache hit:       {hit_time * 1000:.3f} ms (hash of inputs)")
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    benchmark()
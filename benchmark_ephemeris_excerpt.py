@@ -0,0 +1,136 @@
+"""
+天体暦の抜粋 (data/skyfield/de421_excerpt.bsp) の確認。
+一時ディレクトリに抜粋を作り、新しい Python プロセス (ワーカー相当) で元の de421 と抜粋をそれぞれ読み込んで、
+読み込み時間 (ハッシュの確認を含む) と読み込みで増える RSS、全都道府県1ヶ月分の天文計算をしたあとの
+天体暦のメモリマップの大きさ・実際にメモリにあるページ、ワーカー全体の RSS を比べます
+(RSS は使うページだけが読み込まれるためどちらもほぼ同じで、抜粋の効果はファイルの大きさと読み込み時間です)。
+抜粋と元の de421 で太陽・月の視位置と天文暦の計算結果が一致すること、
+抜粋の範囲外の期間では元の de421 を使うことも確かめます。
+"""
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from datetime import date
+
+import numpy as np
+
+RUNS = 3
+
+CHILD = r'''
+import sys, json, time
+from datetime import date
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+def kernel_mapping_mb(path):
+    """天体暦ファイルのメモリマップの (大きさ, そのうち実際にメモリにあるページ) を MB で返す"""
+    size = rss = 0
+    in_kernel = False
+    with open('/proc/self/smaps') as f:
+        for line in f:
+            fields = line.split()
+            if '-' in fields[0] and len(fields) >= 5:
+                in_kernel = len(fields) >= 6 and fields[5].endswith(path.rsplit('/', 1)[-1])
+            elif in_kernel and fields[0] == 'Size:':
+                size += int(fields[1])
+            elif in_kernel and fields[0] == 'Rss:':
+                rss += int(fields[1])
+    return size / 1024, rss / 1024
+
+import models.astro_calc as astro_calc
+astro_calc.EXCERPT_PATH = sys.argv[1]
+astro_calc.get_ts()
+before = rss_mb()
+started = time.perf_counter()
+eph = astro_calc.get_eph()
+load = time.perf_counter() - started
+loaded = rss_mb()
+astro_calc.compute_almanac_batch(list(astro_calc.PREF_COORDS.values()), date(2026, 10, 1), date(2026, 10, 31))
+mapped, resident = kernel_mapping_mb(eph.path)
+print(json.dumps({"load": load, "rss_load": loaded - before, "rss": rss_mb(), "mapped": mapped,
+                  "resident": resident, "excerpt": eph is astro_calc._excerpt}))
+'''
+
+def measure(excerpt_path):
+    results = []
+    for _ in range(RUNS):
+        out = subprocess.run([sys.executable, '-c', CHILD, excerpt_path], capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return {key: sorted(r[key] for r in results)[RUNS // 2] for key in results[0]}
+
+def compare_positions(full, excerpt, ts):
+    """2020〜2040年を6時間おきに、地球から見た太陽・月の視位置の差の最大 (角度: 秒角, 距離: km)"""
+    t = ts.tt_jd(np.arange(ts.utc(2020, 1, 1).tt, ts.utc(2041, 1, 1).tt, 0.25))
+    worst = {}
+    for body in ('sun', 'moon'):
+        a = full['earth'].at(t).observe(full[body]).apparent()
+        b = excerpt['earth'].at(t).observe(excerpt[body]).apparent()
+        worst[body] = (float(np.max(a.separation_from(b).arcseconds())),
+                       float(np.max(np.abs(a.distance().km - b.distance().km))))
+    return len(t), worst
+
+def benchmark():
+    from skyfield.api import load_file
+    import models.astro_calc as astro_calc
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excerpt_path = os.path.join(tmp, astro_calc.EXCERPT_NAME)
+        meta = astro_calc.build_ephemeris_excerpt(path=excerpt_path)
+        assert astro_calc.verify_ephemeris_excerpt(excerpt_path) == meta
+
+        full_size = os.path.getsize(astro_calc.EPHEMERIS_PATH) / 1024 / 1024
+        excerpt_size = os.path.getsize(excerpt_path) / 1024 / 1024
+        print(f"--- Ephemeris excerpt: {meta['years'][0]}-{meta['years'][1]}, targets {meta['targets']} ---")
+        print(f"File size:   de421 {full_size:.1f} MB -> excerpt {excerpt_size:.1f} MB")
+
+        full_run = measure(os.path.join(tmp, 'missing.bsp'))
+        excerpt_run = measure(excerpt_path)
+        assert not full_run['excerpt'] and excerpt_run['excerpt']
+        print(f"--- Fresh worker, load + 47 prefectures x 1 month (median of {RUNS}) ---")
+        for label, run in (('de421', full_run), ('excerpt', excerpt_run)):
+            print(f"{label:8s} load: {run['load'] * 1000:5.1f} ms ({run['rss_load']:+.1f} MB RSS)  "
+                  f"kernel mapped: {run['mapped']:5.1f} MB, resident: {run['resident']:.2f} MB  "
+                  f"worker RSS: {run['rss']:.1f} MB")
+        print(f"Worker RSS difference (excerpt - de421): {excerpt_run['rss'] - full_run['rss']:+.1f} MB "
+              f"(only the pages that are used are resident either way)")
+
+        # 抜粋は元の係数をそのまま切り出したものなので、範囲内では同じ位置になる
+        ts = astro_calc.get_ts()
+        full = load_file(astro_calc.EPHEMERIS_PATH)
+        excerpt = load_file(excerpt_path)
+        samples, worst = compare_positions(full, excerpt, ts)
+        for body, (arcsec, km) in worst.items():
+            print(f"{body:5s} max difference over {samples} samples: {arcsec:.2e} arcsec, {km:.2e} km")
+            assert arcsec < 1e-3 and km < 1e-3
+
+        # 天文暦の計算結果 (日の出入り・薄明・月の出入り・月齢) も一致する
+        astro_calc.EXCERPT_PATH = excerpt_path
+        latlons = list(astro_calc.PREF_COORDS.values())[:5]
+        with_excerpt = astro_calc.compute_almanac_batch(latlons, date(2026, 10, 1), date(2026, 10, 31))
+        assert astro_calc.get_eph() is astro_calc._excerpt is not None
+        excerpt_kernel = astro_calc._excerpt
+        astro_calc._excerpt = None
+        with_full = astro_calc.compute_almanac_batch(latlons, date(2026, 10, 1), date(2026, 10, 31))
+        assert with_excerpt == with_full
+        astro_calc._excerpt = excerpt_kernel
+
+        # 抜粋の範囲外の期間は元の de421 を使う
+        jd_2045 = ts.utc(2045, 1, 1).tt
+        assert astro_calc.get_eph(jd_2045, jd_2045 + 31) is astro_calc._eph
+        assert astro_calc.get_eph(meta['start_jd'], meta['end_jd']) is excerpt_kernel
+        out_of_range = astro_calc.compute_almanac_batch(latlons[:1], date(2045, 1, 1), date(2045, 1, 2))
+        assert out_of_range['moon'][0][date(2045, 1, 1)]['age'] != '-'
+        excerpt_kernel.close()
+        full.close()
+        excerpt.close()
+
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,87 @@
+"""
+最寄り地点検索の比較。
+全地点をハバーサイン公式で1つずつ比べる従来の方法と、models.geo の KD-tree 索引
+(単位球ベクトル) の速度と結果の一致を、実際の観測所・都道府県庁所在地と数千点の合成データで確かめます。
+"""
+import json
+import math
+import time
+
+import numpy as np
+
+from models.geo import PointIndex, get_port_index, get_city_index, haversine_km, REGION_COORDINATES_PATH
+from models.weather import PREFECTURE_COORDS
+
+QUERIES = 2000
+SYNTHETIC_STATIONS = 5000
+
+def reference_haversine(lat1, lon1, lat2, lon2):
+    """従来の routes/tide.py などにあった1点ずつのハバーサイン公式"""
+    R = 6371
+    dLat = math.radians(lat2 - lat1)
+    dLon = math.radians(lon2 - lon1)
+    a = math.sin(dLat/2) * math.sin(dLat/2) + \
+        math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
+        math.sin(dLon/2) * math.sin(dLon/2)
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+
+def reference_nearest(points, lat, lng):
+    """従来の方法: 全地点をループして最小距離の地点を探す"""
+    best, best_dist = None, float('inf')
+    for key, (plat, plng) in points.items():
+        dist = reference_haversine(lat, lng, plat, plng)
+        if dist < best_dist:
+            best, best_dist = key, dist
+    return best, best_dist
+
+def compare(label, points, index, lats, lngs):
+    started = time.time()
+    expected = [reference_nearest(points, lat, lng) for lat, lng in zip(lats, lngs)]
+    ref_time = time.time() - started
+
+    started = time.time()
+    keys, distances = index.nearest_keys(lats, lngs)
+    new_time = time.time() - started
+
+    for lat, lng, (ref_key, ref_dist), key, dist in zip(lats, lngs, expected, keys, distances):
+        # 同じ距離の地点がある場合はどちらでもよいので、選んだ地点までの距離で比べる
+        assert abs(dist - ref_dist) < 1e-6, (dist, ref_dist)
+        assert key == ref_key or abs(reference_haversine(lat, lng, *points[key]) - ref_dist) < 1e-6, (key, ref_key)
+
+    print(f"{label}: {len(points)} points, {len(lats)} queries")
+    print(f"  Pure-Python scan: {ref_time:.3f}s")
+    print(f"  KD-tree (batch):  {new_time:.4f}s ({ref_time / new_time:.0f}x)")
+
+def benchmark():
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(24.0, 45.5, QUERIES)
+    lngs = rng.uniform(123.0, 146.0, QUERIES)
+
+    with open(REGION_COORDINATES_PATH, encoding='utf-8') as f:
+        region_coords = json.load(f)
+    compare("Tide stations",
+            {(int(pc), int(info['hc'])): (info['lat'], info['lng']) for pc, info in region_coords.items()},
+            get_port_index(), lats, lngs)
+
+    compare("Prefecture capitals",
+            {pref: (c['lat'], c['lng']) for pref, c in PREFECTURE_COORDS.items()},
+            get_city_index(), lats, lngs)
+
+    # 数千の観測所に増えた場合
+    s_lats = rng.uniform(24.0, 45.5, SYNTHETIC_STATIONS)
+    s_lngs = rng.uniform(123.0, 146.0, SYNTHETIC_STATIONS)
+    synthetic = {i: (lat, lng) for i, (lat, lng) in enumerate(zip(s_lats, s_lngs))}
+    started = time.time()
+    index = PointIndex(range(SYNTHETIC_STATIONS), s_lats, s_lngs)
+    print(f"Index build ({SYNTHETIC_STATIONS} points): {time.time() - started:.4f}s")
+    compare("Synthetic stations", synthetic, index, lats[:200], lngs[:200])
+
+    # k 近傍: 近い順に並び、距離はハバーサイン公式と一致する
+    distance, idx = index.nearest(lats[:100], lngs[:100], k=5)
+    assert distance.shape == (100, 5) and np.all(np.diff(distance, axis=1) >= 0)
+    assert np.allclose(distance, haversine_km(lats[:100, None], lngs[:100, None], s_lats[idx], s_lngs[idx]))
+
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    benchmark()
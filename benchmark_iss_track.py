@@ -0,0 +1,78 @@
+"""
+/api/iss/track の地上軌跡の比較。
+ポーリングのたびに91点を伝播する従来の方法と、30秒刻みのバッファから切り出す方法の速度を比べ、
+バッファの点がその場で伝播した位置と一致すること、時間が進んだときに足りない点だけを伝播することを確かめます。
+"""
+import os
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+from skyfield.api import wgs84
+
+from models.astro_calc import ts, eph, tz
+from models.satellite_catalog import get_satellite
+from models import iss_track
+
+POLLS = 200
+
+def reference_track(iss_sat):
+    """従来の方法: リクエストごとに今後90分間を1分刻みで伝播する"""
+    now = datetime.now(tz)
+    times = [now + timedelta(minutes=i) for i in range(91)]
+    geocentric = iss_sat.at(ts.from_datetimes(times))
+    subpoints = wgs84.subpoint(geocentric)
+    is_sunlit = geocentric.is_sunlit(eph)
+    return [
+        {'time': times[i].strftime('%H:%M'), 'lat': subpoints.latitude.degrees[i],
+         'lng': subpoints.longitude.degrees[i], 'is_sunlit': bool(is_sunlit[i])}
+        for i in range(len(times))
+    ]
+
+def benchmark():
+    iss_sat, _ = get_satellite()
+    assert iss_sat is not None, "ISS の TLE がありません"
+    print(f"--- ISS ground track: {POLLS} polls ---")
+
+    started = time.time()
+    for _ in range(POLLS):
+        reference_track(iss_sat)
+    ref_time = time.time() - started
+
+    now = time.time()
+    iss_track.get_track_window(now=now)   # バッファを作る
+    started = time.time()
+    for _ in range(POLLS):
+        epoch, start, points = iss_track.get_track_window(now=now)
+    buffer_time = time.time() - started
+
+    # バッファの点はその場で伝播した位置と一致する
+    unix_times = np.array([p['timestamp'] for p in points])
+    lat, lng, sunlit = iss_track._propagate(iss_sat, unix_times)
+    assert np.allclose(lat, [p['lat'] for p in points])
+    assert np.allclose(lng, [p['lng'] for p in points])
+    assert list(sunlit) == [p['is_sunlit'] for p in points]
+    assert len(points) == 90 * 60 // iss_track.TRACK_STEP_SECONDS + 1
+
+    # 10分進めると、足りない20点だけを伝播して継ぎ足す
+    before = iss_track.get_stats()['propagated_points']
+    _, later_start, later = iss_track.get_track_window(now=now + 600)
+    added = iss_track.get_stats()['propagated_points'] - before
+    assert added == 600 // iss_track.TRACK_STEP_SECONDS, added
+    assert later_start == start + 600 and later[0]['timestamp'] == points[20]['timestamp']
+
+    print(f"Per-request propagation: {ref_time / POLLS * 1000:.2f} ms/poll")
+    print(f"Buffered slice:          {buffer_time / POLLS * 1000:.2f} ms/poll ({ref_time / buffer_time:.1f}x)")
+    print(f"Points propagated when advancing 10 min: {added}")
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    # TLE のキャッシュを DB に書き込むため、一時ディレクトリの DB を使い (リポジトリの moon_data.db には書き込まない)、
+    # Flask のアプリケーションコンテキスト内で実行する。TLE を取得できなければ同梱の stations.txt を使う
+    import database
+    with tempfile.TemporaryDirectory() as tmp:
+        database.MOON_DATABASE = os.path.join(tmp, 'moon_data.db')
+        from app import app
+        with app.app_context():
+            benchmark()
@@ -0,0 +1,91 @@
+"""
+ISS 通過の可視判定の比較。
+イベントごとに is_sunlit / dark_twilight_day を呼ぶ従来の方法と、
+配列の Time でまとめて評価する compute_location_passes (可視区間つき) の速度と結果の一致を確かめます。
+"""
+import os
+import time
+import tempfile
+from datetime import timedelta
+
+from skyfield.api import wgs84
+from skyfield import almanac
+
+from models.astro_calc import PREF_COORDS, ts, eph, _get_iss_tle
+from models.iss_passes import compute_location_passes, _build_satellite, _horizon_start, PASS_MIN_ALTITUDE, PASS_HORIZON_DAYS
+
+LOCATIONS = ["札幌(北海道)", "東京(東京都)", "大阪(大阪府)", "那覇(沖縄県)"]
+
+def reference_passes(iss_sat, lat, lon, start, end):
+    """従来の方法: find_events のイベントごとに可視判定する"""
+    location = wgs84.latlon(lat, lon)
+    t, events = iss_sat.find_events(location, ts.from_datetime(start), ts.from_datetime(end),
+                                    altitude_degrees=PASS_MIN_ALTITUDE)
+    passes = []
+    current_pass = None
+    for ti, event in zip(t, events):
+        is_sunlit = iss_sat.at(ti).is_sunlit(eph)
+        obs_phase = almanac.dark_twilight_day(eph, location)(ti).item()
+        is_visible = bool(is_sunlit and obs_phase < 3)
+        if event == 0:
+            current_pass = {'start': ti.utc_datetime(), 'start_visible': is_visible}
+        elif event == 1 and current_pass:
+            alt, az, distance = (iss_sat - location).at(ti).altaz()
+            current_pass['max_alt'] = float(alt.degrees)
+            current_pass['max_visible'] = is_visible
+        elif event == 2 and current_pass:
+            current_pass['end'] = ti.utc_datetime()
+            current_pass['end_visible'] = is_visible
+            passes.append(current_pass)
+            current_pass = None
+    return passes
+
+def benchmark():
+    tle_lines = _get_iss_tle()
+    assert tle_lines, "TLE が取得できません (iss_tle_cache を確認してください)"
+    iss_sat = _build_satellite(tle_lines)
+    start = _horizon_start()
+    end = start + timedelta(days=PASS_HORIZON_DAYS)
+    print(f"--- ISS visibility: {len(LOCATIONS)} locations x {PASS_HORIZON_DAYS} days ---")
+
+    ref_time = new_time = 0.0
+    total = visible = 0
+    for pref in LOCATIONS:
+        lat, lon = PREF_COORDS[pref]
+
+        started = time.time()
+        ref = reference_passes(iss_sat, lat, lon, start, end)
+        ref_time += time.time() - started
+
+        started = time.time()
+        new = compute_location_passes(iss_sat, lat, lon, start, end)
+        new_time += time.time() - started
+
+        assert len(ref) == len(new), (pref, len(ref), len(new))
+        for r, n in zip(ref, new):
+            assert abs((r['start'] - n['start']).total_seconds()) < 1
+            assert abs(r['max_alt'] - n['max_alt']) < 0.01
+            assert (r['start_visible'], r['max_visible'], r['end_visible']) == \
+                   (n['start_visible'], n['max_visible'], n['end_visible'])
+            # 可視区間は通過の内側にあり、イベント時点で見えていれば区間に含まれる
+            if n['visible_start']:
+                assert n['start'] <= n['visible_start'] <= n['visible_end'] <= n['end']
+                visible += 1
+            if r['start_visible'] or r['max_visible'] or r['end_visible']:
+                assert n['visible_start'] is not None
+        total += len(new)
+
+    print(f"Passes: {total} ({visible} visible)")
+    print(f"Per-event loop: {ref_time:.3f}s")
+    print(f"Vectorized:     {new_time:.3f}s ({ref_time / new_time:.1f}x)")
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    # TLE のキャッシュを DB に書き込むため、一時ディレクトリの DB を使い (リポジトリの moon_data.db には書き込まない)、
+    # Flask のアプリケーションコンテキスト内で実行する。TLE を取得できなければ同梱の stations.txt を使う
+    import database
+    with tempfile.TemporaryDirectory() as tmp:
+        database.MOON_DATABASE = os.path.join(tmp, 'moon_data.db')
+        from app import app
+        with app.app_context():
+            benchmark()
@@ -0,0 +1,75 @@
+"""
+天体暦を使わない月齢 (models.moon_phase) の確認。
+正午 JST の月齢・輝面比を Skyfield (almanac.moon_phase / fraction_illuminated) と比べて最大誤差が許容範囲に
+収まることを確かめ、日付の配列をまとめて計算する時間を測ります。
+天体暦の範囲外の年 (2100年) の月でも、天体暦を使わずに月齢が計算できることも確かめます。
+アプリ・データベースには触れません。
+"""
+import time
+
+import numpy as np
+from skyfield import almanac
+
+from models.moon_phase import moon_ages, noon_jd, get_moon_ages_month, SYNODIC_MONTH
+from models.astro_calc import get_ts, get_eph
+
+# 表示は小数1桁なので、その1/10を許容誤差にする
+MAX_AGE_ERROR_DAYS = 0.01
+MAX_ILLUMINATION_ERROR = 0.01
+ROUNDS = 20
+
+def skyfield_ages(dates):
+    """astro_calc と同じ方法 (正午 JST の almanac.moon_phase) で求めた月齢と輝面比"""
+    ts = get_ts()
+    t = ts.ut1_jd(noon_jd(dates))
+    eph = get_eph(t.tt[0], t.tt[-1])
+    ages = almanac.moon_phase(eph, t).degrees / 360.0 * SYNODIC_MONTH
+    return ages, almanac.fraction_illuminated(eph, 'moon', t)
+
+def compare(label, dates):
+    ages, illuminated = moon_ages(dates)
+    ref_ages, ref_illuminated = skyfield_ages(dates)
+    # 新月をまたぐ 29.5 → 0.0 の折り返しは差に含めない
+    age_error = np.abs((ages - ref_ages + SYNODIC_MONTH / 2) % SYNODIC_MONTH - SYNODIC_MONTH / 2)
+    illumination_error = np.abs(illuminated - ref_illuminated)
+    same_label = np.mean([f"{a:.1f}" == f"{b:.1f}" for a, b in zip(ages, ref_ages)])
+    print(f"{label}: {len(dates)} days, max age error {age_error.max():.4f} d, "
+          f"max illumination error {illumination_error.max():.4f}, same 0.1-day label {same_label:.1%}")
+    assert age_error.max() < MAX_AGE_ERROR_DAYS, age_error.max()
+    assert illumination_error.max() < MAX_ILLUMINATION_ERROR, illumination_error.max()
+
+def benchmark():
+    print("--- Analytic moon age vs Skyfield (noon JST) ---")
+    compare("2020-2040 (excerpt)", np.arange(np.datetime64('2020-01-01'), np.datetime64('2041-01-01')))
+    compare("1900-2050 (de421, every 7th day)",
+            np.arange(np.datetime64('1900-01-01'), np.datetime64('2050-12-31'), np.timedelta64(7, 'D')))
+
+    dates = np.arange(np.datetime64('2020-01-01'), np.datetime64('2030-01-01'))
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        moon_ages(dates)
+    batch_time = (time.perf_counter() - started) / ROUNDS
+
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        get_moon_ages_month(2026, 10)
+    month_time = (time.perf_counter() - started) / ROUNDS
+
+    # 天体暦は compare で読み込み済み
+    started = time.perf_counter()
+    skyfield_ages(dates)
+    skyfield_time = time.perf_counter() - started
+
+    print(f"10 years ({len(dates)} days): analytic {batch_time * 1000:.2f} ms "
+          f"({batch_time / len(dates) * 1e6:.2f} us/day), Skyfield {skyfield_time * 1000:.1f} ms")
+    print(f"One calendar month: {month_time * 1e6:.0f} us")
+
+    # 天体暦の範囲外の年でも月齢を計算できる (朔望月の周期で 0〜29.5 日の範囲に収まる)
+    month_2100 = get_moon_ages_month(2100, 1)
+    ages_2100 = [float(day['age']) for day in month_2100.values()]
+    assert len(ages_2100) == 31 and all(0.0 <= age < SYNODIC_MONTH for age in ages_2100)
+    print(f"2100-01 (outside de421): ages {month_2100[1]['age']} .. {month_2100[31]['age']}")
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,82 @@
+"""
+複数衛星の通過予測の比較。
+衛星 × 地点ごとに Skyfield の find_events を呼ぶ compute_location_passes と、
+SatrecArray で全衛星・全地点をまとめて計算する compute_passes の速度と結果の一致を確かめます。
+"""
+import time
+from datetime import timedelta
+
+from models.astro_calc import PREF_COORDS
+from models.iss_passes import (compute_location_passes, compute_passes, _horizon_start,
+                               PASS_SATELLITES, PASS_HORIZON_DAYS)
+from models.satellite_catalog import CatalogSnapshot, BUNDLED_STATIONS_PATH
+
+LOCATIONS = ["札幌(北海道)", "東京(東京都)", "大阪(大阪府)", "那覇(沖縄県)"]
+
+# 1衛星と比べる「衛星を増やした」場合の衛星数 (stations.txt の先頭から)
+MANY_SATELLITES = 10
+
+def benchmark():
+    # 同梱の stations.txt (エポック付近の期間) で比較する
+    with open(BUNDLED_STATIONS_PATH, encoding='utf-8') as f:
+        snapshot = CatalogSnapshot(None, f.read())
+    satellites = {name: snapshot.satellites[name] for name in PASS_SATELLITES}
+    epoch = snapshot.satellites[PASS_SATELLITES[0]].epoch.utc_datetime().astimezone(_horizon_start().tzinfo)
+    start = epoch.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    end = start + timedelta(days=PASS_HORIZON_DAYS)
+
+    locations = list(PREF_COORDS)
+    latlons = [PREF_COORDS[loc] for loc in locations]
+    print(f"--- Satellite passes: {len(satellites)} satellites x {len(locations)} locations x {PASS_HORIZON_DAYS} days ---")
+
+    started = time.time()
+    batch = compute_passes(satellites, latlons, start, end)
+    batch_time = time.time() - started
+
+    ref_time = 0.0
+    total = visible = 0
+    for name, sat in satellites.items():
+        for pref in LOCATIONS:
+            lat, lon = PREF_COORDS[pref]
+            started = time.time()
+            ref = compute_location_passes(sat, lat, lon, start, end)
+            ref_time += time.time() - started
+
+            new = [p for p in batch[name] if p['location'] == locations.index(pref)]
+            assert len(ref) == len(new), (name, pref, len(ref), len(new))
+            for r, n in zip(ref, new):
+                for key in ('start', 'culminate', 'end'):
+                    assert abs((r[key] - n[key]).total_seconds()) < 1, (name, pref, key, r[key], n[key])
+                # 天頂付近の通過は最大高度の変化が急なため 0.1 度まで許す
+                assert abs(r['max_alt'] - n['max_alt']) < 0.1, (name, pref, r['max_alt'], n['max_alt'])
+                assert (r['start_visible'], r['max_visible'], r['end_visible']) == \
+                       (n['start_visible'], n['max_visible'], n['end_visible'])
+                assert (r['visible_start'] is None) == (n['visible_start'] is None)
+                if n['visible_start']:
+                    # 基準側は約4秒刻みのサンプル、こちらは二分探索のため数秒の差は許す
+                    assert abs((r['visible_start'] - n['visible_start']).total_seconds()) < 5
+                    assert abs((r['visible_end'] - n['visible_end']).total_seconds()) < 5
+                    visible += 1
+            total += len(new)
+
+    # 衛星を増やしたときの計算時間 (1衛星との比較)
+    one = {PASS_SATELLITES[0]: satellites[PASS_SATELLITES[0]]}
+    many = dict(list(snapshot.satellites.items())[:MANY_SATELLITES])
+    started = time.time()
+    compute_passes(one, latlons, start, end)
+    one_time = time.time() - started
+    started = time.time()
+    compute_passes(many, latlons, start, end)
+    many_time = time.time() - started
+
+    per_location_ref = ref_time / (len(satellites) * len(LOCATIONS))
+    print(f"Compared passes: {total} ({visible} visible)")
+    print(f"find_events per satellite x location: {per_location_ref:.3f}s "
+          f"(~{per_location_ref * len(satellites) * len(locations):.1f}s for all locations)")
+    print(f"Batched, {len(satellites)} satellites, all locations: {batch_time:.3f}s")
+    print(f"Batched, 1 satellite:   {one_time:.3f}s")
+    print(f"Batched, {len(many)} satellites: {many_time:.3f}s")
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,104 @@
+"""
+キャッシュミス時の single-flight の確認。
+スタブの Open-Meteo (stub_open_meteo.py) に遅延をつけ、複数プロセス × 複数スレッドから
+同じ地点の天気を同時に要求して、上流へのリクエストが1回にまとまることを確かめます。
+先行リクエストを待ちきれなかったときは、自分で取得せずに fallback の値を返すことも確かめます。
+DB は一時ディレクトリのものを使います (リポジトリの moon_data.db には書き込まない)。
+"""
+import os
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+from multiprocessing import Process
+
+PORT = 8766
+os.environ['OPEN_METEO_FORECAST_URL'] = f'http://127.0.0.1:{PORT}/v1/forecast'
+
+PROCESSES = 4
+THREADS_PER_PROCESS = 8
+
+def worker(lat, lng, date_str, barrier_time, db_path):
+    import database
+    database.MOON_DATABASE = db_path
+    from app import app
+    from models.weather import get_weather_by_coords
+
+    results = []
+
+    def request():
+        with app.app_context():
+            results.append(get_weather_by_coords(lat, lng, date_str))
+
+    threads = [threading.Thread(target=request) for _ in range(THREADS_PER_PROCESS)]
+    # 全プロセスがほぼ同時に要求を出すよう、開始時刻を揃える
+    time.sleep(max(0.0, barrier_time - time.time()))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == THREADS_PER_PROCESS and all(r and r['hourly'] for r in results)
+
+def check_timeout_fallback(db_path):
+    """他のワーカーがリースを持ったまま結果を保存しないとき、compute() せずに fallback を返す"""
+    from models import single_flight
+
+    conn = sqlite3.connect(db_path)
+    from database import ensure_schema
+    ensure_schema(conn, 'cache_leases', single_flight.CACHE_LEASES_SCHEMA)
+    conn.execute('INSERT INTO cache_leases (key, owner, expires_at) VALUES (?, ?, ?)',
+                 ('busy', 'other-worker', time.time() + 60))
+    conn.commit()
+
+    computed = []
+    saved_timeout = single_flight.WAIT_TIMEOUT_SECONDS
+    single_flight.WAIT_TIMEOUT_SECONDS = 0.3
+    try:
+        value = single_flight.run(conn, 'busy', lambda: None, lambda: computed.append(1), fallback=lambda: 'stale')
+        assert value == 'stale' and not computed
+        assert single_flight.run(conn, 'busy', lambda: None, lambda: computed.append(1)) is None and not computed
+    finally:
+        single_flight.WAIT_TIMEOUT_SECONDS = saved_timeout
+        conn.close()
+    print(f"Timed-out waiters: fallback served, no extra compute (lease {single_flight.LEASE_SECONDS}s)")
+
+def benchmark():
+    from stub_open_meteo import make_server, StubHandler
+    from datetime import datetime
+
+    server = make_server(PORT, delay=1.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # 毎回キャッシュの無いグリッドセルを使う
+    lat = round(random.uniform(33.0, 36.0), 3)
+    lng = round(random.uniform(132.0, 140.0), 3)
+    date_str = datetime.now().strftime('%Y-%m-%d')
+    print(f"--- Single-flight: {PROCESSES} processes x {THREADS_PER_PROCESS} threads, ({lat}, {lng}) {date_str} ---")
+
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp.name, 'moon_data.db')
+    start = time.time()
+    barrier_time = time.time() + 3.0
+    procs = [Process(target=worker, args=(lat, lng, date_str, barrier_time, db_path)) for _ in range(PROCESSES)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.time() - start
+    server.shutdown()
+
+    total = PROCESSES * THREADS_PER_PROCESS
+    print(f"Concurrent requests: {total}")
+    print(f"Upstream requests:   {StubHandler.request_count}")
+    print(f"Elapsed: {elapsed:.2f}s (upstream delay 1.0s, startup wait 3.0s)")
+
+    assert all(p.exitcode == 0 for p in procs)
+    assert StubHandler.request_count == 1
+
+    check_timeout_fallback(db_path)
+    tmp.cleanup()
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,61 @@
+"""
+起動時間の確認。
+新しい Python プロセスで app を import してから最初の応答を返すまでの時間を、
+天文計算を使わない /privacy と、天体暦を使う / (トップページ) で比べます。
+天体暦・時間スケールは最初の天文計算まで読み込まれない (import 時にネットワークにもファイルにも触れない) ことも確かめます。
+(/ は天文暦キャッシュに無い月を計算するときだけ天体暦を読み込むため、2回目以降はキャッシュから応答します)
+"""
+import sys
+import json
+import subprocess
+
+RUNS = 3
+
+CHILD = r'''
+import sys, json, time
+started = time.perf_counter()
+import app as app_module
+import models.astro_calc as astro_calc
+imported = time.perf_counter() - started
+lazy = astro_calc._eph is None and astro_calc._excerpt is None and astro_calc._ts is None
+client = app_module.app.test_client()
+response = client.get(sys.argv[1])
+first = time.perf_counter() - started
+print(json.dumps({"import": imported, "first": first, "status": response.status_code,
+                  "lazy_at_import": lazy, "eph_loaded": astro_calc._eph is not None or astro_calc._excerpt is not None}))
+'''
+
+def measure(path):
+    results = []
+    for _ in range(RUNS):
+        out = subprocess.run([sys.executable, '-c', CHILD, path], capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+def benchmark():
+    print(f"--- Time to first response in a fresh process (median of {RUNS}) ---")
+    summary = {}
+    for path in ('/privacy', '/'):
+        results = measure(path)
+        assert all(r['status'] == 200 and r['lazy_at_import'] for r in results), results
+        summary[path] = results
+        imported = sorted(r['import'] for r in results)[RUNS // 2]
+        first = sorted(r['first'] for r in results)[RUNS // 2]
+        loaded = sum(r['eph_loaded'] for r in results)
+        print(f"{path:9s} import app: {imported:.2f}s  first response: {first:.2f}s  "
+              f"ephemeris loaded in {loaded}/{RUNS} runs")
+
+    # /privacy は天体暦を読み込まずに応答する。/ は天文暦キャッシュ (almanac_days) に無い月を計算するときだけ読み込む
+    assert not any(r['eph_loaded'] for r in summary['/privacy'])
+
+    from models.astro_calc import get_eph, get_ts, verify_ephemeris
+    import time
+    started = time.perf_counter()
+    assert verify_ephemeris()
+    get_ts()
+    get_eph()
+    print(f"Ephemeris verify + load (lazy, first astro use): {time.perf_counter() - started:.3f}s")
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    benchmark()
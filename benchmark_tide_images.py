@@ -0,0 +1,146 @@
+"""
+タイドグラフ画像のキャッシュ (/tide_image) の確認。
+遅延をつけたスタブの tide736.net に対して、初回 (取得して保存) と2回目以降 (ディスクから配信) の応答時間、
+同時アクセスで上流への取得が1回にまとまること、同じ内容の画像が1ファイルにまとまること、
+上限を超えたときに古い画像から消えること、取得できないときに tide736.net へリダイレクトし、
+失敗の記録の期限内は上流へ取得し直さないことを確かめます。
+"""
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+PORT = 8767
+os.environ['TIDE_IMAGE_URL'] = f'http://127.0.0.1:{PORT}/tide_image.php'
+
+UPSTREAM_DELAY_SECONDS = 0.2
+PORTS = [(1, 1), (1, 2), (1, 3), (1, 4)]
+DATES = ['2026-10-18', '2026-10-19', '2026-10-20', '2026-10-21', '2026-10-22']
+
+class StubHandler(BaseHTTPRequestHandler):
+    """港ごとに決まった内容の PNG を返す (同じ港の別の日は同じ内容)。hc=5 は常に 503"""
+    request_count = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with StubHandler.lock:
+            StubHandler.request_count += 1
+        time.sleep(UPSTREAM_DELAY_SECONDS)
+        query = parse_qs(urlsplit(self.path).query)
+        if query['hc'][0] == '5':
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = b'\x89PNG\r\n\x1a\n' + f"{query['pc'][0]}-{query['hc'][0]}".encode() * 1000
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def benchmark():
+    server = ThreadingHTTPServer(('127.0.0.1', PORT), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        import database
+        import models.tide_images as tide_images
+        database.MOON_DATABASE = os.path.join(tmp, 'moon_data.db')
+        tide_images.TIDE_IMAGE_DIR = os.path.join(tmp, 'tide_images')
+        from app import app
+        client = app.test_client()
+        urls = [f'/tide_image/{pc}/{hc}/{date}' for pc, hc in PORTS for date in DATES]
+        print(f"--- Tide image proxy: {len(urls)} images, upstream delay {UPSTREAM_DELAY_SECONDS}s ---")
+
+        started = time.time()
+        for url in urls:
+            response = client.get(url)
+            assert response.status_code == 200 and response.mimetype == 'image/png'
+        cold = (time.time() - started) / len(urls)
+        assert StubHandler.request_count == len(urls)
+
+        started = time.time()
+        for _ in range(10):
+            for url in urls:
+                response = client.get(url)
+                assert response.status_code == 200
+        warm = (time.time() - started) / (10 * len(urls))
+        assert StubHandler.request_count == len(urls)
+        assert 'immutable' in response.headers['Cache-Control'] and response.headers['ETag']
+        assert client.get(urls[-1], headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+        # 同じ港の別の日付は同じ内容なので、ファイルは港の数だけ
+        blobs = [name for _, _, names in os.walk(tide_images.TIDE_IMAGE_DIR) for name in names]
+        assert len(blobs) == len(PORTS), blobs
+
+        # 同じ画像への同時アクセスは上流への取得1回にまとまる
+        before = StubHandler.request_count
+        statuses = []
+
+        def fetch():
+            statuses.append(client.get('/tide_image/1/6/2026-10-18').status_code)
+
+        threads = [threading.Thread(target=fetch) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert statuses == [200] * 8 and StubHandler.request_count - before == 1
+
+        # 取得できなければ tide736.net の画像へリダイレクトし、キャッシュしない
+        before = StubHandler.request_count
+        started = time.time()
+        response = client.get('/tide_image/1/5/2026-10-18')
+        failed_first = time.time() - started
+        assert response.status_code == 302 and response.headers['Cache-Control'] == 'no-store'
+        upstream_failed = StubHandler.request_count - before
+
+        # 失敗の記録の期限内は上流へ取得し直さず、すぐにリダイレクトする
+        before = StubHandler.request_count
+        started = time.time()
+        for _ in range(10):
+            response = client.get('/tide_image/1/5/2026-10-18')
+            assert response.status_code == 302 and response.headers['Cache-Control'] == 'no-store'
+        failed_cached = (time.time() - started) / 10
+        assert StubHandler.request_count == before
+
+        # 期限が切れたら取得し直す
+        conn = sqlite3.connect(database.MOON_DATABASE)
+        conn.execute('UPDATE tide_image_failures SET expires_at = 0')
+        conn.commit()
+        conn.close()
+        assert client.get('/tide_image/1/5/2026-10-18').status_code == 302
+        assert StubHandler.request_count - before == upstream_failed
+        assert client.get('/tide_image/1/9999/2026-10-18').status_code == 404
+        assert client.get('/tide_image/1/1/2026-13-01').status_code == 404
+
+        # 上限を超えたら last_access の古いものから消える (最初の港を使い直してから溢れさせる)
+        conn = sqlite3.connect(database.MOON_DATABASE)
+        size = os.path.getsize(tide_images.blob_path(tide_images.get_image(conn, 1, 1, DATES[0])['sha256']))
+        conn.execute('UPDATE tide_images SET last_access = last_access + 100 WHERE pc = 1 AND hc = 1')
+        conn.commit()
+        evicted = tide_images.evict(conn, max_bytes=size * 3)
+        remaining = {row[0] for row in conn.execute('SELECT hc FROM tide_images')}
+        assert tide_images.cache_size(conn) <= size * 3 * tide_images.EVICTION_TARGET_RATIO
+        assert 1 in remaining and len(remaining) == 2, remaining
+        blobs = [name for _, _, names in os.walk(tide_images.TIDE_IMAGE_DIR) for name in names]
+        assert len(blobs) == 2
+        conn.close()
+
+    server.shutdown()
+    print(f"Cold (fetch + store): {cold * 1000:.1f} ms/image")
+    print(f"Warm (disk cache):    {warm * 1000:.2f} ms/image")
+    print(f"Upstream requests:    {StubHandler.request_count} ({len(urls)} images, {len(PORTS)} files on disk)")
+    print(f"Evicted {evicted} entries to stay under the size limit")
+    print(f"Upstream failure:     {failed_first * 1000:.1f} ms ({upstream_failed} upstream requests), "
+          f"then {failed_cached * 1000:.2f} ms/redirect for {tide_images.TIDE_IMAGE_FAILURE_TTL_SECONDS}s")
+    print("\nData consistency verified!")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,263 @@
+"""
+`flask <group> <command>` 形式で実行する運用コマンド群。
+デプロイ前のキャッシュ温め(ウォームアップ)など、Webリクエストの外で行う重い処理をまとめています。
+"""
+import os
+import time
+import calendar
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+from flask.cli import AppGroup
+
+almanac_cli = AppGroup('almanac', help='天文暦キャッシュ(almanac_days)の管理コマンド')
+weather_cli = AppGroup('weather', help='天気キャッシュ(weather_hourly)の管理コマンド')
+iss_cli = AppGroup('iss', help='人工衛星の通過予測(satellite_passes)の管理コマンド')
+spots_cli = AppGroup('spots', help='撮影スポット(photo_spots)の管理コマンド')
+tide_cli = AppGroup('tide', help='タイドグラフ画像キャッシュ(tide_images)の管理コマンド')
+
+
+def _precompute_month(year, month, prefectures):
+    """ワーカープロセス側で複数地点の1ヶ月分の太陽・月データを一括計算する (DBには触れない)"""
+    from models.astro_calc import PREF_COORDS, _compute_month_batch
+    sun, moon = _compute_month_batch([PREF_COORDS[pref] for pref in prefectures], year, month)
+    return list(zip(prefectures, sun, moon))
+
+
+def _completed_months():
+    """sun と moon の両方が全日分保存済みの (地点, 年, 月) の集合を返す"""
+    from database import get_moon_db, ensure_schema
+    from models.astro_calc import ALMANAC_DAYS_SCHEMA
+    conn = get_moon_db()
+    ensure_schema(conn, 'almanac_days', ALMANAC_DAYS_SCHEMA)
+    rows = conn.execute('''
+        SELECT location, substr(date, 1, 4) AS year, substr(date, 6, 2) AS month, COUNT(*) AS days
+        FROM almanac_days
+        WHERE has_sun = 1 AND has_moon = 1
+        GROUP BY location, year, month
+    ''').fetchall()
+    done = set()
+    for row in rows:
+        year, month = int(row['year']), int(row['month'])
+        if row['days'] == calendar.monthrange(year, month)[1]:
+            done.add((row['location'], year, month))
+    return done
+
+
+@almanac_cli.command('precompute')
+@click.option('--start-year', type=int, default=lambda: datetime.now().year, help='計算を開始する年')
+@click.option('--end-year', type=int, default=lambda: datetime.now().year + 1, help='計算を終了する年 (この年を含む)')
+@click.option('--workers', type=int, default=lambda: os.cpu_count() or 1, help='並列実行するプロセス数')
+@click.option('--force', is_flag=True, help='保存済みの月も再計算する')
+def precompute(start_year, end_year, workers, force):
+    """全都道府県 × 指定年範囲の太陽・月データを事前計算して almanac_days に保存する。
+
+    1ヶ月ごとに保存・コミットするため、中断しても再実行すれば未計算の月から再開します。
+    """
+    from models.astro_calc import PREF_COORDS, _save_almanac_month
+
+    targets = [
+        (pref, year, month)
+        for year in range(start_year, end_year + 1)
+        for month in range(1, 13)
+        for pref in PREF_COORDS
+    ]
+    if not force:
+        done = _completed_months()
+        skipped = len(targets)
+        targets = [key for key in targets if key not in done]
+        skipped -= len(targets)
+        if skipped:
+            click.echo(f"{skipped} 件は計算済みのためスキップします。")
+
+    total = len(targets)
+    if total == 0:
+        click.echo("計算が必要な月はありません。")
+        return
+
+    # 同じ年月の地点はまとめて1ジョブにし、compute_almanac_batch でベクトル化して計算する
+    jobs = {}
+    for pref, year, month in targets:
+        jobs.setdefault((year, month), []).append(pref)
+
+    click.echo(f"{total} ヶ月分 ({start_year}〜{end_year}年, {len(PREF_COORDS)} 地点) を {workers} プロセスで計算します...")
+    started = time.time()
+    finished = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_precompute_month, year, month, prefs): (year, month)
+            for (year, month), prefs in jobs.items()
+        }
+        for future in as_completed(futures):
+            year, month = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                click.echo(f"  {year}/{month:02d}: 計算エラー ({e})", err=True)
+                continue
+
+            for pref, sun_data, moon_data in results:
+                _save_almanac_month(pref, year, month, 'sun', sun_data)
+                _save_almanac_month(pref, year, month, 'moon', moon_data)
+            finished += len(results)
+
+            elapsed = time.time() - started
+            click.echo(f"  {year}/{month:02d}: {finished}/{total} 完了 ({finished / elapsed:.2f} ヶ月/秒)")
+
+    elapsed = time.time() - started
+    rate = finished / elapsed if elapsed > 0 else 0.0
+    click.echo(f"完了: {finished} ヶ月分を {elapsed:.1f} 秒で計算しました ({rate:.2f} ヶ月/秒)。")
+
+
+@almanac_cli.command('migrate')
+def migrate():
+    """旧形式の astro_cache (月単位のJSON) を almanac_days テーブルへ移行する。"""
+    from database import get_moon_db
+    from models.astro_calc import migrate_astro_cache
+    migrated = migrate_astro_cache(get_moon_db())
+    click.echo(f"{migrated} ヶ月分を almanac_days に移行しました。")
+
+
+@almanac_cli.command('verify-ephemeris')
+def verify_ephemeris_command():
+    """同梱の天体暦 (data/skyfield/de421.bsp) とその抜粋のハッシュを確かめる。一致しなければ終了コード 1。"""
+    from models.astro_calc import verify_ephemeris, verify_ephemeris_excerpt, EPHEMERIS_PATH, EXCERPT_PATH
+
+    try:
+        ok = verify_ephemeris()
+    except FileNotFoundError:
+        raise click.ClickException(f"{EPHEMERIS_PATH} がありません。`flask almanac fetch-ephemeris` で取得してください。")
+    if not ok:
+        raise click.ClickException(f"{EPHEMERIS_PATH} のハッシュが一致しません。")
+    click.echo(f"{EPHEMERIS_PATH}: OK")
+
+    try:
+        meta = verify_ephemeris_excerpt()
+    except FileNotFoundError:
+        click.echo(f"{EXCERPT_PATH}: なし (`flask almanac build-ephemeris-excerpt` で作れます)")
+        return
+    if meta is None:
+        raise click.ClickException(f"{EXCERPT_PATH} のハッシュが一致しません。作り直してください。")
+    click.echo(f"{EXCERPT_PATH}: OK ({meta['years'][0]}〜{meta['years'][1]}年)")
+
+
+@almanac_cli.command('fetch-ephemeris')
+def fetch_ephemeris():
+    """天体暦 (de421.bsp) をダウンロードして data/skyfield に置く (ビルド時に一度だけ実行する)。"""
+    from models.astro_calc import download_ephemeris, EPHEMERIS_PATH
+
+    if not download_ephemeris():
+        raise click.ClickException(f"ダウンロードした {EPHEMERIS_PATH} のハッシュが一致しません。")
+    click.echo(f"{EPHEMERIS_PATH} を取得しました。")
+
+
+@almanac_cli.command('build-ephemeris-excerpt')
+@click.option('--start-year', type=int, default=None, help='抜粋の最初の年 (既定: 2020)')
+@click.option('--end-year', type=int, default=None, help='抜粋の最後の年 (既定: 2040)')
+def build_ephemeris_excerpt_command(start_year, end_year):
+    """de421.bsp から使う期間の太陽・月・地球 (と木星・土星) だけを切り出した抜粋を作る (ビルド時に fetch-ephemeris の後で実行する)。"""
+    from models.astro_calc import build_ephemeris_excerpt, EXCERPT_PATH, EXCERPT_YEARS, EPHEMERIS_PATH
+
+    years = (start_year or EXCERPT_YEARS[0], end_year or EXCERPT_YEARS[1])
+    if years[0] > years[1]:
+        raise click.BadParameter('--start-year は --end-year 以下にしてください。')
+    try:
+        meta = build_ephemeris_excerpt(years=years)
+    except FileNotFoundError:
+        raise click.ClickException(f"{EPHEMERIS_PATH} がありません。`flask almanac fetch-ephemeris` で取得してください。")
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    size = os.path.getsize(EXCERPT_PATH) / 1024 / 1024
+    click.echo(f"{EXCERPT_PATH} を作りました ({meta['years'][0]}〜{meta['years'][1]}年, "
+               f"{len(meta['targets'])} セグメント, {size:.1f} MB)。")
+
+
+@weather_cli.command('refresh')
+def refresh_weather():
+    """全都道府県の予報期間全体の毎時天気を Open-Meteo の複数地点リクエストでまとめて取得し、weather_hourly を更新する。"""
+    from database import get_moon_db
+    from models.weather import refresh_all_prefectures, FORECAST_HORIZON_DAYS
+
+    started = time.time()
+    saved = refresh_all_prefectures(get_moon_db())
+    elapsed = time.time() - started
+    click.echo(f"{saved} 時間分 ({FORECAST_HORIZON_DAYS} 日間) の天気を {elapsed:.1f} 秒で更新しました。")
+
+
+@iss_cli.command('passes')
+def compute_iss_passes():
+    """最新のTLEについて、通過予測の対象衛星 × 全都道府県 × 向こう10日分の通過を計算して satellite_passes に保存する。"""
+    from database import get_moon_db
+    from models.iss_passes import run_pass_job, current_satellites
+
+    satellites = current_satellites()
+    if not satellites:
+        click.echo("TLEを取得できませんでした。", err=True)
+        return
+
+    started = time.time()
+    computed = run_pass_job(get_moon_db())
+    epochs = ', '.join(f"{name} {epoch}" for name, (_, epoch) in satellites.items())
+    click.echo(f"{epochs}: {computed} 衛星の通過予測を {time.time() - started:.1f} 秒で計算しました。")
+
+
+@spots_cli.command('reassign-ports')
+def reassign_ports():
+    """全ての撮影スポットの最寄りの潮汐観測所 (nearest_port_id) を、観測所の索引でまとめて付け直す。"""
+    from database import get_moon_db
+    from models.geo import reassign_nearest_ports
+
+    started = time.time()
+    updated = reassign_nearest_ports(get_moon_db())
+    click.echo(f"{updated} 件のスポットの最寄りの港を {time.time() - started:.2f} 秒で更新しました。")
+
+
+@spots_cli.command('build-bortle-raster')
+@click.argument('source', type=click.Path(exists=True, dir_okay=False), required=False)
+def build_bortle_raster(source):
+    """夜空の明るさ (mcd/m²) の GeoTIFF から、日本全域のボートルスケールのラスター (uint8 .npy) を作る。
+
+    SOURCE を省略すると、都市からの距離による推定を各セルで計算してラスターにする。
+    """
+    from models.light_pollution import build_raster, build_raster_from_estimate, RASTER_PATH
+    from models.spots_utils import _estimate_from_city_distance
+
+    started = time.time()
+    if source:
+        rows, cols = build_raster(source)
+    else:
+        rows, cols = build_raster_from_estimate(_estimate_from_city_distance, 'city-distance estimate')
+    click.echo(f"{rows} x {cols} セルのラスターを {time.time() - started:.1f} 秒で {RASTER_PATH} に保存しました。")
+
+
+@spots_cli.command('rescore-bortle')
+def rescore_bortle():
+    """全ての観測スポットのボートルスケール (observation_spots.bortle_scale) をまとめて推定し直す。"""
+    from database import get_moon_db
+    from models.spots_utils import rescore_observation_spots
+
+    started = time.time()
+    updated = rescore_observation_spots(get_moon_db())
+    click.echo(f"{updated} 件のスポットのボートルスケールを {time.time() - started:.2f} 秒で更新しました。")
+
+
+@tide_cli.command('prefetch-images')
+@click.option('--days', type=int, default=7, help='今日から何日分を取得するか')
+@click.option('--ports', 'port_count', type=int, default=20, help='取得する観測所の数 (撮影スポットで多く使われている順)')
+@click.option('--workers', type=int, default=4, help='並行して取得する数')
+def prefetch_tide_images(days, port_count, workers):
+    """よく使われる観測所の今日から N 日分のタイドグラフ画像を取得してキャッシュしておく。"""
+    from database import get_moon_db
+    from models.tide_images import popular_ports, prefetch, cache_size
+
+    conn = get_moon_db()
+    ports = popular_ports(conn, port_count)
+    today = datetime.now().date()
+    dates = [(today + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+
+    started = time.time()
+    fetched, cached, failed = prefetch(conn, ports, dates, workers=workers)
+    click.echo(f"{len(ports)} 港 × {days} 日: 取得 {fetched} 件, キャッシュ済み {cached} 件, 失敗 {failed} 件 "
+               f"({time.time() - started:.1f} 秒, キャッシュ合計 {cache_size(conn) / 1024 / 1024:.1f} MB)")
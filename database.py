@@ -23,3 +23,17 @@ def close_connection(exception):
             db = getattr(g, attr)
             if db is not None:
                 db.close()
+
+_ensured_schemas = set()
+
+def ensure_schema(conn, name, statements):
+    """
+    機能ごとに追加したテーブル・インデックスを作成します。
+    CREATE ... IF NOT EXISTS を前提とし、同じ name についてはプロセスごとに一度だけ実行します。
+    """
+    if name in _ensured_schemas:
+        return
+    for statement in statements:
+        conn.execute(statement)
+    conn.commit()
+    _ensured_schemas.add(name)
@@ -0,0 +1,18 @@
+"""
+gunicorn の設定 (`gunicorn app:app` を実行したディレクトリのこのファイルが自動で読み込まれる)。
+
+preload_app で親プロセスがアプリを読み込み、ワーカーを起動する前に天体暦・時間スケールを読み込んでおく。
+天体暦はメモリマップで開いているため、fork 後のワーカーは同じページを共有し、
+各ワーカーの最初の天文計算で読み込みを待つこともない。
+"""
+# bind ($PORT) とワーカー数 ($WEB_CONCURRENCY) は gunicorn の既定 (環境変数) のまま
+preload_app = True
+
+def when_ready(server):
+    """ワーカーを fork する前に親プロセスで天体暦を読み込む (失敗しても起動は続ける)"""
+    try:
+        from models.astro_calc import get_eph, get_ts
+        get_ts()
+        get_eph()
+    except Exception as e:
+        server.log.warning(f"Ephemeris preload error: {e}")
@@ -2,18 +2,188 @@
 Skyfieldライブラリを使用して、太陽・月の出没時刻や月齢などの天文学的数値を計算するモジュール。
 高精度な位置情報に基づく天文イベントを提供します。
 """
-from skyfield.api import Loader, wgs84
+from skyfield.api import Loader, load_file, wgs84
 from skyfield import almanac
+from skyfield.framelib import itrs
+from skyfield.nutationlib import iau2000b_radians
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 import os
+import json
+import calendar
+import hashlib
+import threading
+
+import numpy as np
+
+from database import get_moon_db, ensure_schema
+from models import single_flight
+from models.geo import snap_to_grid, grid_key
+from models.memory_cache import LRUCache
 
-# 天体暦データの保存と読み込み（data/skyfieldディレクトリに保持）
-load = Loader(os.path.join(os.path.dirname(__file__), '..', 'data', 'skyfield'))
-eph = load('de421.bsp') # 基本的な天体位置データ
-ts = load.timescale()   # 時間スケールの初期化
 tz = ZoneInfo('Asia/Tokyo') # 日本標準時(JST)を使用
 
+# 天体暦データ（data/skyfieldディレクトリに同梱）
+# 天体暦・時間スケールは import 時には読み込まず、最初に天文計算で使うときに get_eph() / get_ts() で読み込む。
+# 天体暦は jplephem がメモリマップで開くため、gunicorn の preload_app で親プロセスが読み込んでおけば
+# fork 後のワーカーは同じページを共有する。ファイルが無い・壊れている場合はダウンロードせずにエラーにする
+SKYFIELD_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'skyfield')
+EPHEMERIS_NAME = 'de421.bsp'
+EPHEMERIS_PATH = os.path.join(SKYFIELD_DIR, EPHEMERIS_NAME)
+EPHEMERIS_SHA256 = 'a20a7139da04cbc462454634918e9a9ca69127044e2cc9d4f9c16e238d2deedc'
+
+# de421 (1900〜2050年, 15セグメント) から、使う期間・天体だけを切り出した抜粋。
+# 太陽・月・地球と、視位置 (apparent) の光の重力偏向に使う木星・土星の6セグメントだけを持ち、
+# get_eph() はこちらを優先して開く。`flask almanac build-ephemeris-excerpt` で作り、ハッシュと範囲は隣の .json に保存する。
+# jplephem は使うレコードのページしか読まないため、ワーカーの RSS は元の de421 と変わらない。
+# 小さくなるのはファイル・メモリマップの大きさと読み込み (ハッシュの確認) の時間 (benchmark_ephemeris_excerpt.py)
+EXCERPT_NAME = 'de421_excerpt.bsp'
+EXCERPT_PATH = os.path.join(SKYFIELD_DIR, EXCERPT_NAME)
+EXCERPT_YEARS = (2020, 2040)
+# 0: 太陽系重心, 3: 地球・月の重心, 5: 木星系の重心, 6: 土星系の重心, 10: 太陽, 301: 月, 399: 地球
+EXCERPT_TARGETS = (3, 5, 6, 10, 301, 399)
+# 光行時間の補正で少し前の時刻の位置も引くため、前後に余裕を持たせて切り出す
+EXCERPT_MARGIN_DAYS = 30
+
+_eph = None
+_excerpt = None
+_excerpt_range = None
+_ts = None
+_ephemeris_lock = threading.Lock()
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def verify_ephemeris(path=EPHEMERIS_PATH, expected=EPHEMERIS_SHA256):
+    """天体暦ファイルの SHA-256 が同梱時の値と一致するか確かめる。無ければ FileNotFoundError"""
+    return _sha256(path) == expected
+
+def download_ephemeris():
+    """天体暦をダウンロードして data/skyfield に置く (flask almanac fetch-ephemeris 用。Webリクエストでは使わない)"""
+    Loader(SKYFIELD_DIR).download(EPHEMERIS_NAME)
+    return verify_ephemeris()
+
+def _excerpt_meta_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+def build_ephemeris_excerpt(path=None, years=EXCERPT_YEARS, targets=EXCERPT_TARGETS):
+    """
+    de421 から years (両端の年を含む) の targets のセグメントだけを切り出して path に書き、
+    ハッシュ・範囲を .json に保存する。保存した情報の辞書を返す。
+    """
+    from jplephem.spk import SPK
+    from jplephem.calendar import compute_julian_date
+    from jplephem.excerpter import write_excerpt
+
+    path = path or EXCERPT_PATH
+    if not verify_ephemeris():
+        raise ValueError(f"{EPHEMERIS_PATH} のハッシュが一致しません。ファイルが壊れている可能性があります。")
+    start_jd = compute_julian_date(years[0], 1, 1)
+    end_jd = compute_julian_date(years[1] + 1, 1, 1)
+
+    spk = SPK.open(EPHEMERIS_PATH)
+    try:
+        summaries = [summary for summary, segment in zip(spk.daf.summaries(), spk.segments)
+                     if segment.target in targets]
+        with open(path, 'w+b') as f:
+            write_excerpt(spk, f, start_jd - EXCERPT_MARGIN_DAYS, end_jd + EXCERPT_MARGIN_DAYS, summaries)
+    finally:
+        spk.close()
+
+    meta = {
+        'source': EPHEMERIS_NAME,
+        'source_sha256': EPHEMERIS_SHA256,
+        'sha256': _sha256(path),
+        'years': list(years),
+        'start_jd': start_jd,
+        'end_jd': end_jd,
+        'targets': list(targets),
+    }
+    with open(_excerpt_meta_path(path), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+def verify_ephemeris_excerpt(path=None):
+    """
+    抜粋のハッシュが .json の値と一致し、同梱の de421 から作られたものか確かめる。
+    一致すれば .json の内容を、一致しなければ None を返す。無ければ FileNotFoundError
+    """
+    path = path or EXCERPT_PATH
+    with open(_excerpt_meta_path(path), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('source_sha256') != EPHEMERIS_SHA256 or _sha256(path) != meta.get('sha256'):
+        return None
+    return meta
+
+def _load_excerpt():
+    """抜粋を開く (プロセス内で1回だけ試す)。無い・ハッシュが合わなければ None のまま元の de421 を使う"""
+    global _excerpt, _excerpt_range
+    try:
+        meta = verify_ephemeris_excerpt()
+    except FileNotFoundError:
+        meta = None
+    except (OSError, ValueError) as e:
+        print(f"Ephemeris excerpt error: {e}")
+        meta = None
+    else:
+        if meta is None:
+            print(f"Ephemeris excerpt error: {EXCERPT_PATH} のハッシュが一致しません。元の天体暦を使います。")
+    if meta is not None:
+        _excerpt = load_file(EXCERPT_PATH)
+        _excerpt_range = (meta['start_jd'], meta['end_jd'])
+    else:
+        _excerpt_range = (0.0, 0.0)
+
+def _load_full():
+    global _eph
+    if not os.path.exists(EPHEMERIS_PATH):
+        raise FileNotFoundError(
+            f"{EPHEMERIS_PATH} がありません。`flask almanac fetch-ephemeris` で取得してください。")
+    if not verify_ephemeris():
+        raise ValueError(f"{EPHEMERIS_PATH} のハッシュが一致しません。ファイルが壊れている可能性があります。")
+    _eph = load_file(EPHEMERIS_PATH)
+
+def get_eph(start_jd=None, end_jd=None):
+    """
+    天体暦を返す。プロセス内で最初の呼び出し時にハッシュを確かめてから開く。
+    抜粋 (EXCERPT_PATH) があればそちらを使い、計算する期間 start_jd〜end_jd (TT のユリウス日) が
+    抜粋の範囲外のときだけ元の de421 を開いて使う
+    """
+    if _excerpt_range is None:
+        with _ephemeris_lock:
+            if _excerpt_range is None:
+                _load_excerpt()
+    if _excerpt is not None:
+        low, high = _excerpt_range
+        if (start_jd is None or start_jd >= low) and (end_jd is None or end_jd <= high):
+            return _excerpt
+    if _eph is None:
+        with _ephemeris_lock:
+            if _eph is None:
+                _load_full()
+    return _eph
+
+def get_ts():
+    """時間スケールを返す。うるう秒・ΔT は Skyfield 同梱のデータを使う (ネットワークに接続しない)"""
+    global _ts
+    if _ts is None:
+        with _ephemeris_lock:
+            if _ts is None:
+                _ts = Loader(SKYFIELD_DIR).timescale(builtin=True)
+    return _ts
+
+def __getattr__(name):
+    """従来の `from models.astro_calc import eph, ts` も、使われた時点で読み込むようにする"""
+    if name == 'eph':
+        return get_eph()
+    if name == 'ts':
+        return get_ts()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # カレンダー表示などに使用される都道府県別代表点の座標
 PREF_COORDS = {
     "札幌(北海道)": (43.0642, 141.3469),
@@ -79,93 +249,33 @@ def get_sun_events(prefecture_name, date_str):
     except ValueError:
         return None
 
-    # Try cache first (fetch whole month)
+    # Try cache first (single row lookup)
+    row = _get_almanac_day(prefecture_name, date_str)
+    if row and row['has_sun']:
+        return _sun_row_to_dict(row)
+
+    # Compute (and cache) the whole month
     month_cache = get_sun_events_month(prefecture_name, dt.year, dt.month)
     if month_cache and dt.day in month_cache:
         return month_cache[dt.day]
 
     # ... fall back to single day calc if cache logic failed (should not happen with get_sun_events_month)
     lat, lon = PREF_COORDS[prefecture_name]
-    location = wgs84.latlon(lat, lon)
-    t0 = ts.from_datetime(dt.replace(tzinfo=tz))
-    t1 = ts.from_datetime((dt + timedelta(days=1)).replace(tzinfo=tz))
-    
-    f = almanac.dark_twilight_day(eph, location)
-    times, events = almanac.find_discrete(t0, t1, f)
-    
-    res = {
-        'sunrise': '-', 'sunset': '-',
-        'civil_dawn': '-', 'civil_dusk': '-',
-        'nautical_dawn': '-', 'nautical_dusk': '-',
-        'astro_dawn': '-', 'astro_dusk': '-',
-        '撮影可能時間帯': '-'
-    }
-    
-    prev_event = f(t0).item()
-    for t, event in zip(times, events):
-        time_str = t.astimezone(tz).strftime('%H:%M')
-        if prev_event == 0 and event == 1: res['astro_dawn'] = time_str
-        elif prev_event == 1 and event == 2: res['nautical_dawn'] = time_str
-        elif prev_event == 2 and event == 3: res['civil_dawn'] = time_str
-        elif prev_event == 3 and event == 4: res['sunrise'] = time_str
-        elif prev_event == 4 and event == 3: res['sunset'] = time_str
-        elif prev_event == 3 and event == 2: res['civil_dusk'] = time_str
-        elif prev_event == 2 and event == 1: res['nautical_dusk'] = time_str
-        elif prev_event == 1 and event == 0: res['astro_dusk'] = time_str
-        prev_event = event
-
-    if res['astro_dusk'] != '-' and res['astro_dawn'] != '-':
-        res['撮影可能時間帯'] = f"18時以降から早朝まで (特に {res['astro_dusk']} 以降 ～ 翌 {res['astro_dawn']} 前)"
-    elif res['astro_dusk'] != '-':
-        res['撮影可能時間帯'] = f"{res['astro_dusk']} 以降"
-        
-    return res
+    return get_sun_events_by_coords(lat, lon, date_str)
 
 def get_sun_events_by_coords(lat, lon, date_str):
     """
     指定された緯度・経度と日付から、その場所における太陽イベントを計算する。（任意座標の動的計算用）
-    日の出、日の入り、および撮影可能時間帯に影響する 薄明（Twilight）の開始・終了時刻を skyfield を使って算出する。
+    日の出、日の入り、および撮影可能時間帯に影響する 薄明（Twilight）の開始・終了時刻を算出する。
+    結果は0.05度のグリッドセル単位・1ヶ月単位でキャッシュする (_get_grid_month)。
     """
-    location = wgs84.latlon(lat, lon)
-    
     try:
         dt = datetime.strptime(date_str, '%Y-%m-%d')
     except ValueError:
         return None
-        
-    t0 = ts.from_datetime(dt.replace(tzinfo=tz))
-    t1 = ts.from_datetime((dt + timedelta(days=1)).replace(tzinfo=tz))
-    
-    f = almanac.dark_twilight_day(eph, location)
-    times, events = almanac.find_discrete(t0, t1, f)
-    
-    res = {
-        'sunrise': '-', 'sunset': '-',
-        'civil_dawn': '-', 'civil_dusk': '-',
-        'nautical_dawn': '-', 'nautical_dusk': '-',
-        'astro_dawn': '-', 'astro_dusk': '-',
-        '撮影可能時間帯': '-'
-    }
-    
-    prev_event = f(t0).item()
-    for t, event in zip(times, events):
-        time_str = t.astimezone(tz).strftime('%H:%M')
-        if prev_event == 0 and event == 1: res['astro_dawn'] = time_str
-        elif prev_event == 1 and event == 2: res['nautical_dawn'] = time_str
-        elif prev_event == 2 and event == 3: res['civil_dawn'] = time_str
-        elif prev_event == 3 and event == 4: res['sunrise'] = time_str
-        elif prev_event == 4 and event == 3: res['sunset'] = time_str
-        elif prev_event == 3 and event == 2: res['civil_dusk'] = time_str
-        elif prev_event == 2 and event == 1: res['nautical_dusk'] = time_str
-        elif prev_event == 1 and event == 0: res['astro_dusk'] = time_str
-        prev_event = event
 
-    if res['astro_dusk'] != '-' and res['astro_dawn'] != '-':
-        res['撮影可能時間帯'] = f"18時以降から早朝まで (特に {res['astro_dusk']} 以降 ～ 翌 {res['astro_dawn']} 前)"
-    elif res['astro_dusk'] != '-':
-        res['撮影可能時間帯'] = f"{res['astro_dusk']} 以降"
-        
-    return res
+    sun_month, _ = _get_grid_month(lat, lon, dt.year, dt.month)
+    return sun_month[dt.day]
 
 def get_moon_data(prefecture_name, date_str):
     """Calculate Moon age, moonrise, and moonset for a single day."""
@@ -177,6 +287,16 @@ def get_moon_data(prefecture_name, date_str):
     except ValueError:
         return {'moon_age': '-', 'moon_rise': '-', 'moon_set': '-'}
 
+    # Try cache first (single row lookup)
+    row = _get_almanac_day(prefecture_name, date_str)
+    if row and row['has_moon']:
+        day_data = _moon_row_to_dict(row)
+        return {
+            'moon_age': day_data['age'],
+            'moon_rise': day_data['rise'],
+            'moon_set': day_data['set']
+        }
+
     # Use monthly batch/cache
     month_cache = get_moon_data_month(prefecture_name, dt.year, dt.month)
     if month_cache and dt.day in month_cache:
@@ -188,132 +308,199 @@ def get_moon_data(prefecture_name, date_str):
         }
         
     lat, lon = PREF_COORDS[prefecture_name]
-    location = wgs84.latlon(lat, lon)
-    t0 = ts.from_datetime(dt.replace(hour=0, minute=0, second=0, tzinfo=tz))
-    t1 = ts.from_datetime((dt + timedelta(days=1)).replace(hour=0, minute=0, second=0, tzinfo=tz))
-    
-    f = almanac.risings_and_settings(eph, eph['moon'], location)
-    times, events = almanac.find_discrete(t0, t1, f)
-    
-    moon_rise = '-'
-    moon_set = '-'
-    for t, event in zip(times, events):
-        time_str = t.astimezone(tz).strftime('%H:%M')
-        if event == 1: moon_rise = time_str
-        elif event == 0: moon_set = time_str
-            
-    dt_noon = dt.replace(hour=12, minute=0, second=0, tzinfo=tz)
-    t_noon = ts.from_datetime(dt_noon)
-    phase_degrees = almanac.moon_phase(eph, t_noon).degrees
-    age = (phase_degrees / 360.0) * 29.530588
-    
-    return {
-        'moon_age': f"{age:.1f}",
-        'moon_rise': moon_rise,
-        'moon_set': moon_set
-    }
+    return get_moon_data_by_coords(lat, lon, date_str)
 
 def get_moon_data_by_coords(lat, lon, date_str):
     """
     指定された緯度・経度と日付から、月の出、月の入り時刻、および正午時点の月齢を計算する。
     海辺の撮影地マップなど、任意の地点の天文情報を取得したい場合に利用する。
+    結果は0.05度のグリッドセル単位・1ヶ月単位でキャッシュする (_get_grid_month)。
     """
-    location = wgs84.latlon(lat, lon)
-    
     try:
         dt = datetime.strptime(date_str, '%Y-%m-%d')
     except ValueError:
         return {'moon_age': '-', 'moon_rise': '-', 'moon_set': '-'}
-        
-    t0 = ts.from_datetime(dt.replace(hour=0, minute=0, second=0, tzinfo=tz))
-    t1 = ts.from_datetime((dt + timedelta(days=1)).replace(hour=0, minute=0, second=0, tzinfo=tz))
-    
-    f = almanac.risings_and_settings(eph, eph['moon'], location)
-    times, events = almanac.find_discrete(t0, t1, f)
-    
-    moon_rise = '-'
-    moon_set = '-'
-    
-    for t, event in zip(times, events):
-        time_str = t.astimezone(tz).strftime('%H:%M')
-        if event == 1:
-            moon_rise = time_str
-        elif event == 0:
-            moon_set = time_str
-            
-    dt_noon = dt.replace(hour=12, minute=0, second=0, tzinfo=tz)
-    t_noon = ts.from_datetime(dt_noon)
-    phase_degrees = almanac.moon_phase(eph, t_noon).degrees
-    age = (phase_degrees / 360.0) * 29.530588
-    
+
+    _, moon_month = _get_grid_month(lat, lon, dt.year, dt.month)
+    day_data = moon_month[dt.day]
     return {
-        'moon_age': f"{age:.1f}",
-        'moon_rise': moon_rise,
-        'moon_set': moon_set
+        'moon_age': day_data['age'],
+        'moon_rise': day_data['rise'],
+        'moon_set': day_data['set']
     }
 
-import json
-from database import get_moon_db
+# 1日1行の天文暦テーブル。各イベント時刻は JST の「0時からの経過分」(整数) で保持し、
+# イベントが無い日は NULL とする。(location, date) の主キーで1日単位・月単位の検索を行う。
+ALMANAC_DAYS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS almanac_days (
+        location TEXT NOT NULL,
+        date TEXT NOT NULL,
+        astro_dawn INTEGER,
+        nautical_dawn INTEGER,
+        civil_dawn INTEGER,
+        sunrise INTEGER,
+        sunset INTEGER,
+        civil_dusk INTEGER,
+        nautical_dusk INTEGER,
+        astro_dusk INTEGER,
+        moon_rise INTEGER,
+        moon_set INTEGER,
+        moon_age REAL,
+        has_sun INTEGER NOT NULL DEFAULT 0,
+        has_moon INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (location, date)
+    ) WITHOUT ROWID
+    ''',
+]
+
+SUN_EVENT_KEYS = [
+    'astro_dawn', 'nautical_dawn', 'civil_dawn', 'sunrise',
+    'sunset', 'civil_dusk', 'nautical_dusk', 'astro_dusk',
+]
+
+def _to_minutes(time_str):
+    """'HH:MM' を0時からの経過分に変換する ('-' は None)"""
+    if not time_str or time_str == '-':
+        return None
+    hour, minute = time_str.split(':')
+    return int(hour) * 60 + int(minute)
+
+def _format_minutes(minutes):
+    """0時からの経過分を 'HH:MM' に戻す (None は '-')"""
+    if minutes is None:
+        return '-'
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def _shooting_window(res):
+    """薄明時刻から「撮影可能時間帯」の文言を組み立てる"""
+    if res['astro_dusk'] != '-' and res['astro_dawn'] != '-':
+        return f"18時以降から早朝まで (特に {res['astro_dusk']} 以降 ～ 翌 {res['astro_dawn']} 前)"
+    elif res['astro_dusk'] != '-':
+        return f"{res['astro_dusk']} 以降"
+    return '-'
+
+def _sun_row_to_dict(row):
+    res = {key: _format_minutes(row[key]) for key in SUN_EVENT_KEYS}
+    res['撮影可能時間帯'] = _shooting_window(res)
+    return res
+
+def _moon_row_to_dict(row):
+    return {
+        'age': f"{row['moon_age']:.1f}",
+        'rise': _format_minutes(row['moon_rise']),
+        'set': _format_minutes(row['moon_set'])
+    }
+
+def _get_almanac_month(location, year, month, kind):
+    """
+    almanac_days から1ヶ月分を取得します。kind は 'sun' または 'moon'。
+    1日でも欠けていれば None を返します。
+    """
+    try:
+        conn = get_moon_db()
+        ensure_schema(conn, 'almanac_days', ALMANAC_DAYS_SCHEMA)
+        _, days_in_month = calendar.monthrange(year, month)
+        rows = conn.execute(
+            f"SELECT * FROM almanac_days WHERE location = ? AND date BETWEEN ? AND ? AND has_{kind} = 1",
+            (location, f"{year}-{month:02d}-01", f"{year}-{month:02d}-{days_in_month:02d}")
+        ).fetchall()
+        if len(rows) == days_in_month:
+            to_dict = _sun_row_to_dict if kind == 'sun' else _moon_row_to_dict
+            return {int(row['date'][8:]): to_dict(row) for row in rows}
+    except Exception as e:
+        print(f"Cache read error: {e}")
+    return None
 
-def _get_astro_cache(prefecture_name, year, month):
-    """Retrieve astronomical data from cache if available."""
+def _get_almanac_day(location, date_str):
+    """almanac_days から1日分の行を取得します (主キーによる1行検索)。"""
     try:
         conn = get_moon_db()
-        c = conn.cursor()
-        res = c.execute(
-            "SELECT data_json FROM astro_cache WHERE prefecture = ? AND year = ? AND month = ?",
-            (prefecture_name, year, month)
+        ensure_schema(conn, 'almanac_days', ALMANAC_DAYS_SCHEMA)
+        return conn.execute(
+            "SELECT * FROM almanac_days WHERE location = ? AND date = ?", (location, date_str)
         ).fetchone()
-        if res:
-            return json.loads(res['data_json'])
     except Exception as e:
         print(f"Cache read error: {e}")
     return None
 
-def _save_astro_cache(prefecture_name, year, month, data_type, data):
-    """Save astronomical data to cache."""
+def _almanac_upsert_rows(location, year, month, kind, data):
+    """_compute_*_month の結果を almanac_days への upsert 用のSQLとパラメータに変換する"""
+    if kind == 'sun':
+        columns = SUN_EVENT_KEYS
+        params = [
+            [location, f"{year}-{month:02d}-{day:02d}"] + [_to_minutes(res[key]) for key in SUN_EVENT_KEYS]
+            for day, res in data.items()
+        ]
+    else:
+        columns = ['moon_rise', 'moon_set', 'moon_age']
+        params = [
+            [location, f"{year}-{month:02d}-{day:02d}", _to_minutes(res['rise']), _to_minutes(res['set']), float(res['age'])]
+            for day, res in data.items()
+        ]
+
+    updates = ', '.join(f"{col} = excluded.{col}" for col in columns)
+    sql = (
+        f"INSERT INTO almanac_days (location, date, {', '.join(columns)}, has_{kind}) "
+        f"VALUES (?, ?, {', '.join('?' for _ in columns)}, 1) "
+        f"ON CONFLICT(location, date) DO UPDATE SET {updates}, has_{kind} = 1, updated_at = CURRENT_TIMESTAMP"
+    )
+    return sql, params
+
+def _save_almanac_month(location, year, month, kind, data):
+    """1ヶ月分の計算結果を almanac_days に保存します (該当種別の列のみ更新)。"""
     try:
         conn = get_moon_db()
-        c = conn.cursor()
-        
-        # Get existing cache or create new
-        existing = _get_astro_cache(prefecture_name, year, month)
-        if existing is None:
-            existing = {}
-        
-        existing[data_type] = data
-        
-        c.execute(
-            "INSERT OR REPLACE INTO astro_cache (prefecture, year, month, data_json) VALUES (?, ?, ?, ?)",
-            (prefecture_name, year, month, json.dumps(existing))
-        )
-        conn.commit()
+        ensure_schema(conn, 'almanac_days', ALMANAC_DAYS_SCHEMA)
+        sql, params = _almanac_upsert_rows(location, year, month, kind, data)
+        with conn:
+            conn.executemany(sql, params)
     except Exception as e:
         print(f"Cache write error: {e}")
 
-def get_moon_data_month(prefecture_name, year, month):
+def migrate_astro_cache(conn):
     """
-    1ヶ月分の月の出・月の入り・月齢などのデータを一括計算（またはキャッシュから取得）します。
+    旧形式の astro_cache (月単位のJSON) を almanac_days に移行します。
+    移行した月数を返します。旧テーブルはそのまま残します。
     """
-    if prefecture_name not in PREF_COORDS:
-        prefecture_name = "東京(東京都)"
-        
-    # Check cache first
-    cached = _get_astro_cache(prefecture_name, year, month)
-    if cached and 'moon' in cached:
-        # Convert keys back to int if they came back as strings from JSON
-        return {int(k): v for k, v in cached['moon'].items()}
+    ensure_schema(conn, 'almanac_days', ALMANAC_DAYS_SCHEMA)
+    try:
+        rows = conn.execute("SELECT prefecture, year, month, data_json FROM astro_cache").fetchall()
+    except Exception as e:
+        print(f"astro_cache read error: {e}")
+        return 0
 
-    import calendar
-    lat, lon = PREF_COORDS[prefecture_name]
+    migrated = 0
+    with conn:
+        for prefecture, year, month, data_json in rows:
+            try:
+                cached = json.loads(data_json)
+            except ValueError:
+                continue
+            for kind in ('sun', 'moon'):
+                if kind in cached:
+                    data = {int(k): v for k, v in cached[kind].items()}
+                    sql, params = _almanac_upsert_rows(prefecture, year, month, kind, data)
+                    conn.executemany(sql, params)
+            migrated += 1
+    return migrated
+
+def _find_discrete_moon_month(lat, lon, year, month):
+    """
+    指定座標の1ヶ月分の月の出・月の入り・月齢を almanac.find_discrete で計算します。
+    compute_almanac_batch の検証用の基準実装です (benchmark_almanac_batch.py)。
+    """
     location = wgs84.latlon(lat, lon)
     
     _, days_in_month = calendar.monthrange(year, month)
     dt_start = datetime(year, month, 1, tzinfo=tz)
     dt_end = (dt_start + timedelta(days=days_in_month)).replace(day=1)
     
+    ts = get_ts()
     t0 = ts.from_datetime(dt_start)
     t1 = ts.from_datetime(dt_end)
+    eph = get_eph(t0.tt, t1.tt)
     
     f = almanac.risings_and_settings(eph, eph['moon'], location)
     times, events = almanac.find_discrete(t0, t1, f)
@@ -341,34 +528,24 @@ def get_moon_data_month(prefecture_name, year, month):
             elif event == 0:
                 month_data[day]['set'] = time_str
                 
-    # Save to cache
-    _save_astro_cache(prefecture_name, year, month, 'moon', month_data)
-                
     return month_data
 
-def get_sun_events_month(prefecture_name, year, month):
+def _find_discrete_sun_month(lat, lon, year, month):
     """
-    1ヶ月分の太陽イベント（日の出、日の入り、薄明）を一括計算（またはキャッシュから取得）します。
+    指定座標の1ヶ月分の太陽イベント（日の出、日の入り、薄明）を almanac.find_discrete で計算します。
+    compute_almanac_batch の検証用の基準実装です (benchmark_almanac_batch.py)。
     """
-    if prefecture_name not in PREF_COORDS:
-        prefecture_name = "東京(東京都)"
-        
-    cached = _get_astro_cache(prefecture_name, year, month)
-    if cached and 'sun' in cached:
-        return {int(k): v for k, v in cached['sun'].items()}
-
-    import calendar
-    lat, lon = PREF_COORDS[prefecture_name]
     location = wgs84.latlon(lat, lon)
     
     _, days_in_month = calendar.monthrange(year, month)
     dt_start = datetime(year, month, 1, tzinfo=tz)
     dt_end = (dt_start + timedelta(days=days_in_month)).replace(day=1)
     
+    ts = get_ts()
     t0 = ts.from_datetime(dt_start)
     t1 = ts.from_datetime(dt_end)
     
-    f = almanac.dark_twilight_day(eph, location)
+    f = almanac.dark_twilight_day(get_eph(t0.tt, t1.tt), location)
     times, events = almanac.find_discrete(t0, t1, f)
     
     month_sun_data = {}
@@ -411,61 +588,288 @@ def get_sun_events_month(prefecture_name, year, month):
 
     # Post-process for "撮影可能時間帯"
     for d in range(1, days_in_month + 1):
-        res = month_sun_data[d]
-        if res['astro_dusk'] != '-' and res['astro_dawn'] != '-':
-             res['撮影可能時間帯'] = f"18時以降から早朝まで (特に {res['astro_dusk']} 以降 ～ 翌 {res['astro_dawn']} 前)"
-        elif res['astro_dusk'] != '-':
-             res['撮影可能時間帯'] = f"{res['astro_dusk']} 以降"
+        month_sun_data[d]['撮影可能時間帯'] = _shooting_window(month_sun_data[d])
 
-    _save_astro_cache(prefecture_name, year, month, 'sun', month_sun_data)
     return month_sun_data
 
+# --- 複数地点の一括計算 (NumPyによるベクトル化) ---
+# 太陽・月の地心視位置は観測地点に依存しないため、時刻グリッド上で1度だけ評価し、
+# 各地点の位置ベクトルを差し引いて全地点の地平高度をまとめて求める。
+
+# 地平高度のしきい値と、上向き(朝・出)/下向き(夕・入り)に横切ったときのイベント名。
+# 太陽は almanac.dark_twilight_day、月は almanac.risings_and_settings の既定値 (-34') と同じ区分。
+CROSSING_THRESHOLDS = [
+    ('sun', -18.0, 'astro_dawn', 'astro_dusk'),
+    ('sun', -12.0, 'nautical_dawn', 'nautical_dusk'),
+    ('sun', -6.0, 'civil_dawn', 'civil_dusk'),
+    ('sun', -0.8333, 'sunrise', 'sunset'),
+    ('moon', -34.0 / 60.0, 'rise', 'set'),
+]
+# 符号変化を探す時刻グリッドの間隔 (1時間)
+GRID_STEP_DAYS = 1.0 / 24.0
+# 根の絞り込み: 線形補間の初期値からのニュートン法の反復回数と、数値微分の刻み (1秒)
+NEWTON_ITERATIONS = 2
+NEWTON_STEP_DAYS = 1.0 / 86400.0
+
+def _observer_vectors(latlons):
+    """各地点のITRS位置ベクトル(au)と天頂方向の単位ベクトルを (3, 地点数) の配列で返す"""
+    xyz = np.array([wgs84.latlon(lat, lon).itrs_xyz.au for lat, lon in latlons]).T
+    lat = np.radians([lat for lat, _ in latlons])
+    lon = np.radians([lon for _, lon in latlons])
+    up = np.array([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+    return xyz, up
+
+def _apparent_itrs(body, jd_tt):
+    """天体の地心視位置をITRS座標(au)で返す。jd_tt の形状 (N,) に対して (3, N)"""
+    eph = get_eph(np.min(jd_tt), np.max(jd_tt))
+    t = get_ts().tt_jd(jd_tt)
+    t._nutation_angles_radians = iau2000b_radians(t)  # almanac と同じ低精度(高速)の章動モデル
+    return eph['earth'].at(t).observe(eph[body]).apparent().frame_xyz(itrs).au
+
+def _topocentric_altitude(body_xyz, obs_xyz, up):
+    """地心位置から観測地点の位置を引いた方向の地平高度(度)。配列はブロードキャストして計算する"""
+    topo = body_xyz - obs_xyz
+    return np.degrees(np.arcsin(np.sum(topo * up, axis=0) / np.linalg.norm(topo, axis=0)))
+
+def _solve_crossings(jd_grid, altitudes, obs_xyz, up):
+    """
+    グリッド上の高度 altitudes {天体: (地点数, 時刻数)} が CROSSING_THRESHOLDS の各しきい値を
+    横切る時刻を求める。全しきい値・全地点の符号変化を1回の NumPy 演算で検出し、
+    線形補間で初期値を置いてからニュートン法でまとめて絞り込む。
+    (しきい値番号, 地点番号, 時刻(TT JD), 上昇か) の配列を返す。
+    """
+    offsets = np.stack([altitudes[body] - horizon for body, horizon, _, _ in CROSSING_THRESHOLDS])
+    above = offsets > 0
+    k_idx, loc_idx, step_idx = np.nonzero(above[:, :, 1:] != above[:, :, :-1])
+    rising = above[k_idx, loc_idx, step_idx + 1]
+
+    lo = jd_grid[step_idx]
+    hi = jd_grid[step_idx + 1]
+    f_lo = offsets[k_idx, loc_idx, step_idx]
+    f_hi = offsets[k_idx, loc_idx, step_idx + 1]
+    roots = lo + (hi - lo) * f_lo / (f_lo - f_hi)
+
+    horizons = np.array([horizon for _, horizon, _, _ in CROSSING_THRESHOLDS])[k_idx]
+    bodies = np.array([body for body, _, _, _ in CROSSING_THRESHOLDS])[k_idx]
+    for _ in range(NEWTON_ITERATIONS):
+        for body in ('sun', 'moon'):
+            mask = bodies == body
+            n = np.count_nonzero(mask)
+            if n == 0:
+                continue
+            # 根の候補と1秒後の高度を1回の天体暦評価でまとめて求める
+            x = roots[mask]
+            obs = np.tile(obs_xyz[:, loc_idx[mask]], 2)
+            obs_up = np.tile(up[:, loc_idx[mask]], 2)
+            alt = _topocentric_altitude(_apparent_itrs(body, np.concatenate([x, x + NEWTON_STEP_DAYS])), obs, obs_up)
+            f = alt[:n] - horizons[mask]
+            slope = (alt[n:] - alt[:n]) / NEWTON_STEP_DAYS
+            roots[mask] = np.clip(x - f / slope, lo[mask], hi[mask])
+
+    return k_idx, loc_idx, roots, rising
+
+def compute_almanac_batch(latlons, start_date, end_date):
+    """
+    複数地点 latlons [(lat, lon), ...] について、start_date〜end_date (両端を含む, JST) の
+    薄明・日の出入り・月の出入り・正午の月齢をまとめて計算します。
+
+    戻り値は {'sun': [...], 'moon': [...]} で、それぞれ地点ごとに
+    {date: get_sun_events / get_moon_data_month と同じ形式の辞書} を持つリストです。
+    """
+    dt_start = datetime(start_date.year, start_date.month, start_date.day, tzinfo=tz)
+    dt_end = datetime(end_date.year, end_date.month, end_date.day, tzinfo=tz) + timedelta(days=1)
+    dates = [(dt_start + timedelta(days=i)).date() for i in range((dt_end - dt_start).days)]
+
+    ts = get_ts()
+    jd_start = ts.from_datetime(dt_start).tt
+    jd_end = ts.from_datetime(dt_end).tt
+    jd_grid = np.append(np.arange(jd_start, jd_end, GRID_STEP_DAYS), jd_end)
+
+    obs_xyz, up = _observer_vectors(latlons)
+    n_locations = len(latlons)
+
+    sun_results = []
+    moon_results = []
+    for _ in range(n_locations):
+        sun_results.append({
+            d: {key: '-' for key in SUN_EVENT_KEYS} for d in dates
+        })
+        moon_results.append({d: {'age': '-', 'rise': '-', 'set': '-'} for d in dates})
+
+    def assign(results, loc_idx, jd_roots, labels):
+        """求めた時刻を時刻順に各地点・各日のイベントへ書き込む (同じ日に2回あれば後のものを採用)"""
+        if len(jd_roots) == 0:
+            return
+        order = np.argsort(jd_roots, kind='stable')
+        local_times = ts.tt_jd(jd_roots[order]).astimezone(tz)
+        for k, local_t in zip(order, local_times):
+            day_data = results[loc_idx[k]].get(local_t.date())
+            if day_data is not None:
+                day_data[labels[k]] = local_t.strftime('%H:%M')
+
+    # 太陽の4つのしきい値と月の地平線を、同じ時刻グリッド上でまとめて解く
+    altitudes = {
+        body: _topocentric_altitude(_apparent_itrs(body, jd_grid)[:, None, :], obs_xyz[:, :, None], up[:, :, None])
+        for body in ('sun', 'moon')
+    }
+    k_idx, loc_idx, roots, rising = _solve_crossings(jd_grid, altitudes, obs_xyz, up)
+    for body, results in (('sun', sun_results), ('moon', moon_results)):
+        mask = np.array([CROSSING_THRESHOLDS[k][0] == body for k in k_idx], dtype=bool)
+        labels = [
+            CROSSING_THRESHOLDS[k][2] if r else CROSSING_THRESHOLDS[k][3]
+            for k, r in zip(k_idx[mask], rising[mask])
+        ]
+        assign(results, loc_idx[mask], roots[mask], labels)
+
+    # 月齢 (正午の位相角) は地点に依存しないので1回だけ計算する
+    noons = [datetime(d.year, d.month, d.day, 12, 0, 0, tzinfo=tz) for d in dates]
+    phases = almanac.moon_phase(get_eph(jd_start, jd_end), ts.from_datetimes(noons)).degrees
+    ages = [f"{(phase / 360.0) * 29.530588:.1f}" for phase in phases]
+
+    for i in range(n_locations):
+        for d, age in zip(dates, ages):
+            moon_results[i][d]['age'] = age
+            sun_results[i][d]['撮影可能時間帯'] = _shooting_window(sun_results[i][d])
+
+    return {'sun': sun_results, 'moon': moon_results}
+
+def _compute_month_batch(latlons, year, month):
+    """
+    compute_almanac_batch を1ヶ月分実行し、地点ごとに get_sun_events_month / get_moon_data_month と
+    同じ {日: 辞書} 形式に変換して (太陽のリスト, 月のリスト) を返します。
+    """
+    _, days_in_month = calendar.monthrange(year, month)
+    first = datetime(year, month, 1).date()
+    last = datetime(year, month, days_in_month).date()
+    batch = compute_almanac_batch(latlons, first, last)
+    sun = [{d.day: v for d, v in per_loc.items()} for per_loc in batch['sun']]
+    moon = [{d.day: v for d, v in per_loc.items()} for per_loc in batch['moon']]
+    return sun, moon
+
+def _compute_and_save_month(prefecture_name, year, month):
+    """
+    1ヶ月分の太陽・月データを同じ時刻グリッドでまとめて計算し、両方を保存します。
+    同じ地点・年月の計算が同時に走らないよう single-flight でまとめ、後続は保存結果を読み出します。
+    """
+    def lookup():
+        sun = _get_almanac_month(prefecture_name, year, month, 'sun')
+        moon = _get_almanac_month(prefecture_name, year, month, 'moon')
+        return (sun, moon) if sun and moon else None
+
+    def compute():
+        lat, lon = PREF_COORDS[prefecture_name]
+        sun, moon = _compute_month_batch([(lat, lon)], year, month)
+        _save_almanac_month(prefecture_name, year, month, 'sun', sun[0])
+        _save_almanac_month(prefecture_name, year, month, 'moon', moon[0])
+        return sun[0], moon[0]
+
+    # 外部への取得は無いため、先行リクエストを待ちきれなければ自分で計算する
+    return single_flight.run(get_moon_db(), f"almanac:{prefecture_name}:{year}-{month:02d}", lookup, compute,
+                             fallback=compute)
+
+def get_moon_data_month(prefecture_name, year, month):
+    """
+    1ヶ月分の月の出・月の入り・月齢などのデータを一括計算（またはキャッシュから取得）します。
+    """
+    if prefecture_name not in PREF_COORDS:
+        prefecture_name = "東京(東京都)"
+        
+    # Check cache first
+    cached = _get_almanac_month(prefecture_name, year, month, 'moon')
+    if cached:
+        return cached
+
+    _, month_data = _compute_and_save_month(prefecture_name, year, month)
+    return month_data
+
+def get_sun_events_month(prefecture_name, year, month):
+    """
+    1ヶ月分の太陽イベント（日の出、日の入り、薄明）を一括計算（またはキャッシュから取得）します。
+    """
+    if prefecture_name not in PREF_COORDS:
+        prefecture_name = "東京(東京都)"
+        
+    cached = _get_almanac_month(prefecture_name, year, month, 'sun')
+    if cached:
+        return cached
+
+    month_sun_data, _ = _compute_and_save_month(prefecture_name, year, month)
+    return month_sun_data
+
+# --- 任意座標のグリッドキャッシュ ---
+# 座標を0.05度のセルに丸め、セル中心で1ヶ月分を計算する。
+# プロセス内LRU → almanac_days (location = グリッドキー) → 計算 の順に参照する。
+
+_grid_month_cache = LRUCache(maxsize=512)
+_grid_db_stats = {'db_hits': 0, 'computed': 0}
+_grid_stats_lock = threading.Lock()
+
+def _count_grid(name, n=1):
+    with _grid_stats_lock:
+        _grid_db_stats[name] += n
+
+def _copy_month(month_data):
+    """{日: {項目: 値}} の1ヶ月分を、呼び出し側が変更してもキャッシュに影響しないように複製する"""
+    return {day: dict(values) for day, values in month_data.items()}
+
+def _get_grid_month(lat, lon, year, month):
+    """
+    任意座標を含むグリッドセルの1ヶ月分の (太陽, 月) データを取得する。
+    LRU のエントリは全リクエストで共有するため、返すのはその複製。
+    """
+    key = grid_key(lat, lon)
+    cached = _grid_month_cache.get((key, year, month))
+    if cached:
+        return _copy_month(cached[0]), _copy_month(cached[1])
+
+    sun = _get_almanac_month(key, year, month, 'sun')
+    moon = _get_almanac_month(key, year, month, 'moon')
+    if sun and moon:
+        _count_grid('db_hits')
+    else:
+        def lookup():
+            sun = _get_almanac_month(key, year, month, 'sun')
+            moon = _get_almanac_month(key, year, month, 'moon')
+            return (sun, moon) if sun and moon else None
+
+        def compute():
+            cell_lat, cell_lon = snap_to_grid(lat, lon)
+            sun_list, moon_list = _compute_month_batch([(cell_lat, cell_lon)], year, month)
+            _save_almanac_month(key, year, month, 'sun', sun_list[0])
+            _save_almanac_month(key, year, month, 'moon', moon_list[0])
+            _count_grid('computed')
+            return sun_list[0], moon_list[0]
+
+        sun, moon = single_flight.run(get_moon_db(), f"almanac:{key}:{year}-{month:02d}", lookup, compute,
+                                      fallback=compute)
+
+    _grid_month_cache.put((key, year, month), (sun, moon))
+    return _copy_month(sun), _copy_month(moon)
+
+def get_grid_cache_stats():
+    """任意座標グリッドキャッシュのヒット・ミス回数 (LRU と SQLite の各層)"""
+    memory = _grid_month_cache.stats()
+    with _grid_stats_lock:
+        db_hits, computed = _grid_db_stats['db_hits'], _grid_db_stats['computed']
+    return {
+        'memory_hits': memory['hits'],
+        'memory_size': memory['size'],
+        'db_hits': db_hits,
+        'misses': computed,
+    }
+
 def _get_iss_tle():
     """
-    ISSの軌道要素(TLE)を取得します。キャッシュ(24時間有効)があればそれを使用し、
-    なければCelestrakから最新データを取得してキャッシュに保存します。
+    ISSの軌道要素(TLE)の3行を返します。
+    衛星カタログ (models.satellite_catalog) がDBのキャッシュから読み込んだものを使い、
+    Celestrak からの取得はカタログのバックグラウンド更新に任せます。
     """
     try:
-        conn = get_moon_db()
-        c = conn.cursor()
-        # 24時間以内の最新キャッシュを確認
-        res = c.execute(
-            "SELECT tle_data FROM iss_tle_cache WHERE updated_at > datetime('now', '-1 day') ORDER BY updated_at DESC LIMIT 1"
-        ).fetchone()
-        
-        if res:
-            print("ISS TLE: Using Cache")
-            return res['tle_data'].splitlines()
-            
-        # キャッシュがない、または古い場合は取得
-        print("ISS TLE: Fetching from Celestrak...")
-        import requests
-        stations_url = 'http://celestrak.org/NORAD/elements/stations.txt'
-        response = requests.get(stations_url, timeout=10)
-        if response.status_code == 200:
-            lines = response.text.splitlines()
-            # Find ISS
-            iss_lines = []
-            for i, line in enumerate(lines):
-                if 'ISS (ZARYA)' in line:
-                    iss_lines = lines[i:i+3]
-                    break
-            
-            if iss_lines:
-                print("ISS TLE: ISS data found and saved to cache")
-                tle_str = "\n".join(iss_lines)
-                c.execute("INSERT INTO iss_tle_cache (tle_data) VALUES (?)", (tle_str,))
-                conn.commit()
-                return iss_lines
-            else:
-                print("ISS TLE: 'ISS (ZARYA)' not found in stations.txt")
-        else:
-            print(f"ISS TLE: HTTP error {response.status_code}")
+        from models.satellite_catalog import get_satellite
+        _, tle_lines = get_satellite()
+        return tle_lines
     except Exception as e:
         print(f"ISS TLE Exception: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
     return None
 
 def get_timeline_events(prefecture_name, date_str):
@@ -491,50 +895,23 @@ def get_timeline_events(prefecture_name, date_str):
         add_event(moon_data.get('moon_rise'), '月の出', 'moon', 'fas fa-moon text-warning')
         add_event(moon_data.get('moon_set'), '月の入', 'moon_off', 'fas fa-moon text-secondary')
         
-    lat, lon = PREF_COORDS.get(prefecture_name, PREF_COORDS["東京(東京都)"])
-    location = wgs84.latlon(lat, lon)
-    
     try:
         dt = datetime.strptime(date_str, '%Y-%m-%d')
     except ValueError:
         pass
     else:
-        # ISS passes calculation
+        # ISS・天宮などの通過 (satellite_passes テーブルに計算済みの通過予測を範囲検索する)
         try:
-            iss_tle = _get_iss_tle()
-            if iss_tle and len(iss_tle) >= 3:
-                # Use load.tle_file compatible string or manual satellite creation
-                from skyfield.api import EarthSatellite
-                iss_sat = EarthSatellite(iss_tle[1], iss_tle[2], iss_tle[0], ts)
-                
-                t0 = ts.from_datetime(dt.replace(hour=0, minute=0, second=0, tzinfo=tz))
-                t1 = ts.from_datetime((dt + timedelta(days=1)).replace(hour=0, minute=0, second=0, tzinfo=tz))
-                t, evs = iss_sat.find_events(location, t0, t1, altitude_degrees=10.0)
-                
-                iss_passes = []
-                current_pass = None
-                for ti, event in zip(t, evs):
-                    is_sunlit = iss_sat.at(ti).is_sunlit(eph)
-                    obs_phase = almanac.dark_twilight_day(eph, location)(ti).item()
-                    is_dark = (obs_phase < 3)
-                    is_visible = bool(is_sunlit and is_dark)
-                    
-                    if event == 0:
-                        current_pass = {'start': ti.astimezone(tz), 'visible': is_visible}
-                    elif event == 1 and current_pass:
-                        alt, az, distance = (iss_sat - location).at(ti).altaz()
-                        current_pass['max_alt'] = int(alt.degrees)
-                        current_pass['visible'] = current_pass['visible'] or is_visible
-                    elif event == 2 and current_pass:
-                        current_pass['visible'] = current_pass['visible'] or is_visible
-                        if current_pass['visible']:
-                            iss_passes.append(current_pass)
-                        current_pass = None
-                        
-                for p in iss_passes:
-                    if p.get('max_alt', 0) > 20: 
-                        time_str = p['start'].strftime('%H:%M')
-                        add_event(time_str, f"ISS通過 (最大高度 {p['max_alt']}°)", 'iss', 'fas fa-satellite text-info')
+            from models.iss_passes import get_passes
+            if prefecture_name not in PREF_COORDS:
+                prefecture_name = "東京(東京都)"
+            day_start = dt.replace(tzinfo=tz)
+            passes = get_passes(get_moon_db(), prefecture_name, day_start, day_start + timedelta(days=1))
+
+            for p in passes:
+                if p['visible'] and (p['max_alt'] or 0) > 20:
+                    time_str = p['visible_start'].strftime('%H:%M')
+                    add_event(time_str, f"{p['label']}通過 (最大高度 {int(p['max_alt'])}°)", 'iss', 'fas fa-satellite text-info')
         except Exception as e:
             print("ISS Error in timeline:", e)
             
@@ -545,34 +922,13 @@ def get_timeline_events(prefecture_name, date_str):
 
 def get_iss_ground_track():
     """
-    ISSの現在位置と、今後90分間（約1周分）の地上軌跡を計算します。
+    ISSの現在位置と、今後90分間（約1周分）の地上軌跡を返します。
+    30秒刻みの軌跡を事前に伝播したバッファ (models.iss_track) から切り出します。
     """
-    from skyfield.api import EarthSatellite
-    
-    iss_tle = _get_iss_tle()
-    if not iss_tle or len(iss_tle) < 3:
+    from models.iss_track import get_track_window
+
+    window = get_track_window(minutes=90)
+    if window is None:
         return None
-        
-    iss_sat = EarthSatellite(iss_tle[1], iss_tle[2], iss_tle[0], ts)
-    
-    now = datetime.now(tz)
-    # タイムライン（現在から90分間、1分刻み）
-    times = [now + timedelta(minutes=i) for i in range(91)]
-    t_scale = ts.from_datetimes(times)
-    
-    geocentric = iss_sat.at(t_scale)
-    subpoints = wgs84.subpoint(geocentric)
-    
-    # 日照状況の判定
-    is_sunlit = geocentric.is_sunlit(eph)
-    
-    track = []
-    for i in range(len(times)):
-        track.append({
-            'time': times[i].strftime('%H:%M'),
-            'lat': subpoints.latitude.degrees[i],
-            'lng': subpoints.longitude.degrees[i],
-            'is_sunlit': bool(is_sunlit[i])
-        })
-        
+    _, _, track = window
     return track
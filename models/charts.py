@@ -0,0 +1,143 @@
+"""
+サーバー側で描く SVG のグラフ。
+1本の時間軸 (指定日の15時〜翌10時) に、暗い時間帯 (天文薄明の終了〜開始) と薄明の帯、
+毎時の星空指数の棒グラフを重ねて描きます。
+
+描画に使う値だけを正規化した辞書 (入力) にまとめ、その SHA-256 をキーにして描いた SVG をキャッシュします。
+同じハッシュは ETag としても使えるため、入力が変わらない限りブラウザは 304 で済みます。
+"""
+import json
+import hashlib
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+from zoneinfo import ZoneInfo
+
+from models.memory_cache import LRUCache
+
+tz = ZoneInfo('Asia/Tokyo')
+
+# 時間軸: 指定日の15時から19時間 (翌10時まで)。トップページの時系列データと同じ範囲
+CHART_START_HOUR = 15
+CHART_HOURS = 19
+
+CHART_WIDTH = 720
+CHART_HEIGHT = 220
+_MARGIN_LEFT, _MARGIN_RIGHT, _MARGIN_TOP, _MARGIN_BOTTOM = 36, 12, 24, 26
+
+# 星空指数の色 (トップページの時系列データの progress-bar と同じ区分)
+_STARRY_COLORS = [(80, '#198754'), (50, '#0dcaf0'), (30, '#ffc107'), (0, '#dc3545')]
+_DAY_COLOR, _TWILIGHT_COLOR, _DARK_COLOR = '#3a4a6b', '#1f2a4a', '#0b1030'
+
+_cache = LRUCache(maxsize=512)
+
+def _hours_since(day_offset, hhmm):
+    """'HH:MM' (当日なら day_offset=0, 翌日なら 1) の、軸の始まりからの経過時間 (時)。読めなければ None"""
+    try:
+        hour, minute = map(int, hhmm.split(':'))
+    except (AttributeError, ValueError):
+        return None
+    return round(day_offset * 24 + hour + minute / 60 - CHART_START_HOUR, 3)
+
+def chart_inputs(date_str, weather=None, sun=None, next_sun=None):
+    """
+    グラフの入力を、描画に使う値だけの辞書にまとめる (時刻はすべて軸の始まりからの時間)。
+    weather: get_weather_info の結果, sun / next_sun: 当日・翌日の get_sun_events の結果。
+    """
+    start = datetime.strptime(date_str, '%Y-%m-%d').replace(hour=CHART_START_HOUR, tzinfo=tz)
+    day_offsets = {date_str: 0, (start + timedelta(days=1)).strftime('%Y-%m-%d'): 1}
+    morning = next_sun or sun
+
+    inputs = {'date': date_str, 'hours': CHART_HOURS, 'starry': [], 'sun': None}
+    for h in (weather or {}).get('hourly') or []:
+        if h.get('date') not in day_offsets:
+            continue
+        x = _hours_since(day_offsets[h['date']], h.get('time'))
+        if x is not None and 0 <= x < CHART_HOURS:
+            inputs['starry'].append([x, h.get('starry_index', 0)])
+
+    if sun and morning:
+        inputs['sun'] = {
+            'sunset': _hours_since(0, sun.get('sunset')),
+            'dusk': _hours_since(0, sun.get('astro_dusk')),
+            'dawn': _hours_since(1, morning.get('astro_dawn')),
+            'sunrise': _hours_since(1, morning.get('sunrise')),
+            'labels': [sun.get('astro_dusk'), morning.get('astro_dawn')],
+        }
+
+    return inputs
+
+def chart_key(inputs):
+    """入力のハッシュ (キャッシュキー・ETag)"""
+    payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _starry_color(index):
+    for threshold, color in _STARRY_COLORS:
+        if index >= threshold:
+            return color
+    return _STARRY_COLORS[-1][1]
+
+def render_chart(inputs):
+    """chart_inputs の辞書から SVG の文字列を描く"""
+    hours = inputs['hours']
+    left, top = _MARGIN_LEFT, _MARGIN_TOP
+    plot_w = CHART_WIDTH - _MARGIN_LEFT - _MARGIN_RIGHT
+    plot_h = CHART_HEIGHT - _MARGIN_TOP - _MARGIN_BOTTOM
+    bottom = top + plot_h
+
+    def x_of(hour):
+        return round(left + plot_w * min(max(hour, 0), hours) / hours, 1)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {CHART_WIDTH} {CHART_HEIGHT}" '
+        f'width="100%" role="img" font-family="sans-serif" font-size="11">',
+        f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" fill="{_DAY_COLOR}"/>',
+    ]
+
+    # 薄明 (日の入り〜日の出) と暗い時間帯 (天文薄明の終了〜開始)
+    sun = inputs['sun']
+    legend = []
+    if sun and sun['sunset'] is not None and sun['sunrise'] is not None:
+        parts.append(f'<rect x="{x_of(sun["sunset"])}" y="{top}" width="{round(x_of(sun["sunrise"]) - x_of(sun["sunset"]), 1)}" '
+                     f'height="{plot_h}" fill="{_TWILIGHT_COLOR}"/>')
+    if sun and sun['dusk'] is not None and sun['dawn'] is not None:
+        parts.append(f'<rect x="{x_of(sun["dusk"])}" y="{top}" width="{round(x_of(sun["dawn"]) - x_of(sun["dusk"]), 1)}" '
+                     f'height="{plot_h}" fill="{_DARK_COLOR}"/>')
+        legend.append(f'暗い時間帯 {escape(sun["labels"][0])}〜{escape(sun["labels"][1])}')
+
+    # 毎時の星空指数 (0〜100%) の棒グラフ
+    if inputs['starry']:
+        bar_w = round(plot_w / hours * 0.6, 1)
+        for hour, index in inputs['starry']:
+            bar_h = round(plot_h * max(0, min(index, 100)) / 100, 1)
+            x = round(x_of(hour + 0.5) - bar_w / 2, 1)
+            parts.append(f'<rect x="{x}" y="{round(bottom - bar_h, 1)}" width="{bar_w}" height="{bar_h}" '
+                         f'fill="{_starry_color(index)}" fill-opacity="0.75"><title>{index}%</title></rect>')
+        legend.append('星空指数 (棒)')
+        for pct in (50, 100):
+            y = round(bottom - plot_h * pct / 100, 1)
+            parts.append(f'<text x="{left - 4}" y="{y + 4}" fill="#aab" text-anchor="end">{pct}%</text>')
+
+    # 時間軸 (3時間ごと)
+    first_hour = CHART_START_HOUR
+    for hour in range(0, hours + 1, 3):
+        x = x_of(hour)
+        parts.append(f'<line x1="{x}" y1="{bottom}" x2="{x}" y2="{bottom + 4}" stroke="#aab"/>')
+        parts.append(f'<text x="{x}" y="{bottom + 16}" fill="#aab" text-anchor="middle">{(first_hour + hour) % 24}時</text>')
+    parts.append(f'<text x="{left}" y="{top - 8}" fill="#dde">{" / ".join(legend)}</text>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+def get_chart(date_str, weather=None, sun=None, next_sun=None):
+    """グラフの (SVG, 入力のハッシュ) を返す。同じ入力なら描き直さずキャッシュを使う"""
+    inputs = chart_inputs(date_str, weather, sun, next_sun)
+    key = chart_key(inputs)
+    svg = _cache.get(key)
+    if svg is None:
+        svg = render_chart(inputs)
+        _cache.put(key, svg)
+    return svg, key
+
+def get_stats():
+    """SVG キャッシュの集計 (このワーカープロセス内)"""
+    return _cache.stats()
@@ -0,0 +1,74 @@
+"""
+API の集約エンドポイントで、互いに独立した取得・計算 (天気のHTTP取得と Skyfield の計算など) を
+スレッドプールで同時に実行するためのヘルパー。
+
+各処理には個別の締め切りがあり、間に合わなかった処理は None として部分的な結果を返します。
+締め切りを過ぎた処理もバックグラウンドで完了まで実行されるため、結果はキャッシュに保存され次回に使われます。
+スレッドプールは処理の名前 (weather, sun, moon など) ごとに分けているため、遅い天気の取得がスレッドを
+使い切っても、天文計算が待たされて締め切りを過ぎることはありません。
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import current_app
+
+from models.weather import WEATHER_FETCH_BUDGET_SECONDS
+
+# 処理の名前ごとのスレッドプールの大きさ
+MAX_WORKERS_PER_KIND = 4
+
+# スポット詳細の集約エンドポイントで使う各処理の締め切り (秒)。
+# 天気は HTTP 取得の上限 (再試行を含む) の後に、保存と集計の分の余裕を持たせる
+WEATHER_DEADLINE_SECONDS = WEATHER_FETCH_BUDGET_SECONDS + 0.5
+ASTRO_DEADLINE_SECONDS = 8.0
+
+_executors = {}
+_executors_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(kind):
+    """処理の名前ごと・プロセスごとのスレッドプール (fork 後の子プロセスでは作り直す)"""
+    global _executors_pid
+    with _executor_lock:
+        if _executors_pid != os.getpid():
+            _executors.clear()
+            _executors_pid = os.getpid()
+        executor = _executors.get(kind)
+        if executor is None:
+            executor = _executors[kind] = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS_PER_KIND, thread_name_prefix=f'fanout-{kind}')
+        return executor
+
+
+def run_parallel(parts):
+    """
+    parts: {名前: (関数, 締め切り秒数)} を同時に実行し、(結果の辞書, 締め切りに間に合わなかった名前のリスト) を返す。
+    関数は引数なしで呼び出され、アプリケーションコンテキスト内 (get_moon_db などが使える) で実行されます。
+    名前ごとに別のスレッドプールで実行します。例外を送出した処理の結果も None になります。
+    """
+    app = current_app._get_current_object()
+
+    def call_in_context(func):
+        with app.app_context():
+            return func()
+
+    started = time.monotonic()
+    futures = {name: _get_executor(name).submit(call_in_context, func) for name, (func, _) in parts.items()}
+
+    results = {}
+    timed_out = []
+    for name, future in futures.items():
+        deadline = parts[name][1]
+        remaining = max(0.0, started + deadline - time.monotonic())
+        try:
+            results[name] = future.result(timeout=remaining)
+        except TimeoutError:
+            results[name] = None
+            timed_out.append(name)
+        except Exception as e:
+            print(f"Fan-out part '{name}' error: {e}")
+            results[name] = None
+    return results, timed_out
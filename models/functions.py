@@ -117,17 +117,20 @@ def init_db():
         )
     ''')
 
-    # weather_cache テーブル
-    cursor_moon.execute('''
-        CREATE TABLE IF NOT EXISTS weather_cache (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            prefecture TEXT NOT NULL,
-            date_str TEXT NOT NULL,
-            data_json TEXT NOT NULL,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(prefecture, date_str)
-        )
-    ''')
+    # weather_hourly テーブル (都道府県・グリッドセルごとの毎時天気)。旧形式の weather_cache は削除する
+    from models.weather import WEATHER_HOURLY_SCHEMA
+    for statement in WEATHER_HOURLY_SCHEMA:
+        cursor_moon.execute(statement)
+
+    # cache_leases テーブル (キャッシュミス時の single-flight 用リース)
+    from models.single_flight import CACHE_LEASES_SCHEMA
+    for statement in CACHE_LEASES_SCHEMA:
+        cursor_moon.execute(statement)
+
+    # satellite_passes / satellite_pass_runs テーブル (衛星 × TLEエポック × 地点の通過予測)
+    from models.iss_passes import SATELLITE_PASSES_SCHEMA
+    for statement in SATELLITE_PASSES_SCHEMA:
+        cursor_moon.execute(statement)
 
     # astro_cache テーブル (月単位の計算結果キャッシュ)
     cursor_moon.execute('''
@@ -142,6 +145,11 @@ def init_db():
         )
     ''')
 
+    # almanac_days テーブル (地点×日付ごとの太陽・月イベント)
+    from models.astro_calc import ALMANAC_DAYS_SCHEMA
+    for statement in ALMANAC_DAYS_SCHEMA:
+        cursor_moon.execute(statement)
+
     # iss_tle_cache テーブル (ISSの軌道要素キャッシュ)
     cursor_moon.execute('''
         CREATE TABLE IF NOT EXISTS iss_tle_cache (
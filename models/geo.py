@@ -0,0 +1,139 @@
+"""
+緯度・経度を扱う共通処理をまとめたモジュール。
+任意座標の計算結果をキャッシュするためのグリッドへの丸め(量子化)、2点間の距離、
+最寄りの潮汐観測所・都道府県庁所在地を探す最近傍検索の索引などを提供します。
+
+最近傍検索では地点を単位球上の3次元ベクトルに変換して KD-tree (scipy.spatial.cKDTree) に入れ、
+弦の長さで探してから大円距離 (km) に直して返します。索引は最初に使われたときに一度だけ作ります。
+"""
+import os
+import json
+import math
+import threading
+
+import numpy as np
+
+# 任意座標キャッシュのグリッド間隔 (度)。0.05度 ≒ 南北5.5km で、日の出入りの差は1分未満
+GRID_CELL_DEGREES = 0.05
+
+# 地球の半径 (km)
+EARTH_RADIUS_KM = 6371.0
+
+REGION_COORDINATES_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'region_coordinates.json')
+
+def snap_to_grid(lat, lng, cell_degrees=GRID_CELL_DEGREES):
+    """緯度経度を、それを含むグリッドセルの中心座標に丸める"""
+    cell_lat = (math.floor(lat / cell_degrees) + 0.5) * cell_degrees
+    cell_lng = (math.floor(lng / cell_degrees) + 0.5) * cell_degrees
+    return round(cell_lat, 6), round(cell_lng, 6)
+
+def grid_key(lat, lng, cell_degrees=GRID_CELL_DEGREES):
+    """グリッドセルを表すキャッシュキー (例: 'grid0.05:35.675,139.725')"""
+    cell_lat, cell_lng = snap_to_grid(lat, lng, cell_degrees)
+    return f"grid{cell_degrees:g}:{cell_lat:.4f},{cell_lng:.4f}"
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """ハバーサイン公式で2点間の大円距離(km)を計算する。スカラーでも NumPy 配列でも使える"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return float(distance) if np.ndim(distance) == 0 else distance
+
+def _unit_vectors(lats, lngs):
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lng = np.radians(np.asarray(lngs, dtype=float))
+    return np.stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)], axis=-1)
+
+class PointIndex:
+    """地点 (キー・緯度・経度) の最近傍検索の索引"""
+
+    def __init__(self, keys, lats, lngs):
+        # scipy.spatial の import は重い (約0.2秒) ため、最初に索引を作るときまで遅らせる
+        from scipy.spatial import cKDTree
+        self.keys = list(keys)
+        self._tree = cKDTree(_unit_vectors(lats, lngs))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def nearest(self, lats, lngs, k=1):
+        """
+        各地点から近い順に k 個の (距離km, 索引上の番号) を返す。
+        lats/lngs が配列 (N,) なら (N, k) (k=1 なら (N,)) の配列をまとめて返す。
+        """
+        chord, idx = self._tree.query(_unit_vectors(lats, lngs), k=k)
+        # 単位球上の弦の長さ → 中心角 → 大円距離
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+        return distance, idx
+
+    def nearest_key(self, lat, lng):
+        """1地点の最寄りの (キー, 距離km)。索引が空なら (None, inf)"""
+        if not self.keys:
+            return None, float('inf')
+        distance, idx = self.nearest(lat, lng)
+        return self.keys[int(idx)], float(distance)
+
+    def nearest_keys(self, lats, lngs):
+        """複数地点の最寄りのキーのリストと距離(km)の配列"""
+        distance, idx = self.nearest(lats, lngs)
+        return [self.keys[i] for i in np.atleast_1d(idx)], np.atleast_1d(distance)
+
+_indexes = {}
+_lock = threading.Lock()
+
+def _get_index(name, build):
+    with _lock:
+        index = _indexes.get(name)
+        if index is None:
+            index = _indexes[name] = build()
+        return index
+
+def _build_port_index():
+    try:
+        with open(REGION_COORDINATES_PATH, encoding='utf-8') as f:
+            region_coords = json.load(f)
+    except FileNotFoundError:
+        region_coords = {}
+    keys = [(int(pc), int(info['hc'])) for pc, info in region_coords.items()]
+    return PointIndex(keys,
+                      [info['lat'] for info in region_coords.values()],
+                      [info['lng'] for info in region_coords.values()])
+
+def get_port_index():
+    """潮汐観測所 (region_coordinates.json) の索引。キーは (pc, hc)"""
+    return _get_index('ports', _build_port_index)
+
+def _build_city_index():
+    from models.weather import PREFECTURE_COORDS
+    return PointIndex(PREFECTURE_COORDS.keys(),
+                      [coords['lat'] for coords in PREFECTURE_COORDS.values()],
+                      [coords['lng'] for coords in PREFECTURE_COORDS.values()])
+
+def get_city_index():
+    """都道府県庁所在地 (PREFECTURE_COORDS) の索引。キーは都道府県名"""
+    return _get_index('cities', _build_city_index)
+
+def port_id(port):
+    """(pc, hc) を photo_spots.nearest_port_id の形式 'pc_hc' にする"""
+    return f"{port[0]}_{port[1]}" if port is not None else None
+
+def reassign_nearest_ports(conn):
+    """
+    photo_spots の全スポットの nearest_port_id を、現在の観測所の索引でまとめて付け直す。
+    変更があった行数を返す。
+    """
+    rows = conn.execute('SELECT id, latitude, longitude, nearest_port_id FROM photo_spots').fetchall()
+    if not rows:
+        return 0
+    index = get_port_index()
+    if not len(index):
+        return 0
+    ports, _ = index.nearest_keys([row[1] for row in rows], [row[2] for row in rows])
+    updates = [
+        (port_id(port), row[0])
+        for row, port in zip(rows, ports)
+        if port_id(port) != row[3]
+    ]
+    with conn:
+        conn.executemany('UPDATE photo_spots SET nearest_port_id = ? WHERE id = ?', updates)
+    return len(updates)
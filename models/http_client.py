@@ -0,0 +1,180 @@
+"""
+外部API (Open-Meteo, Celestrak, tide736.net など) への HTTP 通信をまとめる共通クライアント。
+
+ホストごとに requests.Session (コネクションプール・keep-alive) を持ち、
+同時接続数の上限、接続/読み込みタイムアウト、ジッター付きの再試行、全体の時間の上限 (budget) を一か所で扱います。
+ホストごとのリクエスト数・エラー数・レイテンシは get_stats() で参照できます。
+"""
+import os
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (接続タイムアウト, 読み込みタイムアウト) 秒
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# 1ホストあたりの同時リクエスト数の上限 (= コネクションプールの大きさ)
+MAX_CONNECTIONS_PER_HOST = 8
+
+# 再試行の回数と待ち時間 (指数バックオフ + フルジッター)
+MAX_RETRIES = 2
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 4.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+USER_AGENT = 'lunatide/1.0'
+
+
+class HostStats:
+    """1ホスト分の通信の集計"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_error = None
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'avg_latency_ms': round(self.total_latency / self.requests * 1000, 1) if self.requests else None,
+            'max_latency_ms': round(self.max_latency * 1000, 1),
+            'last_error': self.last_error,
+        }
+
+
+class _HostClient:
+    """ホストごとの Session と同時接続数のセマフォ"""
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONNECTIONS_PER_HOST)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.slots = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+        self.stats = HostStats()
+
+
+_clients = {}
+_clients_pid = None
+_lock = threading.Lock()
+
+
+def _get_host_client(host):
+    """host の _HostClient を返す。fork 後の子プロセスでは接続を共有しないよう作り直す"""
+    global _clients_pid
+    with _lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(host)
+        if client is None:
+            client = _clients[host] = _HostClient()
+        return client
+
+
+def _backoff(attempt):
+    """attempt 回目の再試行前の待ち時間 (0〜上限のランダム)"""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def _split_timeout(timeout):
+    """timeout (秒 または (接続, 読み込み)) を (接続, 読み込み) にする"""
+    if isinstance(timeout, tuple):
+        return timeout
+    return timeout, timeout
+
+
+def worst_case_seconds(timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES):
+    """budget を渡さない get() 1回が失敗するまでにかかりうる最大の時間 (秒)"""
+    connect, read = _split_timeout(timeout)
+    backoff = sum(min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)) for attempt in range(retries))
+    return (retries + 1) * (connect + read) + backoff
+
+
+def _is_retryable_error(error):
+    # 読み込みタイムアウト (相手は接続を受けたが応答が遅い) は、再試行しても同じだけ待つことになるので再試行しない
+    return not isinstance(error, requests.ReadTimeout)
+
+
+def get(url, params=None, timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES, budget=None, **kwargs):
+    """
+    GET リクエストを送り、requests.Response を返す。
+    接続エラー・接続タイムアウト・RETRY_STATUS_CODES の応答は retries 回まで再試行し、
+    最後まで失敗した場合は例外を送出 (ステータスコードの場合は最後の応答をそのまま返す) します。
+    読み込みタイムアウトは再試行しません。
+
+    budget (秒) を渡すと、接続枠の待ち・再試行・待ち時間を含めた全体をその時間内に収めます
+    (Webリクエストの処理中に呼ぶ場合に使う)。使い切ると requests.Timeout を送出します。
+    """
+    host = urlsplit(url).netloc
+    client = _get_host_client(host)
+    stats = client.stats
+    connect_timeout, read_timeout = _split_timeout(timeout)
+    deadline = time.monotonic() + budget if budget is not None else None
+
+    attempt = 0
+    while True:
+        attempt_timeout = (connect_timeout, read_timeout)
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not client.slots.acquire(timeout=remaining):
+                raise requests.Timeout(f"{host}: time budget of {budget}s exhausted")
+            remaining = max(0.01, deadline - time.monotonic())
+            attempt_timeout = (min(connect_timeout, remaining), min(read_timeout, remaining))
+        else:
+            client.slots.acquire()
+
+        started = time.monotonic()
+        try:
+            response = client.session.get(url, params=params, timeout=attempt_timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            response = None
+            error = e
+        else:
+            error = None
+        finally:
+            client.slots.release()
+        elapsed = time.monotonic() - started
+
+        with _lock:
+            stats.requests += 1
+            stats.total_latency += elapsed
+            stats.max_latency = max(stats.max_latency, elapsed)
+            if error is not None or response.status_code >= 400:
+                stats.errors += 1
+                stats.last_error = str(error) if error is not None else f"HTTP {response.status_code}"
+
+        if error is not None:
+            retryable = _is_retryable_error(error)
+        else:
+            retryable = response.status_code in RETRY_STATUS_CODES
+        delay = _backoff(attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            retryable = False
+        if not retryable or attempt >= retries:
+            if error is not None:
+                raise error
+            return response
+
+        if response is not None:
+            response.close()
+        with _lock:
+            stats.retries += 1
+        time.sleep(delay)
+        attempt += 1
+
+
+def get_stats():
+    """ホストごとの通信の集計を返す (このワーカープロセス内の集計)"""
+    with _lock:
+        return {host: client.stats.as_dict() for host, client in _clients.items()}
@@ -0,0 +1,695 @@
+"""
+人工衛星 (ISS・天宮など) の通過予測テーブル (satellite_passes) の計算と参照。
+
+衛星カタログのTLEエポックが変わるたびに、PASS_SATELLITES の全衛星 × 全都道府県 (PREF_COORDS) ×
+向こう10日分の通過をまとめて計算して保存し、トップページのタイムラインや /iss は
+このテーブルへの範囲検索だけで通過予測を表示します。
+
+計算は衛星ごとの find_events ではなく、sgp4 の SatrecArray で (衛星数 × 時刻数) の位置を一度に求め、
+全地点の高度を NumPy の配列演算で評価します。衛星を増やしても増えるのは SGP4 の伝播と
+配列演算の分だけで、太陽の位置などの共通の計算は1回で済みます。
+"""
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sgp4.api import SatrecArray
+from skyfield.api import EarthSatellite, wgs84
+from skyfield import almanac
+from skyfield.constants import AU_KM, DAY_S, ERAD
+from skyfield.nutationlib import iau2000b_radians
+from skyfield.sgp4lib import theta_GMST1982
+
+from models.astro_calc import PREF_COORDS, get_ts, get_eph, tz, _observer_vectors, _apparent_itrs
+from models import single_flight
+from models.satellite_catalog import get_catalog, get_satellite
+
+# 通過予測を計算する衛星 (stations.txt の名前)。肉眼で見える明るい宇宙ステーション
+PASS_SATELLITES = ['ISS (ZARYA)', 'CSS (TIANHE)']
+
+# 画面に表示する衛星の名前
+SATELLITE_LABELS = {
+    'ISS (ZARYA)': 'ISS',
+    'CSS (TIANHE)': '天宮 (CSS)',
+}
+
+# 通過予測を計算する期間 (日)
+PASS_HORIZON_DAYS = 10
+
+# 通過とみなす最低高度 (度)
+PASS_MIN_ALTITUDE = 10.0
+
+# 観測地が暗いとみなす太陽高度 (度)。航海薄明 (dark_twilight_day < 3) と同じ
+PASS_DARK_SUN_ALTITUDE = -6.0
+
+# 衛星の位置を求める時刻グリッドの間隔 (秒)。10度以上の通過は低軌道でも1分以上続く
+PASS_GRID_SECONDS = 30
+
+# 出入り・最大高度の時刻をニュートン法で絞り込む回数と、数値微分の刻み (秒)
+PASS_NEWTON_ITERATIONS = 2
+PASS_DERIVATIVE_SECONDS = 1.0
+
+# 見えはじめ・見えなくなる時刻をグリッドの間で二分探索する回数 (30秒 / 2^3 ≒ 4秒刻み)
+PASS_BISECT_ITERATIONS = 3
+
+# 通過ごとの可視区間を求めるサンプル数 (compute_location_passes で使用、10分程度の通過で約4秒刻み)
+PASS_SAMPLES = 145
+
+SATELLITE_PASSES_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS satellite_passes (
+        satellite TEXT NOT NULL,
+        tle_epoch TEXT NOT NULL,
+        location TEXT NOT NULL,
+        start_utc TEXT NOT NULL,
+        culminate_utc TEXT,
+        end_utc TEXT,
+        max_alt REAL,
+        start_visible INTEGER NOT NULL DEFAULT 0,
+        max_visible INTEGER NOT NULL DEFAULT 0,
+        end_visible INTEGER NOT NULL DEFAULT 0,
+        visible_start_utc TEXT,
+        visible_end_utc TEXT,
+        PRIMARY KEY (location, start_utc, satellite, tle_epoch)
+    ) WITHOUT ROWID
+    ''',
+    # 衛星・エポックごとに、どの期間まで (全地点を) 計算済みかを記録する
+    '''
+    CREATE TABLE IF NOT EXISTS satellite_pass_runs (
+        satellite TEXT NOT NULL,
+        tle_epoch TEXT NOT NULL,
+        horizon_start TEXT NOT NULL,
+        horizon_end TEXT NOT NULL,
+        computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (satellite, tle_epoch)
+    ) WITHOUT ROWID
+    ''',
+]
+
+_UTC_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def _ensure_tables(conn):
+    from database import ensure_schema
+    ensure_schema(conn, 'satellite_passes', SATELLITE_PASSES_SCHEMA)
+
+
+def _to_utc_str(dt):
+    return dt.astimezone(timezone.utc).strftime(_UTC_FORMAT)
+
+
+def _from_utc_str(value):
+    return datetime.strptime(value, _UTC_FORMAT).replace(tzinfo=timezone.utc).astimezone(tz)
+
+
+def _build_satellite(tle_lines):
+    """衛星カタログに同じTLEの解析済み衛星があればそれを使う"""
+    sat, catalog_lines = get_satellite(tle_lines[0].strip())
+    if sat is not None and catalog_lines == tle_lines:
+        return sat
+    return EarthSatellite(tle_lines[1], tle_lines[2], tle_lines[0].strip(), get_ts())
+
+
+def _horizon_start():
+    """計算期間の開始 (今日の0時, JST)"""
+    return datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _visibility(iss_sat, location, times):
+    """
+    配列の Time について一度に、見えるか (ISSに日が当たり、観測地が航海薄明より暗い) と ISS の高度(度) を返す。
+    """
+    # 章動は IAU2000B で十分 (IAU2000A はサンプル数が多いと計算時間の大半を占める)
+    times._nutation_angles_radians = iau2000b_radians(times)
+    is_sunlit = iss_sat.at(times).is_sunlit(get_eph())
+    # 0=Dark, 1=Astro, 2=Nautical, 3=Civil, 4=Day
+    is_dark = almanac.dark_twilight_day(get_eph(), location)(times) < 3
+    alt, _, _ = (iss_sat - location).at(times).altaz()
+    return is_sunlit & is_dark, alt.degrees
+
+
+def compute_location_passes(iss_sat, lat, lon, start, end):
+    """
+    1衛星・1地点の start〜end の通過 (高度10度以上) を Skyfield の find_events で計算し、
+    開始・最大高度・終了の時刻と、それぞれの時点で見えるか (衛星に日が当たり、観測地が暗い)、
+    および通過中に実際に見えはじめ・見えなくなる時刻を返す。
+
+    本番の計算は compute_passes (全衛星・全地点をまとめて計算) で行い、こちらは検証の基準に使う。
+    """
+    location = wgs84.latlon(lat, lon)
+    ts = get_ts()
+    t, events = iss_sat.find_events(location, ts.from_datetime(start), ts.from_datetime(end),
+                                    altitude_degrees=PASS_MIN_ALTITUDE)
+    events = np.asarray(events)
+    if len(events) == 0:
+        return []
+
+    # rise (0) ごとに直後の set (2) と、その間の culminate (1) を対応づける。
+    # 期間の端で rise か set が欠けている通過は捨てる
+    rises = np.flatnonzero(events == 0)
+    culms = np.flatnonzero(events == 1)
+    sets = np.flatnonzero(events == 2)
+    j = np.searchsorted(sets, rises)
+    rises = rises[j < len(sets)]
+    set_idx = sets[j[j < len(sets)]]
+    next_rise = np.append(rises[1:], len(events))
+    complete = set_idx < next_rise
+    rises, set_idx = rises[complete], set_idx[complete]
+    if len(rises) == 0:
+        return []
+
+    k = np.minimum(np.searchsorted(culms, rises), max(len(culms) - 1, 0))
+    culm_idx = culms[k] if len(culms) else np.full(len(rises), -1)
+    has_culm = (culm_idx > rises) & (culm_idx < set_idx)
+
+    # 全イベント時刻の可視・高度を一度に評価
+    event_visible, event_alt = _visibility(iss_sat, location, t)
+
+    # 通過ごとに rise〜set を PASS_SAMPLES 点に分け、(通過数 × サンプル数) の時刻を一度に評価して
+    # 実際に見えている区間 (日照・暗さ・高度10度以上) の最初と最後を求める
+    rise_tt, set_tt = t.tt[rises], t.tt[set_idx]
+    grid_tt = rise_tt[:, None] + (set_tt - rise_tt)[:, None] * np.linspace(0.0, 1.0, PASS_SAMPLES)
+    grid_visible, grid_alt = _visibility(iss_sat, location, ts.tt_jd(grid_tt.ravel()))
+    # rise/set は高度がちょうど10度のため、数値誤差分の余裕をみる
+    grid_visible = (grid_visible & (grid_alt >= PASS_MIN_ALTITUDE - 0.1)).reshape(grid_tt.shape)
+
+    any_visible = grid_visible.any(axis=1)
+    first = grid_visible.argmax(axis=1)
+    last = PASS_SAMPLES - 1 - grid_visible[:, ::-1].argmax(axis=1)
+    rows = np.arange(len(rises))
+    visible_start = ts.tt_jd(grid_tt[rows, first]).utc_datetime()
+    visible_end = ts.tt_jd(grid_tt[rows, last]).utc_datetime()
+
+    start_dt = t[rises].utc_datetime()
+    end_dt = t[set_idx].utc_datetime()
+    culm_dt = t[np.where(has_culm, culm_idx, rises)].utc_datetime()
+
+    return [
+        {
+            'start': start_dt[p],
+            'culminate': culm_dt[p] if has_culm[p] else None,
+            'end': end_dt[p],
+            'max_alt': float(event_alt[culm_idx[p]]) if has_culm[p] else None,
+            'start_visible': bool(event_visible[rises[p]]),
+            'max_visible': bool(event_visible[culm_idx[p]]) if has_culm[p] else False,
+            'end_visible': bool(event_visible[set_idx[p]]),
+            'visible_start': visible_start[p] if any_visible[p] else None,
+            'visible_end': visible_end[p] if any_visible[p] else None,
+        }
+        for p in range(len(rises))
+    ]
+
+
+def _sgp4_times(jd_tt):
+    """TT のユリウス日から、SGP4 に渡す (jd, fraction) と TEME→地球固定座標の回転角を求める"""
+    t = get_ts().tt_jd(jd_tt)
+    whole = np.broadcast_to(t.whole, t.shape)
+    fraction = t.tai_fraction - t._leap_seconds() / DAY_S
+    theta, _ = theta_GMST1982(t.whole, t.ut1_fraction)
+    return whole, fraction, theta
+
+
+def _teme_to_itrs(r_teme, theta):
+    """TEME の位置 (..., 時刻数, 3) をグリニッジ恒星時で回して地球固定座標にする (極運動は無視)"""
+    c, s = np.cos(theta), np.sin(theta)
+    x, y, z = r_teme[..., 0], r_teme[..., 1], r_teme[..., 2]
+    return np.stack([c * x + s * y, c * y - s * x, z], axis=-1)
+
+
+def _propagate(satrecs, jd_tt):
+    """SatrecArray で (衛星数, 時刻数, 3) の地球固定座標の位置 (km) を一度に求める"""
+    whole, fraction, theta = _sgp4_times(jd_tt)
+    errors, r, _ = satrecs.sgp4(whole, fraction)
+    r = np.where((errors != 0)[..., None], np.nan, r)
+    return _teme_to_itrs(r, theta)
+
+
+def _propagate_one(satrec, jd_tt):
+    """1衛星について、任意の時刻の配列 (N,) の地球固定座標の位置 (N, 3) km"""
+    whole, fraction, theta = _sgp4_times(jd_tt)
+    errors, r, _ = satrec.sgp4_array(np.ascontiguousarray(whole), fraction)
+    r = np.where((errors != 0)[:, None], np.nan, r)
+    return _teme_to_itrs(r, theta)
+
+
+def _altitude(sat_xyz, obs_xyz, up):
+    """衛星の位置 (..., 3) と観測地の位置・天頂方向 (..., 3) (km) から地平高度(度)"""
+    topo = sat_xyz - obs_xyz
+    return np.degrees(np.arcsin(np.sum(topo * up, axis=-1) / np.linalg.norm(topo, axis=-1)))
+
+
+def _is_sunlit(sat_xyz, sun_xyz):
+    """
+    衛星に日が当たっているか。衛星から太陽への直線が地球 (半径 ERAD の球) に遮られないか調べる
+    (Skyfield の is_sunlit と同じ判定)。位置は (..., 3) km
+    """
+    to_sun = sun_xyz - sat_xyz
+    u = to_sun / np.linalg.norm(to_sun, axis=-1, keepdims=True)
+    # 衛星から見た地球中心 c = -sat_xyz について、直線と球の交点 x = u·c ± sqrt(disc)
+    uc = -np.sum(u * sat_xyz, axis=-1)
+    disc = uc ** 2 - np.sum(sat_xyz ** 2, axis=-1) + (ERAD / 1000.0) ** 2
+    return (disc < 0) | (uc + np.sqrt(np.maximum(disc, 0.0)) <= 0)
+
+
+class _PassContext:
+    """全衛星で共有する計算条件 (時刻グリッド・観測地・太陽の位置)"""
+
+    def __init__(self, latlons, start, end):
+        step = PASS_GRID_SECONDS / DAY_S
+        ts = get_ts()
+        jd_start = ts.from_datetime(start).tt
+        jd_end = ts.from_datetime(end).tt
+        self.jd = jd_start + np.arange(int(np.ceil((jd_end - jd_start) / step)) + 1) * step
+        self.step = step
+
+        obs_au, up = _observer_vectors(latlons)
+        self.obs = (obs_au * AU_KM).T    # (地点数, 3) km
+        self.up = up.T                   # (地点数, 3)
+        self.obs_up = np.sum(self.obs * self.up, axis=1)
+        self.obs_sq = np.sum(self.obs ** 2, axis=1)
+        # 太陽の地心視位置 (グリッド上)。地球の自転による変化は30秒間隔なら線形補間で十分
+        self.sun = (_apparent_itrs('sun', self.jd) * AU_KM).T   # (時刻数, 3) km
+
+    def grid_sin_altitude(self, sat_xyz):
+        """グリッド上の衛星の位置 (時刻数, 3) から、全地点の高度の sin (地点数, 時刻数) を行列積で求める"""
+        height = self.up @ sat_xyz.T - self.obs_up[:, None]
+        distance_sq = np.sum(sat_xyz ** 2, axis=1)[None, :] - 2 * self.obs @ sat_xyz.T + self.obs_sq[:, None]
+        return height / np.sqrt(distance_sq)
+
+    def positions(self, satrec, jd_tt):
+        """任意の時刻の (衛星の位置, 太陽の位置) (N, 3) km"""
+        sun = np.stack([np.interp(jd_tt, self.jd, self.sun[:, k]) for k in range(3)], axis=-1)
+        return _propagate_one(satrec, jd_tt), sun
+
+    def altitude(self, satrec, jd_tt, loc_idx):
+        """時刻と地点の組の配列について、衛星の高度(度)"""
+        return _altitude(_propagate_one(satrec, jd_tt), self.obs[loc_idx], self.up[loc_idx])
+
+    def observe(self, sat, sun, loc_idx):
+        """衛星・太陽の位置と地点の組の配列について、(衛星の高度, 見えるか)"""
+        obs, up = self.obs[loc_idx], self.up[loc_idx]
+        alt = _altitude(sat, obs, up)
+        is_dark = _altitude(sun, obs, up) < PASS_DARK_SUN_ALTITUDE
+        return alt, _is_sunlit(sat, sun) & is_dark
+
+
+def _refine_crossings(ctx, satrec, jd_tt, loc_idx):
+    """高度が PASS_MIN_ALTITUDE を横切る時刻を、ニュートン法でまとめて絞り込む"""
+    h = PASS_DERIVATIVE_SECONDS / DAY_S
+    n = len(jd_tt)
+    for _ in range(PASS_NEWTON_ITERATIONS):
+        alt = ctx.altitude(satrec, np.concatenate([jd_tt, jd_tt + h]), np.concatenate([loc_idx, loc_idx]))
+        f0, f1 = alt[:n] - PASS_MIN_ALTITUDE, alt[n:] - PASS_MIN_ALTITUDE
+        slope = np.where(f1 != f0, f1 - f0, np.nan)
+        jd_tt = jd_tt - np.nan_to_num(f0 * h / slope)
+    return jd_tt
+
+
+def _refine_culminations(ctx, satrec, jd_tt, loc_idx):
+    """最大高度の時刻を、3点の放物線の頂点で間隔を狭めながら絞り込む"""
+    n = len(jd_tt)
+    for seconds in (PASS_GRID_SECONDS, 4.0, PASS_DERIVATIVE_SECONDS):
+        h = seconds / DAY_S
+        alt = ctx.altitude(satrec, np.concatenate([jd_tt - h, jd_tt, jd_tt + h]), np.tile(loc_idx, 3))
+        a0, a1, a2 = alt[:n], alt[n:2 * n], alt[2 * n:]
+        curvature = a0 - 2 * a1 + a2
+        offset = np.where(curvature < 0, 0.5 * (a0 - a2) / np.where(curvature < 0, curvature, -1.0), 0.0)
+        jd_tt = jd_tt + np.clip(offset, -1.0, 1.0) * h
+    return jd_tt
+
+
+def _visible_windows(ctx, satrec, sat_xyz, events, rise_i, set_i, loc_idx):
+    """
+    通過ごとに、rise・グリッド上の時刻・set を並べた (通過数 × 列数) で可視を評価し、
+    見えはじめ・見えなくなる時刻を隣り合う列の間の二分探索で絞り込む。
+    グリッド上の列は伝播済みの位置 sat_xyz をそのまま使い、rise/set は events (時刻, 衛星, 太陽) の位置を使う。
+    (見えるか, 見えはじめ, 見えなくなる) の配列を返す (見えない通過の時刻は NaN)。
+    """
+    (rise_jd, rise_sat, rise_sun), (set_jd, set_sat, set_sun) = events
+    n_pass = len(rise_jd)
+    rows = np.arange(n_pass)
+    width = int((set_i - rise_i).max()) + 2
+    cols = np.arange(width)
+    # 列 0 = rise, 列 1..(set_i - rise_i) = グリッド上の時刻, last_col = set, それ以降は set の複製 (評価しない)
+    last_col = set_i - rise_i + 1
+    grid_idx = np.minimum(rise_i[:, None] + cols, len(ctx.jd) - 1)
+    times = ctx.jd[grid_idx]
+    sat = sat_xyz[grid_idx]
+    sun = ctx.sun[grid_idx]
+    beyond = cols[None, :] >= last_col[:, None]
+    times = np.where(beyond, set_jd[:, None], times)
+    sat = np.where(beyond[..., None], set_sat[:, None, :], sat)
+    sun = np.where(beyond[..., None], set_sun[:, None, :], sun)
+    times[:, 0], sat[:, 0], sun[:, 0] = rise_jd, rise_sat, rise_sun
+
+    alt, visible = ctx.observe(sat, sun, loc_idx[:, None])
+    # rise/set は高度がちょうど10度のため、数値誤差分の余裕をみる
+    visible &= (alt >= PASS_MIN_ALTITUDE - 0.1) & ~(cols[None, :] > last_col[:, None])
+
+    any_visible = visible.any(axis=1)
+    first = visible.argmax(axis=1)
+    last = width - 1 - visible[:, ::-1].argmax(axis=1)
+
+    def bisect(outside, inside, loc):
+        # outside (見えない) と inside (見える) の間を狭めて、見える側の端を返す
+        for _ in range(PASS_BISECT_ITERATIONS):
+            mid = (outside + inside) / 2
+            alt, vis = ctx.observe(*ctx.positions(satrec, mid), loc)
+            vis &= alt >= PASS_MIN_ALTITUDE - 0.1
+            inside = np.where(vis, mid, inside)
+            outside = np.where(vis, outside, mid)
+        return inside
+
+    visible_start = times[rows, first]
+    visible_end = times[rows, last]
+    need_start = any_visible & (first > 0)
+    if need_start.any():
+        r = rows[need_start]
+        visible_start[r] = bisect(times[r, first[r] - 1], times[r, first[r]], loc_idx[r])
+    need_end = any_visible & (last < last_col)
+    if need_end.any():
+        r = rows[need_end]
+        visible_end[r] = bisect(times[r, last[r] + 1], times[r, last[r]], loc_idx[r])
+
+    visible_start[~any_visible] = np.nan
+    visible_end[~any_visible] = np.nan
+    return any_visible, visible_start, visible_end
+
+
+def _satellite_passes(ctx, satrec, sat_xyz):
+    """
+    1衛星の全地点の通過を求める。sat_xyz はグリッド上の位置 (時刻数, 3) km。
+    地点ごとの配列 (地点番号, 出・最大・入りの時刻, 最大高度, 各時点の可視, 可視区間) を返す。
+    """
+    # (地点数, 時刻数) の高度を行列積で一度に評価し、10度の上下の変化を全地点まとめて検出する
+    sin_alt = ctx.grid_sin_altitude(sat_xyz)
+    above = np.nan_to_num(sin_alt, nan=-1.0) >= np.sin(np.radians(PASS_MIN_ALTITUDE))
+    change = np.diff(above.astype(np.int8), axis=1)
+    loc, step = np.nonzero(change)
+    kind = change[loc, step]
+
+    # 同じ地点で rise (+1) の直後に set (-1) が続く組を通過とする (期間の端で欠けた通過は捨てる)
+    k = np.flatnonzero((kind[:-1] == 1) & (kind[1:] == -1) & (loc[:-1] == loc[1:]))
+    loc_idx, rise_i, set_i = loc[k], step[k], step[k + 1]
+    if len(k) == 0:
+        return None
+
+    def interpolate(i):
+        a0 = np.degrees(np.arcsin(sin_alt[loc_idx, i]))
+        a1 = np.degrees(np.arcsin(sin_alt[loc_idx, i + 1]))
+        return ctx.jd[i] + ctx.step * (PASS_MIN_ALTITUDE - a0) / (a1 - a0)
+
+    rise_jd = _refine_crossings(ctx, satrec, interpolate(rise_i), loc_idx)
+    set_jd = _refine_crossings(ctx, satrec, interpolate(set_i), loc_idx)
+
+    # 最大高度: 通過中のグリッドで最も高い点から絞り込む
+    width = int((set_i - rise_i).max())
+    cols = rise_i[:, None] + 1 + np.arange(width)
+    inside = cols <= set_i[:, None]
+    grid_alt = np.where(inside, sin_alt[loc_idx[:, None], np.minimum(cols, sin_alt.shape[1] - 1)], -np.inf)
+    peak = rise_i + 1 + grid_alt.argmax(axis=1)
+    culm_jd = np.clip(_refine_culminations(ctx, satrec, ctx.jd[peak], loc_idx), rise_jd, set_jd)
+
+    # 出・最大・入りの時刻の位置と可視をまとめて評価する
+    n = len(loc_idx)
+    event_jd = np.concatenate([rise_jd, culm_jd, set_jd])
+    event_sat, event_sun = ctx.positions(satrec, event_jd)
+    event_alt, event_visible = ctx.observe(event_sat, event_sun, np.tile(loc_idx, 3))
+
+    any_visible, visible_start, visible_end = _visible_windows(
+        ctx, satrec, sat_xyz,
+        ((rise_jd, event_sat[:n], event_sun[:n]), (set_jd, event_sat[2 * n:], event_sun[2 * n:])),
+        rise_i, set_i, loc_idx)
+
+    return {
+        'location': loc_idx,
+        'start': rise_jd, 'culminate': culm_jd, 'end': set_jd, 'max_alt': event_alt[n:2 * n],
+        'start_visible': event_visible[:n], 'max_visible': event_visible[n:2 * n],
+        'end_visible': event_visible[2 * n:],
+        'visible': any_visible, 'visible_start': visible_start, 'visible_end': visible_end,
+    }
+
+
+def compute_passes(satellites, latlons, start, end):
+    """
+    satellites {名前: EarthSatellite} の latlons 各地点での start〜end の通過 (高度10度以上) をまとめて計算する。
+
+    全衛星の位置を SatrecArray で時刻グリッド上に一度に伝播し、(地点数 × 時刻数) の高度の符号変化から
+    出入りを検出してニュートン法で絞り込む。可視判定 (衛星に日が当たり、観測地が航海薄明より暗い) と
+    可視区間も全通過分を配列でまとめて評価する。
+    {衛星名: [通過の辞書 (compute_location_passes と同じ形 + 'location': 地点番号), ...]} を返す。
+    """
+    names = list(satellites)
+    if not names:
+        return {}
+    ctx = _PassContext(latlons, start, end)
+    satrecs = [satellites[name].model for name in names]
+    positions = _propagate(SatrecArray(satrecs), ctx.jd)
+
+    results = {}
+    for name, satrec, sat_xyz in zip(names, satrecs, positions):
+        found = _satellite_passes(ctx, satrec, sat_xyz)
+        if found is None:
+            results[name] = []
+            continue
+        # 時刻はまとめて datetime に変換する (見えない通過の可視区間 NaN は仮に開始時刻で埋める)
+        to_dt = {
+            key: get_ts().tt_jd(np.where(np.isnan(found[key]), found['start'], found[key])).utc_datetime()
+            for key in ('start', 'culminate', 'end', 'visible_start', 'visible_end')
+        }
+        order = np.lexsort((found['start'], found['location']))
+        results[name] = [
+            {
+                'location': int(found['location'][p]),
+                'start': to_dt['start'][p],
+                'culminate': to_dt['culminate'][p],
+                'end': to_dt['end'][p],
+                'max_alt': float(found['max_alt'][p]),
+                'start_visible': bool(found['start_visible'][p]),
+                'max_visible': bool(found['max_visible'][p]),
+                'end_visible': bool(found['end_visible'][p]),
+                'visible_start': to_dt['visible_start'][p] if found['visible'][p] else None,
+                'visible_end': to_dt['visible_end'][p] if found['visible'][p] else None,
+            }
+            for p in order
+        ]
+    return results
+
+
+def _save_passes(conn, satellite, epoch, passes, locations, start, end):
+    """1衛星・1エポック分の全地点の通過を保存し、計算済み期間を記録する"""
+    with conn:
+        conn.execute('DELETE FROM satellite_passes WHERE satellite = ? AND tle_epoch = ?', (satellite, epoch))
+        conn.executemany('''
+            INSERT INTO satellite_passes (satellite, tle_epoch, location, start_utc, culminate_utc, end_utc,
+                                          max_alt, start_visible, max_visible, end_visible,
+                                          visible_start_utc, visible_end_utc)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+        ''', [
+            (
+                satellite, epoch, locations[p['location']], _to_utc_str(p['start']),
+                _to_utc_str(p['culminate']) if p['culminate'] else None,
+                _to_utc_str(p['end']), p['max_alt'],
+                int(p['start_visible']), int(p['max_visible']), int(p['end_visible']),
+                _to_utc_str(p['visible_start']) if p['visible_start'] else None,
+                _to_utc_str(p['visible_end']) if p['visible_end'] else None,
+            )
+            for p in passes
+        ])
+        conn.execute('''
+            INSERT INTO satellite_pass_runs (satellite, tle_epoch, horizon_start, horizon_end, computed_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(satellite, tle_epoch)
+            DO UPDATE SET horizon_start = excluded.horizon_start, horizon_end = excluded.horizon_end,
+                          computed_at = CURRENT_TIMESTAMP
+        ''', (satellite, epoch, _to_utc_str(start), _to_utc_str(end)))
+
+
+def _covered(conn, satellite, epoch, until):
+    """satellite × epoch の通過が until まで (全地点) 計算済みか"""
+    row = conn.execute(
+        'SELECT horizon_end FROM satellite_pass_runs WHERE satellite = ? AND tle_epoch = ?', (satellite, epoch)
+    ).fetchone()
+    return row is not None and row[0] >= _to_utc_str(until)
+
+
+def current_satellites():
+    """衛星カタログにある PASS_SATELLITES の {名前: (EarthSatellite, エポック)}"""
+    snapshot = get_catalog()
+    return {
+        name: (snapshot.satellites[name], snapshot.epochs[name])
+        for name in PASS_SATELLITES if name in snapshot.satellites
+    }
+
+
+def ensure_passes(conn, until=None):
+    """
+    PASS_SATELLITES の現在のエポックの通過が until (省略時は計算期間の終わり) まで計算済みでなければ、
+    足りない衛星をまとめて、今日から PASS_HORIZON_DAYS 日分・全地点を計算して保存する。
+    同じ衛星・エポックの組の計算は single-flight でまとめる。計算した衛星の数を返す。
+    """
+    _ensure_tables(conn)
+
+    start = _horizon_start()
+    end = start + timedelta(days=PASS_HORIZON_DAYS)
+    # 計算期間より先は計算しない (TLEの精度が落ちるため)
+    until = min(until or end, end)
+
+    satellites = current_satellites()
+    missing = {
+        name: (sat, epoch) for name, (sat, epoch) in satellites.items()
+        if not _covered(conn, name, epoch, until)
+    }
+    if not missing:
+        return 0
+
+    def lookup():
+        return True if all(_covered(conn, name, epoch, until) for name, (_, epoch) in missing.items()) else None
+
+    def compute():
+        locations = list(PREF_COORDS)
+        passes = compute_passes({name: sat for name, (sat, _) in missing.items()},
+                                [PREF_COORDS[loc] for loc in locations], start, end)
+        for name, (_, epoch) in missing.items():
+            _save_passes(conn, name, epoch, passes[name], locations, start, end)
+        return True
+
+    key = ','.join(f"{name}@{epoch}" for name, (_, epoch) in sorted(missing.items()))
+    single_flight.run(conn, f"satellite_passes:{key}", lookup, compute)
+    return len(missing)
+
+
+def run_pass_job(conn):
+    """
+    全衛星・全都道府県の通過を計算して保存し、現在のエポック以外の行を削除する。
+    計算した衛星の数を返す (計算済みの衛星はスキップ)。
+    """
+    computed = ensure_passes(conn)
+
+    current = {name: epoch for name, (_, epoch) in current_satellites().items()}
+    with conn:
+        for table in ('satellite_passes', 'satellite_pass_runs'):
+            for name, epoch in current.items():
+                conn.execute(f'DELETE FROM {table} WHERE satellite = ? AND tle_epoch != ?', (name, epoch))
+            placeholders = ','.join('?' * len(current))
+            conn.execute(f'DELETE FROM {table} WHERE satellite NOT IN ({placeholders})', list(current))
+    return computed
+
+
+_scheduled_keys = set()
+_scheduled_lock = threading.Lock()
+
+
+def schedule_pass_job():
+    """
+    現在のTLEについて、全衛星・全地点の通過予測をバックグラウンドのスレッドで計算する。
+    エポックの組ごと・計算期間の開始日ごとに1回 (日付が変わると計算期間の終わりも1日延びるため)
+    """
+    key = f"{_horizon_start().date()}:" + ','.join(
+        f"{name}@{epoch}" for name, (_, epoch) in sorted(current_satellites().items()))
+    with _scheduled_lock:
+        if key in _scheduled_keys:
+            return
+        _scheduled_keys.add(key)
+
+    def job():
+        from database import MOON_DATABASE
+        conn = sqlite3.connect(MOON_DATABASE)
+        conn.row_factory = sqlite3.Row
+        try:
+            computed = run_pass_job(conn)
+            print(f"Satellite passes: computed {computed} satellites for {key}")
+        except Exception as e:
+            print(f"Satellite pass job error: {e}")
+            with _scheduled_lock:
+                _scheduled_keys.discard(key)
+        finally:
+            conn.close()
+
+    threading.Thread(target=job, daemon=True).start()
+
+
+def _location_passes(satellite, sat, location, start, end):
+    """satellite_passes に無い通過を、1衛星・1地点だけ compute_location_passes で計算して get_passes の形で返す"""
+    lat, lon = PREF_COORDS[location]
+    return [
+        {
+            'satellite': satellite,
+            'label': SATELLITE_LABELS.get(satellite, satellite),
+            'start': p['start'].astimezone(tz),
+            'culminate': p['culminate'].astimezone(tz) if p['culminate'] else None,
+            'end': p['end'].astimezone(tz),
+            'max_alt': p['max_alt'],
+            'start_visible': p['start_visible'],
+            'max_visible': p['max_visible'],
+            'end_visible': p['end_visible'],
+            'visible_start': p['visible_start'].astimezone(tz) if p['visible_start'] else None,
+            'visible_end': p['visible_end'].astimezone(tz) if p['visible_end'] else None,
+            'visible': p['visible_start'] is not None,
+        }
+        for p in compute_location_passes(sat, lat, lon, start, end)
+        if start <= p['start'] < end
+    ]
+
+
+def get_passes(conn, location, start, end, satellites=None):
+    """
+    location の start〜end (aware datetime) に始まる通過を satellite_passes から取得する。
+    satellites (衛星名のリスト) を省略すると PASS_SATELLITES の全衛星。時刻は JST の datetime で返します。
+
+    リクエストの中では全地点の計算 (run_pass_job) はしない。まだ計算されていない衛星があれば
+    バックグラウンドの計算 (schedule_pass_job) を予約し、その衛星はこの地点の分だけ
+    compute_location_passes で計算する (失敗したらその衛星の通過は表示しない)。
+    """
+    _ensure_tables(conn)
+
+    # 計算期間より先は計算しない (TLEの精度が落ちるため)
+    end = min(end, _horizon_start() + timedelta(days=PASS_HORIZON_DAYS))
+    if start >= end:
+        return []
+
+    current = current_satellites()
+    names = [name for name in (satellites or PASS_SATELLITES) if name in current]
+    stored = [name for name in names if _covered(conn, name, current[name][1], end)]
+
+    passes = []
+    missing = [name for name in names if name not in stored]
+    if missing:
+        schedule_pass_job()
+    for name in missing:
+        try:
+            passes.extend(_location_passes(name, current[name][0], location, start, end))
+        except Exception as e:
+            print(f"Satellite pass error ({name}, {location}): {e}")
+
+    if stored:
+        conditions = ' OR '.join(['(satellite = ? AND tle_epoch = ?)'] * len(stored))
+        params = [value for name in stored for value in (name, current[name][1])]
+        rows = conn.execute(f'''
+            SELECT satellite, start_utc, culminate_utc, end_utc, max_alt, start_visible, max_visible, end_visible,
+                   visible_start_utc, visible_end_utc
+            FROM satellite_passes
+            WHERE location = ? AND start_utc >= ? AND start_utc < ? AND ({conditions})
+        ''', [location, _to_utc_str(start), _to_utc_str(end)] + params).fetchall()
+        passes.extend(
+            {
+                'satellite': row['satellite'],
+                'label': SATELLITE_LABELS.get(row['satellite'], row['satellite']),
+                'start': _from_utc_str(row['start_utc']),
+                'culminate': _from_utc_str(row['culminate_utc']) if row['culminate_utc'] else None,
+                'end': _from_utc_str(row['end_utc']),
+                'max_alt': row['max_alt'],
+                'start_visible': bool(row['start_visible']),
+                'max_visible': bool(row['max_visible']),
+                'end_visible': bool(row['end_visible']),
+                'visible_start': _from_utc_str(row['visible_start_utc']) if row['visible_start_utc'] else None,
+                'visible_end': _from_utc_str(row['visible_end_utc']) if row['visible_end_utc'] else None,
+                'visible': row['visible_start_utc'] is not None,
+            }
+            for row in rows
+        )
+
+    passes.sort(key=lambda p: p['start'])
+    return passes
@@ -0,0 +1,135 @@
+"""
+ISS の地上軌跡のバッファ。
+
+30秒刻みの軌跡 (緯度・経度・日照) を今後数周分だけプロセス内に持ち、時間が進んだら
+過ぎた点を捨てて足りない先の点だけを伝播して継ぎ足します。/api/iss/track は
+このバッファから要求された時間幅を切り出すだけなので、ポーリングのたびに衛星の伝播は発生しません。
+点は UNIX 時刻の30秒境界にそろえているため、同じ30秒の間の応答は同一 (ETag で 304 を返せる) です。
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from skyfield.api import wgs84
+
+from models.astro_calc import get_ts, get_eph, tz
+from models.satellite_catalog import get_catalog, ISS_NAME
+
+# 軌跡の点の間隔 (秒)
+TRACK_STEP_SECONDS = 30
+
+# バッファに持つ先の時間 (秒)。ISS の約3周分
+TRACK_BUFFER_SECONDS = 3 * 93 * 60
+
+# 1回の応答で返す時間幅の既定値と上限 (分)
+TRACK_DEFAULT_MINUTES = 90
+TRACK_MAX_MINUTES = TRACK_BUFFER_SECONDS // 60 - 1
+
+
+class _TrackBuffer:
+    """1つのTLEエポックについての軌跡の点 (UNIX時刻・緯度・経度・日照) の配列"""
+
+    def __init__(self, epoch):
+        self.epoch = epoch
+        self.times = np.empty(0, dtype=np.int64)
+        self.lat = np.empty(0)
+        self.lng = np.empty(0)
+        self.sunlit = np.empty(0, dtype=bool)
+
+
+_buffer = None
+_lock = threading.Lock()
+_stats = {'propagated_points': 0, 'extensions': 0, 'rebuilds': 0}
+
+
+def _propagate(sat, unix_times):
+    """UNIX時刻の配列について、衛星直下点の緯度・経度と日照をまとめて求める"""
+    t = get_ts().from_datetimes([datetime.fromtimestamp(int(u), timezone.utc) for u in unix_times])
+    geocentric = sat.at(t)
+    subpoints = wgs84.subpoint(geocentric)
+    return subpoints.latitude.degrees, subpoints.longitude.degrees, geocentric.is_sunlit(get_eph())
+
+
+def _align(unix_time):
+    """UNIX時刻を直前の TRACK_STEP_SECONDS 境界にそろえる"""
+    return int(unix_time) // TRACK_STEP_SECONDS * TRACK_STEP_SECONDS
+
+
+def _extend(buffer, sat, now):
+    """過ぎた点を捨て、now + TRACK_BUFFER_SECONDS まで足りない点だけを伝播して継ぎ足す"""
+    first = _align(now)
+    last = first + TRACK_BUFFER_SECONDS
+    # 時刻が巻き戻った (バッファより前を要求された) 場合は作り直す。
+    # 直前の点は、同時に来た少し前の時刻のリクエストのために1つ残す
+    keep = buffer.times >= first - TRACK_STEP_SECONDS
+    if len(buffer.times) and buffer.times[0] > first:
+        keep[:] = False
+    buffer.times, buffer.lat = buffer.times[keep], buffer.lat[keep]
+    buffer.lng, buffer.sunlit = buffer.lng[keep], buffer.sunlit[keep]
+
+    start = buffer.times[-1] + TRACK_STEP_SECONDS if len(buffer.times) else first
+    if start > last:
+        return
+    new_times = np.arange(start, last + 1, TRACK_STEP_SECONDS, dtype=np.int64)
+    lat, lng, sunlit = _propagate(sat, new_times)
+    buffer.times = np.concatenate([buffer.times, new_times])
+    buffer.lat = np.concatenate([buffer.lat, lat])
+    buffer.lng = np.concatenate([buffer.lng, lng])
+    buffer.sunlit = np.concatenate([buffer.sunlit, sunlit])
+    _stats['propagated_points'] += len(new_times)
+    _stats['extensions'] += 1
+
+
+def get_track_window(minutes=TRACK_DEFAULT_MINUTES, now=None):
+    """
+    現在 (30秒境界) から minutes 分先までの軌跡を返す。
+    (TLEエポック, 先頭の点のUNIX時刻, 点のリスト) のタプル。ISS がカタログに無ければ None。
+    """
+    snapshot = get_catalog()
+    sat = snapshot.satellites.get(ISS_NAME)
+    if sat is None:
+        return None
+    epoch = snapshot.epochs[ISS_NAME]
+    now = time.time() if now is None else now
+    minutes = max(1, min(int(minutes), TRACK_MAX_MINUTES))
+
+    global _buffer
+    with _lock:
+        if _buffer is None or _buffer.epoch != epoch:
+            # 新しいTLEでは軌跡が変わるので作り直す
+            _buffer = _TrackBuffer(epoch)
+            _stats['rebuilds'] += 1
+        _extend(_buffer, sat, now)
+        buffer = _buffer
+        start = _align(now)
+        lo = int(np.searchsorted(buffer.times, start))
+        hi = int(np.searchsorted(buffer.times, start + minutes * 60, side='right'))
+        times, lat, lng, sunlit = buffer.times[lo:hi], buffer.lat[lo:hi], buffer.lng[lo:hi], buffer.sunlit[lo:hi]
+
+    points = [
+        {
+            'time': datetime.fromtimestamp(int(u), tz).strftime('%H:%M'),
+            'timestamp': int(u),
+            'lat': float(latitude),
+            'lng': float(longitude),
+            'is_sunlit': bool(lit),
+        }
+        for u, latitude, longitude, lit in zip(times, lat, lng, sunlit)
+    ]
+    return epoch, start, points
+
+
+def track_cache_headers(start, now=None):
+    """同じ30秒の間はキャッシュしてよい (次の点の境界まで) Cache-Control ヘッダー"""
+    now = time.time() if now is None else now
+    max_age = max(0, int(start + TRACK_STEP_SECONDS - now))
+    return {"Cache-Control": f"public, max-age={max_age}"}
+
+
+def get_stats():
+    """軌跡バッファの集計 (このワーカープロセス内)"""
+    with _lock:
+        size = len(_buffer.times) if _buffer is not None else 0
+        epoch = _buffer.epoch if _buffer is not None else None
+    return dict(_stats, buffer_points=size, epoch=epoch)
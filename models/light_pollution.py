@@ -0,0 +1,160 @@
+"""
+光害 (夜空の明るさ) のラスターからボートルスケールを引くモジュール。
+
+日本全域を 30 秒角 (約1km) のグリッドに区切り、各セルのボートルスケール (1〜9, 0 はデータなし) を
+uint8 の .npy に保存しておき、np.load(mmap_mode='r') でメモリマップして参照します。
+座標からセルの行・列は割り算だけで求まるため、1地点でも大量の地点でも O(1) / 地点で引けます。
+
+ラスターは `flask spots build-bortle-raster <GeoTIFF>` で、人工光による夜空の明るさ (mcd/m²,
+World Atlas of Artificial Night Sky Brightness と同じ形式) の GeoTIFF から作ります (手順は README)。
+同梱のラスターは、GeoTIFF を指定せずに同じコマンドで都市からの距離による推定を各セルで計算したものです。
+ラスターが無い環境では None を返し、呼び出し側は都市からの距離による推定にフォールバックします。
+"""
+import os
+import json
+import threading
+
+import numpy as np
+
+RASTER_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'light_pollution')
+RASTER_PATH = os.path.join(RASTER_DIR, 'bortle_japan.npy')
+
+# ラスターの範囲 (度) とセルの大きさ (30秒角)
+RASTER_BOUNDS = {'lat_min': 24.0, 'lat_max': 46.0, 'lng_min': 122.0, 'lng_max': 149.0}
+RASTER_CELL_DEGREES = 1.0 / 120
+
+# 自然の夜空の明るさ (mcd/m²)。人工光の明るさに足して全体の明るさにする
+NATURAL_SKY_BRIGHTNESS = 0.171168
+
+# SQM (mag/arcsec²) の境界。これ以上暗ければ左からボートル 8, 7, ..., 1 (どれにも届かなければ 9)
+BORTLE_SQM_THRESHOLDS = [17.80, 18.38, 18.94, 19.50, 20.49, 21.69, 21.89, 21.99]
+
+def _meta_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+def brightness_to_bortle(artificial_mcd):
+    """人工光による夜空の明るさ (mcd/m²) の配列をボートルスケール (uint8, 負・NaN は 0) にする"""
+    artificial = np.asarray(artificial_mcd, dtype=np.float64)
+    valid = np.isfinite(artificial) & (artificial >= 0)
+    total = np.where(valid, artificial, 0.0) + NATURAL_SKY_BRIGHTNESS
+    sqm = -2.5 * np.log10(total / 1.08e8)
+    bortle = 9 - np.digitize(sqm, BORTLE_SQM_THRESHOLDS)
+    return np.where(valid, bortle, 0).astype(np.uint8)
+
+def _read_geotiff(source):
+    """GeoTIFF の画素配列と (左上の経度, 左上の緯度, 経度方向の画素幅, 緯度方向の画素高さ) を返す"""
+    import tifffile
+
+    with tifffile.TiffFile(source) as tif:
+        page = tif.pages[0]
+        scale = page.tags['ModelPixelScaleTag'].value
+        tiepoint = page.tags['ModelTiepointTag'].value
+        try:
+            # 非圧縮なら全体を読み込まずにメモリマップする (全球のファイルは数GBある)
+            data = tif.asarray(out='memmap')
+        except ValueError:
+            data = page.asarray()
+    lng0 = tiepoint[3] - tiepoint[0] * scale[0]
+    lat0 = tiepoint[4] + tiepoint[1] * scale[1]
+    return data, (lng0, lat0, scale[0], scale[1])
+
+def _cell_centers(bounds, cell_degrees):
+    """ラスターの各行の緯度・各列の経度 (セルの中心)"""
+    rows = int(round((bounds['lat_max'] - bounds['lat_min']) / cell_degrees))
+    cols = int(round((bounds['lng_max'] - bounds['lng_min']) / cell_degrees))
+    lats = bounds['lat_max'] - (np.arange(rows) + 0.5) * cell_degrees
+    lngs = bounds['lng_min'] + (np.arange(cols) + 0.5) * cell_degrees
+    return lats, lngs
+
+def _save_raster(raster, path, meta):
+    """ラスターとその範囲 (.json) を一時ファイル経由で置き換えて保存する"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp.npy'
+    np.save(tmp_path, raster)
+    with open(_meta_path(path) + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    os.replace(_meta_path(path) + '.tmp', _meta_path(path))
+    _rasters.pop(path, None)
+
+def build_raster(source, path=RASTER_PATH, bounds=RASTER_BOUNDS, cell_degrees=RASTER_CELL_DEGREES):
+    """
+    夜空の明るさの GeoTIFF (source) を、日本全域のボートルスケールの uint8 ラスターに変換して保存する。
+    各セルの中心に最も近い元の画素を使う (最近傍リサンプリング)。(行数, 列数) を返す。
+    """
+    data, (lng0, lat0, dx, dy) = _read_geotiff(source)
+
+    lats, lngs = _cell_centers(bounds, cell_degrees)
+    src_rows = np.floor((lat0 - lats) / dy).astype(np.int64)
+    src_cols = np.floor((lngs - lng0) / dx).astype(np.int64)
+    row_ok = (src_rows >= 0) & (src_rows < data.shape[0])
+    col_ok = (src_cols >= 0) & (src_cols < data.shape[1])
+
+    raster = np.zeros((len(lats), len(lngs)), dtype=np.uint8)
+    sampled = data[np.ix_(src_rows[row_ok], src_cols[col_ok])]
+    raster[np.ix_(row_ok, col_ok)] = brightness_to_bortle(sampled)
+
+    _save_raster(raster, path, dict(bounds, cell_degrees=cell_degrees, source=os.path.basename(source)))
+    return raster.shape
+
+def build_raster_from_estimate(estimate, source, path=RASTER_PATH, bounds=RASTER_BOUNDS,
+                               cell_degrees=RASTER_CELL_DEGREES):
+    """
+    ボートルスケールを推定する関数 estimate(lats, lngs) を各セルの中心で評価してラスターを作り、保存する。
+    夜空の明るさのデータが無いときに、推定を前もって計算しておくために使う。source はメタデータに残す説明。
+    (行数, 列数) を返す。
+    """
+    lats, lngs = _cell_centers(bounds, cell_degrees)
+    raster = np.empty((len(lats), len(lngs)), dtype=np.uint8)
+    # 1行ずつ評価して、全セル分の座標の配列を一度に作らないようにする
+    for i, lat in enumerate(lats):
+        raster[i] = estimate(np.full(len(lngs), lat), lngs)
+
+    _save_raster(raster, path, dict(bounds, cell_degrees=cell_degrees, source=source))
+    return raster.shape
+
+class _Raster:
+    """メモリマップしたラスターと、その範囲"""
+
+    def __init__(self, path):
+        self.data = np.load(path, mmap_mode='r')
+        with open(_meta_path(path), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.lat_max = meta['lat_max']
+        self.lng_min = meta['lng_min']
+        self.cell = meta['cell_degrees']
+
+    def lookup(self, lats, lngs):
+        rows = np.floor((self.lat_max - lats) / self.cell).astype(np.int64)
+        cols = np.floor((lngs - self.lng_min) / self.cell).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.data.shape[0]) & (cols >= 0) & (cols < self.data.shape[1])
+        values = np.zeros(np.shape(lats), dtype=np.uint8)
+        values[inside] = self.data[rows[inside], cols[inside]]
+        return values
+
+_rasters = {}
+_lock = threading.Lock()
+
+def _get_raster(path):
+    """ラスターをプロセスごとに一度だけメモリマップする。ファイルが無ければ None"""
+    with _lock:
+        if path not in _rasters:
+            try:
+                _rasters[path] = _Raster(path)
+            except FileNotFoundError:
+                print(f"Light pollution raster not found ({path}): using the city-distance estimate")
+                _rasters[path] = None
+            except Exception as e:
+                print(f"Light pollution raster load error: {e}")
+                _rasters[path] = None
+        return _rasters[path]
+
+def lookup_bortle(lats, lngs, path=RASTER_PATH):
+    """
+    緯度経度 (スカラーまたは配列) のボートルスケールをラスターから引く。
+    範囲外・データなしのセルは 0。ラスターが無ければ None を返す。
+    """
+    raster = _get_raster(path)
+    if raster is None:
+        return None
+    return raster.lookup(np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64))
@@ -0,0 +1,106 @@
+"""
+天体暦を使わない月齢・輝面比の計算 (Meeus『Astronomical Algorithms』第25・47・48章の低精度式)。
+
+月と太陽の視黄経を級数の主要項だけで求め、その差 (離角) から月齢を、位相角から輝面比を計算します。
+日付の配列に対して NumPy でまとめて計算するため、何年分の日付でも数ミリ秒以内で済み、
+天体暦の範囲 (de421 は1900〜2050年) の外でも計算できます。
+月齢の定義は astro_calc と同じ (正午 JST の almanac.moon_phase の位相角 / 360° × 朔望月) で、
+誤差は月齢で 0.01 日未満です (benchmark_moon_phase.py)。月の出・月の入りは引き続き Skyfield で計算します。
+"""
+import calendar
+
+import numpy as np
+
+SYNODIC_MONTH = 29.530588
+
+# 1970-01-01 00:00 UTC のユリウス日
+_UNIX_EPOCH_JD = 2440587.5
+# 正午 JST = 03:00 UTC
+_NOON_JST_OFFSET_DAYS = 3.0 / 24.0
+
+# 月の黄経の周期項 (Meeus 表47.A の振幅の大きい項)。(D, M, M', F, 係数 [1e-6 度])
+_LONGITUDE_TERMS = np.array([
+    (0, 0, 1, 0, 6288774), (2, 0, -1, 0, 1274027), (2, 0, 0, 0, 658314),
+    (0, 0, 2, 0, 213618), (0, 1, 0, 0, -185116), (0, 0, 0, 2, -114332),
+    (2, 0, -2, 0, 58793), (2, -1, -1, 0, 57066), (2, 0, 1, 0, 53322),
+    (2, -1, 0, 0, 45758), (0, 1, -1, 0, -40923), (1, 0, 0, 0, -34720),
+    (0, 1, 1, 0, -30383), (2, 0, 0, -2, 15327), (0, 0, 1, 2, -12528),
+    (0, 0, 1, -2, 10980), (4, 0, -1, 0, 10675), (0, 0, 3, 0, 10034),
+    (4, 0, -2, 0, 8548), (2, 1, -1, 0, -7888), (2, 1, 0, 0, -6766),
+    (1, 0, -1, 0, -5163), (1, 1, 0, 0, 4987), (2, -1, 1, 0, 4036),
+    (2, 0, 2, 0, 3994), (4, 0, 0, 0, 3861), (2, 0, -3, 0, 3665),
+    (0, 1, -2, 0, -2689), (2, 0, -1, 2, -2602), (2, -1, -2, 0, 2390),
+    (1, 0, 1, 0, -2348), (2, -2, 0, 0, 2236), (0, 1, 2, 0, -2120),
+    (0, 2, 0, 0, -2069), (2, -2, -1, 0, 2048), (2, 0, 1, -2, -1773),
+    (2, 0, 0, 2, -1595), (4, -1, -1, 0, 1215), (0, 0, 2, 2, -1110),
+], dtype=np.float64)
+
+def _delta_t_days(jd_ut):
+    """ΔT (TT - UT) の長期近似 (Morrison & Stephenson: -20 + 32u² 秒) を日で返す"""
+    u = (jd_ut - 2385800.5) / 36524.25  # 1820年からの世紀数
+    return (-20.0 + 32.0 * u * u) / 86400.0
+
+def _fundamental_arguments(jd_ut):
+    """J2000.0 からのユリウス世紀 T と、月の平均黄経 L'・D・M・M'・F (度) を返す"""
+    t = (jd_ut + _delta_t_days(jd_ut) - 2451545.0) / 36525.0
+    t2, t3, t4 = t * t, t ** 3, t ** 4
+    lp = 218.3164477 + 481267.88123421 * t - 0.0015786 * t2 + t3 / 538841.0 - t4 / 65194000.0
+    d = 297.8501921 + 445267.1114034 * t - 0.0018819 * t2 + t3 / 545868.0 - t4 / 113065000.0
+    m = 357.5291092 + 35999.0502909 * t - 0.0001536 * t2 + t3 / 24490000.0
+    mp = 134.9633964 + 477198.8675055 * t + 0.0087414 * t2 + t3 / 69699.0 - t4 / 14712000.0
+    f = 93.2720950 + 483202.0175233 * t - 0.0036539 * t2 - t3 / 3526000.0 + t4 / 863310000.0
+    return t, lp, d, m, mp, f
+
+def moon_phase(jd_ut):
+    """
+    ユリウス日 (UT) の配列に対して、月の位相角 (月と太陽の視黄経の差, 0〜360度) と輝面比 (0〜1) を返す。
+    位相角は almanac.moon_phase と同じ定義 (0: 新月, 180: 満月)
+    """
+    jd_ut = np.asarray(jd_ut, dtype=np.float64)
+    t, lp, d, m, mp, f = _fundamental_arguments(jd_ut)
+    rd, rm, rmp, rf = np.radians(d), np.radians(m), np.radians(mp), np.radians(f)
+
+    # 月の黄経 (第47章)。M を含む項は地球の軌道離心率の変化 E で補正する
+    e = 1.0 - 0.002516 * t - 0.0000074 * t * t
+    cd, cm, cmp, cf, coeff = _LONGITUDE_TERMS.T
+    arg = (np.multiply.outer(rd, cd) + np.multiply.outer(rm, cm)
+           + np.multiply.outer(rmp, cmp) + np.multiply.outer(rf, cf))
+    e_factor = np.power.outer(e, np.abs(cm))
+    sigma_l = np.sum(coeff * e_factor * np.sin(arg), axis=-1)
+    a1 = np.radians(119.75 + 131.849 * t)
+    a2 = np.radians(53.09 + 479264.290 * t)
+    sigma_l += 3958.0 * np.sin(a1) + 1962.0 * np.sin(np.radians(lp) - rf) + 318.0 * np.sin(a2)
+    moon_longitude = lp + sigma_l / 1e6
+
+    # 太陽の黄経 (第25章の低精度式)。章動は月と共通なので差をとると消え、光行差だけを引く
+    center = ((1.914602 - 0.004817 * t - 0.000014 * t * t) * np.sin(rm)
+              + (0.019993 - 0.000101 * t) * np.sin(2 * rm) + 0.000289 * np.sin(3 * rm))
+    sun_longitude = 280.46646 + 36000.76983 * t + 0.0003032 * t * t + center - 0.00569
+
+    phase = np.mod(moon_longitude - sun_longitude, 360.0)
+
+    # 輝面比 (第48章の位相角の近似式)
+    i = np.radians(180.0 - d - 6.289 * np.sin(rmp) + 2.100 * np.sin(rm) - 1.274 * np.sin(2 * rd - rmp)
+                   - 0.658 * np.sin(2 * rd) - 0.214 * np.sin(2 * rmp) - 0.110 * np.sin(rd))
+    illuminated = (1.0 + np.cos(i)) / 2.0
+    return phase, illuminated
+
+def noon_jd(dates):
+    """日付 (date / 'YYYY-MM-DD' / datetime64[D]) の配列の正午 JST のユリウス日 (UT)"""
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    return days + _UNIX_EPOCH_JD + _NOON_JST_OFFSET_DAYS
+
+def moon_ages(dates):
+    """日付の配列の正午 JST の (月齢, 輝面比) の配列を返す"""
+    phase, illuminated = moon_phase(noon_jd(dates))
+    return phase / 360.0 * SYNODIC_MONTH, illuminated
+
+def get_moon_ages_month(year, month):
+    """1ヶ月分の月齢を {日: {'age': '12.3', 'illumination': 0.87}} で返す (age は astro_calc と同じ表記)"""
+    _, days_in_month = calendar.monthrange(year, month)
+    start = np.datetime64(f"{year:04d}-{month:02d}-01", 'D')
+    ages, illuminated = moon_ages(start + np.arange(days_in_month))
+    return {
+        day: {'age': f"{age:.1f}", 'illumination': round(float(k), 3)}
+        for day, age, k in zip(range(1, days_in_month + 1), ages, illuminated)
+    }
@@ -0,0 +1,203 @@
+"""
+人工衛星カタログ (Celestrak の stations.txt) をプロセス内に保持するサービス。
+
+TLEの全文は iss_tle_cache に保存し、解析済みの EarthSatellite をエポックごとにメモリに持ちます。
+再読み込みと Celestrak からの取得はバックグラウンドのスレッドが定期的に行うため、
+/iss・/api/iss/track・トップページのタイムラインのリクエストでは解析も通信も発生しません。
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from skyfield.api import EarthSatellite
+
+from models.astro_calc import get_ts
+from models import http_client, single_flight
+
+# 宇宙ステーション群のTLE (Celestrak)
+CELESTRAK_STATIONS_URL = 'https://celestrak.org/NORAD/elements/stations.txt'
+
+# DBに入っているTLEがこれより古ければ Celestrak から取り直す (24時間)
+TLE_MAX_AGE_SECONDS = 24 * 3600
+
+# DB の再確認・必要なら再取得を行う間隔 (10分)
+CATALOG_RELOAD_SECONDS = 600
+
+# DBにTLEが無い場合に使う、リポジトリ同梱の stations.txt
+BUNDLED_STATIONS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'skyfield', 'stations.txt')
+
+ISS_NAME = 'ISS (ZARYA)'
+
+
+def parse_tle_text(text):
+    """TLEの全文 (名前行 + 2行 の繰り返し) を {衛星名: [名前行, 1行目, 2行目]} にする"""
+    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+    entries = {}
+    for i in range(1, len(lines) - 1):
+        if lines[i].startswith('1 ') and lines[i + 1].startswith('2 '):
+            name = lines[i - 1].strip()
+            entries[name] = [lines[i - 1], lines[i], lines[i + 1]]
+    return entries
+
+
+def tle_epoch(tle_lines):
+    """TLEの1行目からエポック (年の下2桁 + 通日) の文字列を取り出す"""
+    return tle_lines[1][18:32].strip()
+
+
+class CatalogSnapshot:
+    """ある時点のTLE全文を解析した結果 (読み取り専用で共有する)"""
+
+    def __init__(self, row_id, text):
+        self.row_id = row_id
+        self.tle_lines = parse_tle_text(text)
+        self.satellites = {
+            name: EarthSatellite(lines[1], lines[2], name, get_ts()) for name, lines in self.tle_lines.items()
+        }
+        self.epochs = {name: tle_epoch(lines) for name, lines in self.tle_lines.items()}
+        self.loaded_at = time.time()
+
+
+_snapshot = None
+_lock = threading.Lock()
+_refresher_pid = None
+
+
+def _connect():
+    from database import MOON_DATABASE
+    conn = sqlite3.connect(MOON_DATABASE)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _read_latest(conn):
+    try:
+        return conn.execute(
+            'SELECT id, tle_data, updated_at FROM iss_tle_cache ORDER BY updated_at DESC, id DESC LIMIT 1'
+        ).fetchone()
+    except sqlite3.OperationalError as e:
+        # init_db 前でテーブルが無い場合は同梱ファイルを使う
+        print(f"Satellite TLE read error: {e}")
+        return None
+
+
+def _is_fresh(row):
+    if row is None:
+        return False
+    updated_at = datetime.strptime(row['updated_at'], '%Y-%m-%d %H:%M:%S')
+    now_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+    return (now_utc - updated_at).total_seconds() < TLE_MAX_AGE_SECONDS
+
+
+def _fetch_and_store(conn):
+    """Celestrak から stations.txt の全文を取得して iss_tle_cache に保存する"""
+    print("Satellite TLE: Fetching from Celestrak...")
+    response = http_client.get(CELESTRAK_STATIONS_URL)
+    response.raise_for_status()
+    text = response.text
+    if ISS_NAME not in parse_tle_text(text):
+        raise ValueError(f"'{ISS_NAME}' not found in stations.txt")
+    conn.execute("INSERT INTO iss_tle_cache (tle_data) VALUES (?)", (text,))
+    conn.commit()
+    return _read_latest(conn)
+
+
+def refresh(conn, fetch=True):
+    """
+    DBの最新のTLEを読み込み、変わっていればカタログを差し替える。
+    fetch=True なら、24時間より古い場合に Celestrak から取得する (ワーカー間で1回にまとめる)。
+    """
+    global _snapshot
+    def lookup_fresh():
+        latest = _read_latest(conn)
+        return latest if _is_fresh(latest) else None
+
+    row = _read_latest(conn)
+    if fetch and not _is_fresh(row):
+        try:
+            row = single_flight.run(conn, 'tle:stations', lookup_fresh, lambda: _fetch_and_store(conn),
+                                    fallback=lambda: _read_latest(conn))
+        except Exception as e:
+            print(f"Satellite TLE fetch error: {e}")
+            row = _read_latest(conn)
+
+    if row is not None:
+        row_id, text = row['id'], row['tle_data']
+    else:
+        with open(BUNDLED_STATIONS_PATH, encoding='utf-8') as f:
+            row_id, text = None, f.read()
+
+    with _lock:
+        current = _snapshot
+    if current is not None and current.row_id == row_id:
+        return current
+
+    snapshot = CatalogSnapshot(row_id, text)
+    with _lock:
+        _snapshot = snapshot
+
+    # 通過予測の対象衛星のエポックが変わったら、全地点の通過予測をバックグラウンドで計算する
+    from models.iss_passes import PASS_SATELLITES, schedule_pass_job
+    if current is None or any(current.epochs.get(name) != snapshot.epochs.get(name) for name in PASS_SATELLITES):
+        schedule_pass_job()
+    return snapshot
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(CATALOG_RELOAD_SECONDS)
+        conn = _connect()
+        try:
+            refresh(conn)
+        except Exception as e:
+            print(f"Satellite catalog refresh error: {e}")
+        finally:
+            conn.close()
+
+
+def _ensure_refresher():
+    """プロセスごとに定期更新のスレッドを1つ起動する (fork 後の子プロセスでは改めて起動)"""
+    global _refresher_pid
+    with _lock:
+        if _refresher_pid == os.getpid():
+            return
+        _refresher_pid = os.getpid()
+
+    def first_refresh_then_loop():
+        conn = _connect()
+        try:
+            refresh(conn)
+        except Exception as e:
+            print(f"Satellite catalog refresh error: {e}")
+        finally:
+            conn.close()
+        _refresh_loop()
+
+    threading.Thread(target=first_refresh_then_loop, daemon=True).start()
+
+
+def get_catalog():
+    """
+    現在のカタログを返す。まだ読み込んでいなければ、通信せずにDB (無ければ同梱ファイル) から読み込む。
+    Celestrak からの取得はバックグラウンドのスレッドが行う。
+    """
+    with _lock:
+        snapshot = _snapshot
+    if snapshot is None:
+        conn = _connect()
+        try:
+            snapshot = refresh(conn, fetch=False)
+        finally:
+            conn.close()
+    _ensure_refresher()
+    return snapshot
+
+
+def get_satellite(name=ISS_NAME):
+    """(EarthSatellite, TLEの3行) を返す。カタログに無ければ (None, None)"""
+    snapshot = get_catalog()
+    if name not in snapshot.satellites:
+        return None, None
+    return snapshot.satellites[name], snapshot.tle_lines[name]
@@ -0,0 +1,137 @@
+"""
+キャッシュミス時の重複計算・重複取得をまとめる (single-flight)。
+
+同じキーについて最初に来たリクエストだけが計算・外部API取得を行い、
+同時に来た他のリクエストはその結果がキャッシュに入るのを待って読み出します。
+- 同一プロセス内: キーごとの threading.Lock
+- ワーカープロセス間 (gunicorn): SQLite の cache_leases テーブルによる期限付きリース
+"""
+import os
+import math
+import time
+import uuid
+import threading
+
+from models import http_client
+
+CACHE_LEASES_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS cache_leases (
+        key TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID
+    ''',
+]
+
+# リースの有効期限 (秒)。保持したプロセスが落ちても、この時間が過ぎれば他が引き継ぐ。
+# 先行リクエストの取得 (http_client の再試行をすべて使い切る場合) より長くして、取得中に他が引き継がないようにする
+LEASE_SECONDS = math.ceil(http_client.worst_case_seconds()) + 20
+
+# 他のリクエストの結果を待つ最大時間 (秒)。リースが切れるまでは待ち、過ぎたら fallback の値を返す
+WAIT_TIMEOUT_SECONDS = LEASE_SECONDS
+
+POLL_INTERVAL_SECONDS = 0.1
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+_stats = {'leader': 0, 'coalesced': 0, 'timeouts': 0}
+
+
+def _acquire_key_lock(key):
+    """キーごとのロックを取得する (参照カウントで不要になったロックは捨てる)"""
+    with _key_locks_guard:
+        entry = _key_locks.get(key)
+        if entry is None:
+            entry = _key_locks[key] = [threading.Lock(), 0]
+        entry[1] += 1
+    acquired = entry[0].acquire(timeout=WAIT_TIMEOUT_SECONDS)
+    return entry, acquired
+
+
+def _release_key_lock(key, entry, acquired):
+    if acquired:
+        entry[0].release()
+    with _key_locks_guard:
+        entry[1] -= 1
+        if entry[1] == 0 and _key_locks.get(key) is entry:
+            del _key_locks[key]
+
+
+def _try_lease(conn, key, owner):
+    """リースを取得できれば True。期限切れのリースは奪う"""
+    now = time.time()
+    cursor = conn.execute('''
+        INSERT INTO cache_leases (key, owner, expires_at) VALUES (?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+        WHERE cache_leases.expires_at < ?
+    ''', (key, owner, now + LEASE_SECONDS, now))
+    conn.commit()
+    return cursor.rowcount == 1
+
+
+def _release_lease(conn, key, owner):
+    conn.execute('DELETE FROM cache_leases WHERE key = ? AND owner = ?', (key, owner))
+    conn.commit()
+
+
+def _timed_out(fallback):
+    _stats['timeouts'] += 1
+    return fallback() if fallback is not None else None
+
+
+def run(conn, key, lookup, compute, fallback=None):
+    """
+    key についてキャッシュを読み、無ければ single-flight で compute() して結果を返す。
+
+    lookup(): 共有キャッシュ (SQLite) から有効な値を読む。無ければ None。
+    compute(): 計算・取得してキャッシュへ保存し、その値を返す。
+    fallback(): 先行リクエストを WAIT_TIMEOUT_SECONDS 待っても結果が無いときに返す値
+        (古いキャッシュなど)。省略すると None。上流への取得を重ねないよう、ここで compute() はしない。
+    """
+    from database import ensure_schema
+    ensure_schema(conn, 'cache_leases', CACHE_LEASES_SCHEMA)
+
+    entry, acquired = _acquire_key_lock(key)
+    try:
+        # 同じプロセスの先行リクエストが保存済みならそれを使う
+        value = lookup()
+        if value is not None:
+            _stats['coalesced'] += 1
+            return value
+        if not acquired:
+            # 同じプロセスの先行リクエストがまだ終わっていない
+            return _timed_out(fallback)
+
+        owner = f"{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex[:8]}"
+        deadline = time.monotonic() + WAIT_TIMEOUT_SECONDS
+        while not _try_lease(conn, key, owner):
+            # 他のワーカーが取得中。結果が保存されるか、リースが解放・期限切れになるまで待つ
+            time.sleep(POLL_INTERVAL_SECONDS)
+            value = lookup()
+            if value is not None:
+                _stats['coalesced'] += 1
+                return value
+            if time.monotonic() > deadline:
+                return _timed_out(fallback)
+
+        try:
+            # リース取得までの間に他のワーカーが保存している場合がある
+            value = lookup()
+            if value is not None:
+                _stats['coalesced'] += 1
+                return value
+            _stats['leader'] += 1
+            return compute()
+        finally:
+            try:
+                _release_lease(conn, key, owner)
+            except Exception as e:
+                print(f"Lease release error: {e}")
+    finally:
+        _release_key_lock(key, entry, acquired)
+
+
+def get_stats():
+    """single-flight の集計 (このワーカープロセス内)"""
+    return dict(_stats)
@@ -1,45 +1,51 @@
-import math
-from models.weather import PREFECTURE_COORDS
+import numpy as np
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """2点間の距離(km)を計算する (球面三角法)"""
-    R = 6371.0 # 地球の半径 km
-    
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    
-    a = math.sin(dlat / 2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    
-    distance = R * c
-    return distance
+from models.geo import get_city_index
+from models.light_pollution import lookup_bortle
+
+# 都市中心部からの距離(km)の境界と、それぞれの区間の推定ボートルスケール
+# (5km未満: 9 都市中心部, 10km: 8 都市部, 20km: 7 郊外への移行地, 35km: 6 明るい郊外, 50km: 5 郊外,
+#  70km: 4 地方への移行地, 100km: 3 地方, それ以上: 2 極めて暗い地方)
+CITY_DISTANCE_BINS_KM = [5, 10, 20, 35, 50, 70, 100]
+CITY_DISTANCE_BORTLE = [9, 8, 7, 6, 5, 4, 3, 2]
+
+def _estimate_from_city_distance(lats, lngs):
+    """主要都市(都道府県庁所在地)からの距離に基づいた簡易的な推定 (配列でまとめて計算)"""
+    # 最寄りの都道府県庁所在地までの距離 (models.geo の索引で検索)
+    min_dist, _ = get_city_index().nearest(lats, lngs)
+    return np.array(CITY_DISTANCE_BORTLE)[np.digitize(min_dist, CITY_DISTANCE_BINS_KM)]
+
+def estimate_bortle_scales(lats, lngs):
+    """
+    緯度経度の配列からボートルスケール(1-9)の配列をまとめて推定する。
+    光害ラスター (models.light_pollution) があればその値を使い、
+    ラスターが無い・範囲外・データなしの地点は都市からの距離で推定する。
+    """
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    scales = lookup_bortle(lats, lngs)
+    if scales is None:
+        return _estimate_from_city_distance(lats, lngs)
+    scales = scales.astype(int)
+    missing = scales == 0
+    if np.any(missing):
+        scales[missing] = _estimate_from_city_distance(lats[missing], lngs[missing])
+    return scales
 
 def estimate_bortle_scale(lat, lng):
     """
     緯度経度から大まかなボートルスケール(1-9)を推定する。
-    主要都市(都道府県庁所在地)からの距離に基づいた簡易的な計算。
+    光害ラスターがあればその値、無ければ主要都市(都道府県庁所在地)からの距離に基づいた簡易的な計算。
     """
-    min_dist = float('inf')
-    
-    for pref, coords in PREFECTURE_COORDS.items():
-        dist = calculate_distance(lat, lng, coords['lat'], coords['lng'])
-        if dist < min_dist:
-            min_dist = dist
-            
-    # 都市中心部からの距離に基づく推定マッピング
-    if min_dist < 5:
-        return 9 # 都市中心部 (中心地極めて明るい)
-    elif min_dist < 10:
-        return 8 # 都市部
-    elif min_dist < 20:
-        return 7 # 都市郊外の移行地
-    elif min_dist < 35:
-        return 6 # 明るい郊外
-    elif min_dist < 50:
-        return 5 # 郊外
-    elif min_dist < 70:
-        return 4 # 郊外と地方の移行地
-    elif min_dist < 100:
-        return 3 # 地方 (田舎)
-    else:
-        return 2 # 極めて暗い地方
+    return int(estimate_bortle_scales([lat], [lng])[0])
+
+def rescore_observation_spots(conn):
+    """observation_spots の全スポットの bortle_scale をまとめて推定し直す。変更があった行数を返す"""
+    rows = conn.execute('SELECT id, latitude, longitude, bortle_scale FROM observation_spots').fetchall()
+    if not rows:
+        return 0
+    scales = estimate_bortle_scales([row[1] for row in rows], [row[2] for row in rows])
+    updates = [(int(scale), row[0]) for row, scale in zip(rows, scales) if row[3] != scale]
+    with conn:
+        conn.executemany('UPDATE observation_spots SET bortle_scale = ? WHERE id = ?', updates)
+    return len(updates)
@@ -0,0 +1,294 @@
+"""
+tide736.net のタイドグラフ画像をサーバー側で一度だけ取得し、ディスクにキャッシュして配信するモジュール。
+
+画像ファイルは内容の SHA-256 をファイル名にして data/tide_images/<先頭2文字>/<sha256> に保存し
+(同じ内容の画像は1つだけ持つ)、どの (pc, hc, 日付) がどの画像かは tide_images テーブルで引きます。
+キャッシュ全体の大きさが TIDE_IMAGE_CACHE_MAX_BYTES を超えたら、最後に使われた時刻が古いものから消します (LRU)。
+ある日付のタイドグラフは後から変わらないため、配信時は長期間の immutable キャッシュを指定できます。
+取得に失敗した (pc, hc, 日付) は tide_image_failures に期限付きで記録し、期限までは取得し直さずに
+呼び出し側 (tide736.net へのリダイレクト) に任せます。
+"""
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from models import http_client, single_flight
+
+TIDE_IMAGE_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'tide_images')
+
+TIDE_IMAGE_URL = os.environ.get('TIDE_IMAGE_URL', 'https://api.tide736.net/tide_image.php')
+
+# キャッシュ全体の上限 (バイト)。超えたら古いものから消して、上限の 90% まで減らす
+TIDE_IMAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024
+EVICTION_TARGET_RATIO = 0.9
+
+# 最後に使われた時刻 (last_access) を更新する間隔 (秒)。ヒットのたびに書き込まないようにする
+TOUCH_INTERVAL_SECONDS = 3600
+
+# 画像のリクエストの処理中に取得を待つ時間の上限 (秒, 再試行を含む)。事前取得 (prefetch) には使わない
+TIDE_IMAGE_FETCH_BUDGET_SECONDS = 8.0
+
+# 取得に失敗した画像を取得し直さない期間 (秒)。その間のリクエストはすぐに tide736.net へリダイレクトする
+TIDE_IMAGE_FAILURE_TTL_SECONDS = 300
+
+# ブラウザ・CDN にキャッシュさせる期間 (1年)
+TIDE_IMAGE_MAX_AGE_SECONDS = 365 * 86400
+
+TIDE_IMAGES_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS tide_images (
+        pc INTEGER NOT NULL,
+        hc INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        sha256 TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        content_type TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        last_access REAL NOT NULL,
+        PRIMARY KEY (pc, hc, date)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_tide_images_last_access ON tide_images (last_access)',
+    'CREATE INDEX IF NOT EXISTS idx_tide_images_sha256 ON tide_images (sha256)',
+    '''
+    CREATE TABLE IF NOT EXISTS tide_image_failures (
+        pc INTEGER NOT NULL,
+        hc INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (pc, hc, date)
+    ) WITHOUT ROWID
+    ''',
+]
+
+# 取得の失敗が期限内であることを表す lookup の値。None 以外を返すことで、
+# single-flight で待っていた他のリクエストも取得し直さずにこれを受け取る
+_FAILED = {'failed': True}
+
+_stats = {'hits': 0, 'fetched': 0, 'fetch_errors': 0, 'failure_hits': 0, 'evicted': 0}
+_stats_lock = threading.Lock()
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+def _ensure_table(conn):
+    from database import ensure_schema
+    ensure_schema(conn, 'tide_images', TIDE_IMAGES_SCHEMA)
+
+def upstream_url(pc, hc, date_str):
+    """tide736.net のタイドグラフ画像の URL (date_str は YYYY-MM-DD)"""
+    yr, mn, dy = map(int, date_str.split('-'))
+    return (
+        f"{TIDE_IMAGE_URL}?pc={pc}&hc={hc}&yr={yr}&mn={mn}&dy={dy}"
+        f"&rg=day&w=768&h=512&lc=blue&gcs=cyan&gcf=blue&ld=on&ttd=on&tsmd=on"
+    )
+
+def blob_path(sha256):
+    """内容のハッシュから画像ファイルのパスを求める"""
+    return os.path.join(TIDE_IMAGE_DIR, sha256[:2], sha256)
+
+def fetch_image(pc, hc, date_str, budget=None):
+    """tide736.net から画像を取得して (バイト列, Content-Type) を返す。画像でなければ None (DBには触れない)"""
+    try:
+        response = http_client.get(upstream_url(pc, hc, date_str), budget=budget)
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+        if response.status_code == 200 and content_type.startswith('image/') and response.content:
+            return response.content, content_type
+        print(f"Tide image fetch error: HTTP {response.status_code} {content_type} for {pc}_{hc} {date_str}")
+    except Exception as e:
+        print(f"Tide image fetch error: {e}")
+    _count('fetch_errors')
+    return None
+
+def _write_blob(sha256, data):
+    path = blob_path(sha256)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return path
+
+def store_image(conn, pc, hc, date_str, data, content_type):
+    """画像をディスクに保存して tide_images に登録し、上限を超えていれば古いものを消す"""
+    _ensure_table(conn)
+    sha256 = hashlib.sha256(data).hexdigest()
+    _write_blob(sha256, data)
+    now = time.time()
+    with conn:
+        conn.execute('''
+            INSERT INTO tide_images (pc, hc, date, sha256, size, content_type, fetched_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(pc, hc, date) DO UPDATE SET
+                sha256 = excluded.sha256, size = excluded.size, content_type = excluded.content_type,
+                fetched_at = excluded.fetched_at, last_access = excluded.last_access
+        ''', (pc, hc, date_str, sha256, len(data), content_type, now, now))
+        conn.execute('DELETE FROM tide_image_failures WHERE pc = ? AND hc = ? AND date = ?', (pc, hc, date_str))
+    _count('fetched')
+    evict(conn)
+    return {'sha256': sha256, 'path': blob_path(sha256), 'content_type': content_type}
+
+def _lookup(conn, pc, hc, date_str):
+    """キャッシュ済みの画像を返す。ファイルが消えていれば登録も消して None"""
+    row = conn.execute(
+        'SELECT sha256, content_type, last_access FROM tide_images WHERE pc = ? AND hc = ? AND date = ?',
+        (pc, hc, date_str)
+    ).fetchone()
+    if row is None:
+        return None
+    sha256, content_type, last_access = row[0], row[1], row[2]
+    path = blob_path(sha256)
+    if not os.path.exists(path):
+        with conn:
+            conn.execute('DELETE FROM tide_images WHERE pc = ? AND hc = ? AND date = ?', (pc, hc, date_str))
+        return None
+    now = time.time()
+    if now - last_access > TOUCH_INTERVAL_SECONDS:
+        with conn:
+            conn.execute('UPDATE tide_images SET last_access = ? WHERE pc = ? AND hc = ? AND date = ?',
+                         (now, pc, hc, date_str))
+    return {'sha256': sha256, 'path': path, 'content_type': content_type}
+
+def record_failure(conn, pc, hc, date_str, ttl=None):
+    """取得に失敗したことを ttl 秒 (省略時は TIDE_IMAGE_FAILURE_TTL_SECONDS) 記録する。期限切れの記録は消す"""
+    _ensure_table(conn)
+    now = time.time()
+    ttl = TIDE_IMAGE_FAILURE_TTL_SECONDS if ttl is None else ttl
+    with conn:
+        conn.execute('DELETE FROM tide_image_failures WHERE expires_at < ?', (now,))
+        conn.execute('''
+            INSERT INTO tide_image_failures (pc, hc, date, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(pc, hc, date) DO UPDATE SET expires_at = excluded.expires_at
+        ''', (pc, hc, date_str, now + ttl))
+    return _FAILED
+
+def _failed(conn, pc, hc, date_str):
+    """取得の失敗が記録されていて、まだ期限内か"""
+    row = conn.execute(
+        'SELECT expires_at FROM tide_image_failures WHERE pc = ? AND hc = ? AND date = ?', (pc, hc, date_str)
+    ).fetchone()
+    return row is not None and row[0] > time.time()
+
+def _lookup_or_failed(conn, pc, hc, date_str):
+    """キャッシュ済みの画像、期限内の失敗の記録 (_FAILED)、どちらも無ければ None"""
+    entry = _lookup(conn, pc, hc, date_str)
+    if entry is None and _failed(conn, pc, hc, date_str):
+        return _FAILED
+    return entry
+
+def cache_size(conn):
+    """キャッシュ中の画像ファイルの合計サイズ (同じ内容の画像は1回だけ数える)"""
+    _ensure_table(conn)
+    row = conn.execute('SELECT SUM(size) FROM (SELECT MAX(size) AS size FROM tide_images GROUP BY sha256)').fetchone()
+    return row[0] or 0
+
+def evict(conn, max_bytes=None):
+    """合計サイズが上限を超えていれば、last_access の古い順に上限の 90% まで消す。消した件数を返す"""
+    max_bytes = TIDE_IMAGE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    total = cache_size(conn)
+    if total <= max_bytes:
+        return 0
+    target = max_bytes * EVICTION_TARGET_RATIO
+    evicted = 0
+    rows = conn.execute('SELECT pc, hc, date, sha256, size FROM tide_images ORDER BY last_access').fetchall()
+    with conn:
+        for pc, hc, date_str, sha256, size in rows:
+            if total <= target:
+                break
+            conn.execute('DELETE FROM tide_images WHERE pc = ? AND hc = ? AND date = ?', (pc, hc, date_str))
+            evicted += 1
+            # 同じ内容を参照する登録が残っていなければファイルも消す
+            if conn.execute('SELECT 1 FROM tide_images WHERE sha256 = ? LIMIT 1', (sha256,)).fetchone() is None:
+                try:
+                    os.remove(blob_path(sha256))
+                except FileNotFoundError:
+                    pass
+                total -= size
+    _count('evicted', evicted)
+    return evicted
+
+def get_image(conn, pc, hc, date_str):
+    """
+    (pc, hc, 日付) のタイドグラフ画像を返す ({'sha256', 'path', 'content_type'})。
+    キャッシュに無ければ single-flight で一度だけ取得して保存する。取得できなければ None。
+    取得に失敗した画像は TIDE_IMAGE_FAILURE_TTL_SECONDS の間、取得し直さずに None を返す。
+    """
+    _ensure_table(conn)
+    entry = _lookup_or_failed(conn, pc, hc, date_str)
+    if entry is _FAILED:
+        _count('failure_hits')
+        return None
+    if entry is not None:
+        _count('hits')
+        return entry
+
+    def fetch_and_store():
+        fetched = fetch_image(pc, hc, date_str, TIDE_IMAGE_FETCH_BUDGET_SECONDS)
+        if fetched is None:
+            return record_failure(conn, pc, hc, date_str)
+        return store_image(conn, pc, hc, date_str, *fetched)
+
+    entry = single_flight.run(
+        conn, f"tide_image:{pc}_{hc}:{date_str}",
+        lambda: _lookup_or_failed(conn, pc, hc, date_str),
+        fetch_and_store,
+    )
+    return None if entry is _FAILED else entry
+
+def popular_ports(conn, limit):
+    """
+    事前取得する観測所 (pc, hc) のリスト。撮影スポットの最寄り港として多く使われている順に並べ、
+    足りない分は region_coordinates.json の各地域の代表港で埋める。
+    """
+    from models.geo import get_port_index
+    ports = []
+    rows = conn.execute('''
+        SELECT nearest_port_id, COUNT(*) AS spots FROM photo_spots
+        WHERE nearest_port_id IS NOT NULL
+        GROUP BY nearest_port_id ORDER BY spots DESC, nearest_port_id
+    ''').fetchall()
+    for row in rows:
+        try:
+            pc, hc = map(int, row[0].split('_'))
+        except ValueError:
+            continue
+        ports.append((pc, hc))
+    for port in get_port_index().keys:
+        if port not in ports:
+            ports.append(port)
+    return ports[:limit]
+
+def prefetch(conn, ports, dates, workers=4):
+    """
+    ports × dates のうち未キャッシュの画像を取得して保存する。
+    取得はスレッドで並行して行い、保存 (DB・ディスク) と失敗の記録は呼び出し元のスレッドで行う。
+    (取得した件数, キャッシュ済みの件数, 失敗した件数) を返す。
+    """
+    _ensure_table(conn)
+    targets = [(pc, hc, date_str) for pc, hc in ports for date_str in dates]
+    missing = [target for target in targets if _lookup(conn, *target) is None]
+    fetched = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_image, *target): target for target in missing}
+        for future in as_completed(futures):
+            result = future.result()
+            if result is None:
+                record_failure(conn, *futures[future])
+                failed += 1
+                continue
+            store_image(conn, *futures[future], *result)
+            fetched += 1
+    return fetched, len(targets) - len(missing), failed
+
+def cache_headers():
+    """キャッシュした画像の配信用ヘッダー (日付ごとの画像は変わらないため immutable)"""
+    return {'Cache-Control': f'public, max-age={TIDE_IMAGE_MAX_AGE_SECONDS}, immutable'}
+
+def get_stats():
+    """タイドグラフ画像キャッシュの集計 (このワーカープロセス内)"""
+    with _stats_lock:
+        return dict(_stats)
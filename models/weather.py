@@ -2,10 +2,15 @@
 外部天気API（Open-Meteo）を利用して、指定された場所や都道府県の天気情報を取得・キャッシュするモジュール。
 特に撮影計画に役立つ「雲量」や、独自の「星空指数」の計算を行います。
 """
-import requests
-from datetime import datetime
-import json
-import sqlite3
+import os
+from datetime import datetime, timedelta, timezone
+import threading
+
+from models import http_client, single_flight
+
+# Open-Meteo のエンドポイント (ローカルのスタブサーバーに向ける場合は環境変数で上書き)
+OPEN_METEO_FORECAST_URL = os.environ.get('OPEN_METEO_FORECAST_URL', 'https://api.open-meteo.com/v1/forecast')
+OPEN_METEO_ARCHIVE_URL = os.environ.get('OPEN_METEO_ARCHIVE_URL', 'https://archive-api.open-meteo.com/v1/archive')
 
 # 日本の主要地点（47都道府県庁所在地など）の緯度・経度定義
 PREFECTURE_COORDS = {
@@ -118,132 +123,336 @@ def get_weather_icon(code):
         return "fas fa-bolt text-danger"
     return "fas fa-cloud-sun text-secondary"
 
-def get_weather_info(prefecture, date_str):
+# 天気キャッシュの有効期限 (3時間)。過ぎたデータは返しつつバックグラウンドで再取得する
+WEATHER_CACHE_TTL_SECONDS = 3 * 3600
+
+# これより古いデータは返さず、再取得を待つ (12時間)
+WEATHER_MAX_STALE_SECONDS = 12 * 3600
+
+# 予報APIから一度に取得する日数 (Open-Meteo の上限は16日)
+FORECAST_HORIZON_DAYS = 16
+
+# Webリクエストの処理中に取得を待つ時間の上限 (秒, 再試行を含む)。バックグラウンドの更新には使わない
+WEATHER_FETCH_BUDGET_SECONDS = 4.5
+
+# 毎時の天気データ (地点 × 時刻)。都道府県は地点名、任意座標はグリッドセルのキーを location_key とする。
+# 夜間の代表値・コアタイム・推奨メッセージは、このテーブルの48時間分から都度計算する。
+# 旧形式の weather_cache (都道府県 × 日付ごとの計算結果の JSON) は数時間で期限切れになる予報のキャッシュで、
+# 毎時データに戻せないため、移行せずに削除する (次のリクエストで weather_hourly に取得し直す)。
+WEATHER_HOURLY_SCHEMA = [
+    'DROP TABLE IF EXISTS weather_cache',
+    '''
+    CREATE TABLE IF NOT EXISTS weather_hourly (
+        location_key TEXT NOT NULL,
+        time TEXT NOT NULL,
+        cloud_cover INTEGER,
+        weather_code INTEGER,
+        fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (location_key, time)
+    ) WITHOUT ROWID
+    ''',
+]
+
+def _forecast_url(lat_param, lng_param):
+    """予報期間全体 (今日から FORECAST_HORIZON_DAYS 日分) の毎時データを取得するURLを返す"""
+    return f"{OPEN_METEO_FORECAST_URL}?latitude={lat_param}&longitude={lng_param}&hourly=cloud_cover,weather_code&forecast_days={FORECAST_HORIZON_DAYS}&timezone=Asia%2FTokyo"
+
+def _build_weather_url(lat, lng, date_str):
     """
-    指定された都道府県と日付の天気情報（代表値および詳細な時系列データ）を取得する。
+    date_str の夜間をカバーする毎時データを取得するURLを返す。
+    予報期間内なら期間全体をまとめて、過去日なら対象日と翌日分をアーカイブから取得する。
+    予報範囲外の場合は None。
     """
-    coords = PREFECTURE_COORDS.get(prefecture)
-    if not coords:
+    target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    next_date_str = (target_date + timedelta(days=1)).strftime('%Y-%m-%d')
+    
+    today = datetime.now().date()
+    diff_days = (target_date - today).days
+
+    # 予報は今日から FORECAST_HORIZON_DAYS 日分。夜間には翌日分も必要なため、翌日が予報期間に入る日までが対象
+    if 0 <= diff_days and diff_days + 1 < FORECAST_HORIZON_DAYS:
+        return _forecast_url(lat, lng)
+    elif diff_days < 0:
+        return f"{OPEN_METEO_ARCHIVE_URL}?latitude={lat}&longitude={lng}&start_date={date_str}&end_date={next_date_str}&hourly=cloud_cover,weather_code&timezone=Asia%2FTokyo"
+    return None
+
+def _parse_weather_response(data, date_str):
+    """
+    Open-Meteo の毎時データから、代表値(21時)・コアタイム・推奨メッセージ・時系列データをまとめる。
+    """
+    if "hourly" not in data:
         return None
 
-    try:
-        from database import get_moon_db
-        conn = get_moon_db()
-        cursor = conn.cursor()
-
-        # キャッシュの確認 (3時間以内のデータか)
-        cursor.execute('''
-            SELECT data_json, updated_at FROM weather_cache 
-            WHERE prefecture = ? AND date_str = ?
-        ''', (prefecture, date_str))
-        cached = cursor.fetchone()
+    target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    times = data["hourly"].get("time", [])
+    cloud_covers = data["hourly"].get("cloud_cover", [])
+    weather_codes = data["hourly"].get("weather_code", [])
+    
+    hourly_data = []
+    best_index = -1
+    best_time = None
+    
+    # 日没から日の出まで（概算で18時から翌6時まで）のデータを抽出
+    # 正確な時間はastro_calcで計算するが、ここでは全データから指数を計算し、
+    # 21時を代表値、夜間で最高値を「コアタイム」とする
+    for i in range(len(times)):
+        dt = datetime.fromisoformat(times[i])
+        idx = calculate_starry_index(cloud_covers[i], weather_codes[i])
+        icon = get_weather_icon(weather_codes[i])
         
-        if cached:
-            updated_at_str = cached['updated_at'] if isinstance(cached, sqlite3.Row) else cached[1]
-            updated_at = datetime.strptime(updated_at_str, '%Y-%m-%d %H:%M:%S')
-            data_json = cached['data_json'] if isinstance(cached, sqlite3.Row) else cached[0]
-            
-            if (datetime.now() - updated_at).total_seconds() < 3 * 3600:
-                return json.loads(data_json)
-
-        # API呼び出し (1日分+翌日の一部を取得して夜間をカバー)
-        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        from datetime import timedelta
-        next_date_str = (target_date + timedelta(days=1)).strftime('%Y-%m-%d')
+        h_item = {
+            "time": dt.strftime('%H:%M'),
+            "hour": dt.hour,
+            "date": dt.strftime('%Y-%m-%d'),
+            "starry_index": idx,
+            "cloud_cover": cloud_covers[i],
+            "condition": WEATHER_CODE_MAP.get(weather_codes[i], "不明"),
+            "icon_class": icon
+        }
+        hourly_data.append(h_item)
         
-        today = datetime.now().date()
-        diff_days = (target_date - today).days
+        # 「コアタイム」の計算（今夜18時〜翌日6時の中で最高指数を探す）
+        # 簡略化：取得した48時間分の中から夜間（18時以降から翌朝まで）を対象
+        if (dt.date() == target_date and dt.hour >= 18) or (dt.date() > target_date and dt.hour <= 6):
+            if idx > best_index:
+                best_index = idx
+                best_time = dt
 
-        if 0 <= diff_days <= 11:
-            url = f"https://api.open-meteo.com/v1/forecast?latitude={coords['lat']}&longitude={coords['lng']}&hourly=cloud_cover,weather_code&start_date={date_str}&end_date={next_date_str}&timezone=Asia%2FTokyo"
-        elif diff_days < 0:
-            url = f"https://archive-api.open-meteo.com/v1/archive?latitude={coords['lat']}&longitude={coords['lng']}&start_date={date_str}&end_date={next_date_str}&hourly=cloud_cover,weather_code&timezone=Asia%2FTokyo"
-        else:
-            return None
+    # 代表値（21時）を取得
+    if len(hourly_data) > 21:
+        rep_data = hourly_data[21]
+    else:
+        rep_data = hourly_data[0]
 
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+    # 推奨メッセージの作成
+    suggestion = "今夜は観測が難しいかもしれません。"
+    if best_index >= 80:
+        time_prefix = "深夜" if best_time.hour < 6 else "今夜"
+        suggestion = f"{time_prefix} {best_time.hour}時頃からが絶好のチャンスです！"
+    elif best_index >= 50:
+        time_prefix = "深夜" if best_time.hour < 6 else "今夜"
+        suggestion = f"{time_prefix}の狙い目は {best_time.hour}時頃です。"
+    elif best_index > 0:
+        suggestion = f"{best_time.hour}時頃に雲の切れ間があるかもしれません。"
 
-        if "hourly" in data:
-            times = data["hourly"].get("time", [])
-            cloud_covers = data["hourly"].get("cloud_cover", [])
-            weather_codes = data["hourly"].get("weather_code", [])
-            
-            hourly_data = []
-            best_index = -1
-            best_time = None
-            
-            # 日没から日の出まで（概算で18時から翌6時まで）のデータを抽出
-            # 正確な時間はastro_calcで計算するが、ここでは全データから指数を計算し、
-            # 21時を代表値、夜間で最高値を「コアタイム」とする
-            for i in range(len(times)):
-                dt = datetime.fromisoformat(times[i])
-                idx = calculate_starry_index(cloud_covers[i], weather_codes[i])
-                icon = get_weather_icon(weather_codes[i])
-                
-                h_item = {
-                    "time": dt.strftime('%H:%M'),
-                    "hour": dt.hour,
-                    "date": dt.strftime('%Y-%m-%d'),
-                    "starry_index": idx,
-                    "cloud_cover": cloud_covers[i],
-                    "condition": WEATHER_CODE_MAP.get(weather_codes[i], "不明"),
-                    "icon_class": icon
-                }
-                hourly_data.append(h_item)
-                
-                # 「コアタイム」の計算（今夜18時〜翌日6時の中で最高指数を探す）
-                # 簡略化：取得した48時間分の中から夜間（18時以降から翌朝まで）を対象
-                if (dt.date() == target_date and dt.hour >= 18) or (dt.date() > target_date and dt.hour <= 6):
-                    if idx > best_index:
-                        best_index = idx
-                        best_time = dt
-
-            # 代表値（21時）を取得
-            rep_idx = 21 # Default to index 21 of the first day
-            if len(hourly_data) > 21:
-                rep_data = hourly_data[21]
-            else:
-                rep_data = hourly_data[0]
-
-            # 推奨メッセージの作成
-            suggestion = "今夜は観測が難しいかもしれません。"
-            if best_index >= 80:
-                time_prefix = "深夜" if best_time.hour < 6 else "今夜"
-                suggestion = f"{time_prefix} {best_time.hour}時頃からが絶好のチャンスです！"
-            elif best_index >= 50:
-                time_prefix = "深夜" if best_time.hour < 6 else "今夜"
-                suggestion = f"{time_prefix}の狙い目は {best_time.hour}時頃です。"
-            elif best_index > 0:
-                suggestion = f"{best_time.hour}時頃に雲の切れ間があるかもしれません。"
-
-            result = {
-                "cloud_cover": rep_data["cloud_cover"],
-                "condition": rep_data["condition"],
-                "starry_index": rep_data["starry_index"],
-                "icon_class": rep_data["icon_class"],
-                "time": rep_data["time"],
-                "best_time": best_time.strftime('%H:%M') if best_time else None,
-                "best_index": best_index,
-                "suggestion": suggestion,
-                "hourly": hourly_data
-            }
-
-            # キャッシュの更新
-            try:
-                cursor.execute('''
-                    INSERT INTO weather_cache (prefecture, date_str, data_json, updated_at)
-                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                    ON CONFLICT(prefecture, date_str) 
-                    DO UPDATE SET data_json = excluded.data_json, updated_at = CURRENT_TIMESTAMP
-                ''', (prefecture, date_str, json.dumps(result)))
-                conn.commit()
-            except Exception as db_e:
-                print(f"Weather Cache DB Error: {db_e}")
-
-            return result
+    return {
+        "cloud_cover": rep_data["cloud_cover"],
+        "condition": rep_data["condition"],
+        "starry_index": rep_data["starry_index"],
+        "icon_class": rep_data["icon_class"],
+        "time": rep_data["time"],
+        "best_time": best_time.strftime('%H:%M') if best_time else None,
+        "best_index": best_index,
+        "suggestion": suggestion,
+        "hourly": hourly_data
+    }
+
+def _slice_hourly(hourly, date_str):
+    """複数日分の毎時データから、対象日と翌日(夜間)の48時間分を切り出す"""
+    target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    wanted = {date_str, (target_date + timedelta(days=1)).strftime('%Y-%m-%d')}
+    indices = [i for i, t in enumerate(hourly.get("time", [])) if t[:10] in wanted]
+    return {key: [values[i] for i in indices] for key, values in hourly.items()}
+
+def _summarize_hourly(hourly, date_str):
+    """毎時データから date_str の夜間の天気をまとめる。対象日のデータが無ければ None"""
+    sliced = _slice_hourly(hourly, date_str)
+    if not sliced.get("time"):
+        return None
+    return _parse_weather_response({"hourly": sliced}, date_str)
+
+def _fetch_weather(lat, lng, date_str, budget=None):
+    """Open-Meteo から date_str を含む毎時データ(予報なら予報期間全体)を取得する (キャッシュなし)"""
+    url = _build_weather_url(lat, lng, date_str)
+    if url is None:
+        return None
+
+    response = http_client.get(url, budget=budget)
+    response.raise_for_status()
+    return response.json().get("hourly")
+
+def _age_seconds(updated_at_str):
+    """キャッシュの updated_at (UTC, CURRENT_TIMESTAMP) からの経過秒数"""
+    updated_at = datetime.strptime(updated_at_str, '%Y-%m-%d %H:%M:%S')
+    now_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+    return max(0, int((now_utc - updated_at).total_seconds()))
+
+def _hourly_rows(location_key, hourly):
+    """Open-Meteo の hourly (列指向) を weather_hourly の行タプルに変換する"""
+    return [
+        (location_key, t, cloud, code)
+        for t, cloud, code in zip(hourly.get("time", []), hourly.get("cloud_cover", []), hourly.get("weather_code", []))
+    ]
+
+def _save_hourly(conn, rows):
+    """weather_hourly へ行をまとめて upsert する (コミットは呼び出し側で行う)"""
+    conn.executemany('''
+        INSERT INTO weather_hourly (location_key, time, cloud_cover, weather_code, fetched_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(location_key, time)
+        DO UPDATE SET cloud_cover = excluded.cloud_cover, weather_code = excluded.weather_code,
+                      fetched_at = CURRENT_TIMESTAMP
+    ''', rows)
+
+def _load_hourly(conn, location_key, date_str):
+    """
+    weather_hourly から対象日と翌日の48時間分を読み出す。
+    (hourly, 最も古い fetched_at) を返し、欠けている時間があれば (None, None)。
+    """
+    target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    end_str = (target_date + timedelta(days=2)).strftime('%Y-%m-%d')
+    rows = conn.execute('''
+        SELECT time, cloud_cover, weather_code, fetched_at FROM weather_hourly
+        WHERE location_key = ? AND time >= ? AND time < ?
+        ORDER BY time
+    ''', (location_key, date_str, end_str)).fetchall()
+    if len(rows) < 48:
+        return None, None
+
+    hourly = {
+        "time": [row['time'] for row in rows],
+        "cloud_cover": [row['cloud_cover'] for row in rows],
+        "weather_code": [row['weather_code'] for row in rows],
+    }
+    return hourly, min(row['fetched_at'] for row in rows)
+
+def _with_freshness(result, fetched_at, age):
+    """天気の結果に、データの取得時刻と鮮度 (fresh / stale) を付ける"""
+    if result is not None:
+        result["freshness"] = {
+            "fetched_at": fetched_at.replace(' ', 'T') + 'Z',
+            "age_seconds": age,
+            "status": "fresh" if age < WEATHER_CACHE_TTL_SECONDS else "stale",
+        }
+    return result
+
+def _lookup_fresh(conn, location_key, date_str):
+    """有効期限内 (3時間以内に取得) の毎時データが揃っていれば、その夜の天気を返す"""
+    hourly, fetched_at = _load_hourly(conn, location_key, date_str)
+    if hourly:
+        age = _age_seconds(fetched_at)
+        if age < WEATHER_CACHE_TTL_SECONDS:
+            return _with_freshness(_parse_weather_response({"hourly": hourly}, date_str), fetched_at, age)
+    return None
+
+def _lookup_any(conn, location_key, date_str):
+    """取得時刻にかかわらず、毎時データが揃っていればその夜の天気を返す (取得待ちがタイムアウトしたとき用)"""
+    hourly, fetched_at = _load_hourly(conn, location_key, date_str)
+    if hourly:
+        return _with_freshness(_parse_weather_response({"hourly": hourly}, date_str), fetched_at, _age_seconds(fetched_at))
+    return None
+
+def _fetch_and_store(conn, location_key, lat, lng, date_str, budget=None):
+    """Open-Meteo から取得して weather_hourly に保存し、その夜の天気を返す"""
+    hourly = _fetch_weather(lat, lng, date_str, budget)
+    if not hourly:
+        return None
+
+    try:
+        _save_hourly(conn, _hourly_rows(location_key, hourly))
+        conn.commit()
+    except Exception as db_e:
+        print(f"Weather Cache DB Error: {db_e}")
+
+    fetched_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return _with_freshness(_summarize_hourly(hourly, date_str), fetched_at, 0)
 
+def _refresh_key(location_key, url):
+    # 同じ取得 (予報なら地点ごとに1回、過去日は地点×日付) を同時に行わないようにまとめるキー
+    return f"weather:{location_key}:{url}"
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def _refresh_in_background(location_key, lat, lng, date_str, url):
+    """期限切れのキャッシュをバックグラウンドのスレッドで更新する (同じ地点の更新は1つだけ)"""
+    key = _refresh_key(location_key, url)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    from flask import current_app
+    app = current_app._get_current_object()
+
+    def refresh():
+        try:
+            # スレッドでは Flask の g が使えないため、アプリケーションコンテキストを作って DB に接続する
+            with app.app_context():
+                from database import get_moon_db
+                conn = get_moon_db()
+                single_flight.run(
+                    conn, key,
+                    lambda: _lookup_fresh(conn, location_key, date_str),
+                    lambda: _fetch_and_store(conn, location_key, lat, lng, date_str),
+                )
+        except Exception as e:
+            print(f"Weather background refresh error: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+def _get_weather_for_location(location_key, lat, lng, date_str):
+    """
+    location_key の date_str の天気を weather_hourly から計算して返す (stale-while-revalidate)。
+    - 取得から3時間以内: キャッシュをそのまま返す
+    - 3時間〜WEATHER_MAX_STALE_SECONDS: 古いキャッシュを返し、バックグラウンドで再取得する
+    - それ以上古いか、キャッシュが無い: (lat, lng) の予報期間全体を取得するまで待つ
+      (待つのは WEATHER_FETCH_BUDGET_SECONDS まで)
+    """
+    from database import get_moon_db, ensure_schema
+    conn = get_moon_db()
+    ensure_schema(conn, 'weather_hourly', WEATHER_HOURLY_SCHEMA)
+
+    url = _build_weather_url(lat, lng, date_str)
+
+    hourly, fetched_at = _load_hourly(conn, location_key, date_str)
+    if hourly:
+        age = _age_seconds(fetched_at)
+        if age < WEATHER_MAX_STALE_SECONDS:
+            if age >= WEATHER_CACHE_TTL_SECONDS and url is not None:
+                _refresh_in_background(location_key, lat, lng, date_str, url)
+            return _with_freshness(_parse_weather_response({"hourly": hourly}, date_str), fetched_at, age)
+
+    if url is None:
+        return None
+    return single_flight.run(
+        conn, _refresh_key(location_key, url),
+        lambda: _lookup_fresh(conn, location_key, date_str),
+        lambda: _fetch_and_store(conn, location_key, lat, lng, date_str, WEATHER_FETCH_BUDGET_SECONDS),
+        fallback=lambda: _lookup_any(conn, location_key, date_str),
+    )
+
+def weather_cache_headers(weather, private=False):
+    """
+    天気の鮮度に応じた HTTP キャッシュヘッダーを返す。
+    有効期限までの残り時間を max-age とし、期限切れ (stale) の場合はキャッシュさせない。
+    """
+    scope = "private" if private else "public"
+    freshness = (weather or {}).get("freshness")
+    if not freshness:
+        return {"Cache-Control": f"{scope}, no-cache"}
+
+    age = freshness["age_seconds"]
+    max_age = max(0, WEATHER_CACHE_TTL_SECONDS - age)
+    return {
+        "Cache-Control": f"{scope}, max-age={max_age}" if max_age else f"{scope}, no-cache",
+        "X-Weather-Fetched-At": freshness["fetched_at"],
+        "X-Weather-Freshness": freshness["status"],
+    }
+
+def get_weather_info(prefecture, date_str):
+    """
+    指定された都道府県と日付の天気情報（代表値および詳細な時系列データ）を取得する。
+    """
+    coords = PREFECTURE_COORDS.get(prefecture)
+    if not coords:
+        return None
+
+    try:
+        return _get_weather_for_location(prefecture, coords['lat'], coords['lng'], date_str)
     except Exception as e:
         print(f"Weather API/Cache Error: {e}")
     
@@ -251,81 +460,68 @@ def get_weather_info(prefecture, date_str):
 
 def get_weather_by_coords(lat, lng, date_str):
     """
-    指定された緯度経度と日付の天気情報（代表値および詳細な時系列データ）を取得する。(キャッシュなし)
+    指定された緯度経度と日付の天気情報（代表値および詳細な時系列データ）を取得する。
+    座標は0.05度のグリッドセルに丸め、セルの中心で取得した毎時データを3時間キャッシュする。
     """
+    from models.geo import snap_to_grid, grid_key
+
     try:
-        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        from datetime import timedelta
-        next_date_str = (target_date + timedelta(days=1)).strftime('%Y-%m-%d')
-        
-        today = datetime.now().date()
-        diff_days = (target_date - today).days
+        cell_lat, cell_lng = snap_to_grid(lat, lng)
+        return _get_weather_for_location(grid_key(lat, lng), cell_lat, cell_lng, date_str)
+    except Exception as e:
+        print(f"Weather API by coords Error: {e}")
+    
+    return None
+
+# --- 全都道府県の一括更新 ---
+# Open-Meteo は latitude/longitude にカンマ区切りで複数地点を渡すと、地点ごとの結果を配列で返す。
 
-        if 0 <= diff_days <= 11:
-            url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lng}&hourly=cloud_cover,weather_code&start_date={date_str}&end_date={next_date_str}&timezone=Asia%2FTokyo"
-        elif diff_days < 0:
-            url = f"https://archive-api.open-meteo.com/v1/archive?latitude={lat}&longitude={lng}&start_date={date_str}&end_date={next_date_str}&hourly=cloud_cover,weather_code&timezone=Asia%2FTokyo"
-        else:
-            return None
+# 1リクエストにまとめる地点数
+BULK_LOCATIONS_PER_REQUEST = 25
 
-        response = requests.get(url, timeout=10)
+# これより古い毎時データは一括更新時に削除する
+HOURLY_RETENTION_DAYS = 31
+
+def fetch_weather_bulk(locations):
+    """
+    複数地点 locations [(lat, lng), ...] の予報期間全体の毎時予報をまとめて取得し、
+    地点ごとの Open-Meteo レスポンス(辞書)のリストを返す。
+    """
+    results = []
+    for i in range(0, len(locations), BULK_LOCATIONS_PER_REQUEST):
+        chunk = locations[i:i + BULK_LOCATIONS_PER_REQUEST]
+        url = _forecast_url(
+            ','.join(str(lat) for lat, _ in chunk),
+            ','.join(str(lng) for _, lng in chunk),
+        )
+        response = http_client.get(url, timeout=(3.05, 30))
         response.raise_for_status()
         data = response.json()
+        # 1地点だけの場合は配列ではなく単一のオブジェクトが返る
+        results.extend(data if isinstance(data, list) else [data])
 
-        if "hourly" in data:
-            times = data["hourly"].get("time", [])
-            cloud_covers = data["hourly"].get("cloud_cover", [])
-            weather_codes = data["hourly"].get("weather_code", [])
-            
-            hourly_data = []
-            best_index = -1
-            best_time = None
-            
-            for i in range(len(times)):
-                dt = datetime.fromisoformat(times[i])
-                idx = calculate_starry_index(cloud_covers[i], weather_codes[i])
-                
-                h_item = {
-                    "time": dt.strftime('%H:%M'),
-                    "hour": dt.hour,
-                    "date": dt.strftime('%Y-%m-%d'),
-                    "starry_index": idx,
-                    "cloud_cover": cloud_covers[i],
-                    "condition": WEATHER_CODE_MAP.get(weather_codes[i], "不明"),
-                    "icon_class": get_weather_icon(weather_codes[i])
-                }
-                hourly_data.append(h_item)
-                
-                if (dt.date() == target_date and dt.hour >= 18) or (dt.date() > target_date and dt.hour <= 6):
-                    if idx > best_index:
-                        best_index = idx
-                        best_time = dt
-
-            rep_data = hourly_data[21] if len(hourly_data) > 21 else hourly_data[0]
-
-            suggestion = "今夜は観測が難しいかもしれません。"
-            if best_index >= 80:
-                time_prefix = "深夜" if best_time.hour < 6 else "今夜"
-                suggestion = f"{time_prefix} {best_time.hour}時頃からが絶好のチャンスです！"
-            elif best_index >= 50:
-                time_prefix = "深夜" if best_time.hour < 6 else "今夜"
-                suggestion = f"{time_prefix}の狙い目は {best_time.hour}時頃です。"
-            elif best_index > 0:
-                suggestion = f"{best_time.hour}時頃に雲の切れ間があるかもしれません。"
-
-            return {
-                "cloud_cover": rep_data["cloud_cover"],
-                "condition": rep_data["condition"],
-                "starry_index": rep_data["starry_index"],
-                "icon_class": rep_data["icon_class"],
-                "time": rep_data["time"],
-                "best_time": best_time.strftime('%H:%M') if best_time else None,
-                "best_index": best_index,
-                "suggestion": suggestion,
-                "hourly": hourly_data
-            }
-    except Exception as e:
-        print(f"Weather API by coords Error: {e}")
-    
-    return None
+    if len(results) != len(locations):
+        raise ValueError(f"Open-Meteo returned {len(results)} locations for {len(locations)} requested")
+    return results
+
+def refresh_all_prefectures(conn):
+    """
+    PREFECTURE_COORDS の全地点について予報期間全体の毎時データをまとめて取得し、
+    weather_hourly を1トランザクションで更新します。更新した行数を返します。
+    """
+    from database import ensure_schema
+    ensure_schema(conn, 'weather_hourly', WEATHER_HOURLY_SCHEMA)
+
+    prefectures = list(PREFECTURE_COORDS.keys())
+    locations = [(PREFECTURE_COORDS[p]['lat'], PREFECTURE_COORDS[p]['lng']) for p in prefectures]
+    responses = fetch_weather_bulk(locations)
+
+    rows = []
+    for prefecture, data in zip(prefectures, responses):
+        rows.extend(_hourly_rows(prefecture, data.get("hourly") or {}))
 
+    cutoff = (datetime.now() - timedelta(days=HOURLY_RETENTION_DAYS)).strftime('%Y-%m-%d')
+    with conn:
+        _save_hourly(conn, rows)
+        conn.execute('DELETE FROM weather_hourly WHERE time < ?', (cutoff,))
+    return len(rows)
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, abort
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, abort, jsonify
 import sqlite3
 import random
 from models.functions import randomname, n
@@ -300,3 +300,25 @@ def astro_delete(id):
     
     flash('イベントを削除しました。', 'success')
     return redirect(url_for('admin.astro_list'))
+
+# Cache Statistics
+@admin_bp.route('/admin/cache_stats')
+def cache_stats():
+    """各キャッシュのヒット・ミス回数を JSON で返す (このワーカープロセス内の集計)"""
+    if not session.get('logged_in'):
+        return redirect(url_for('admin.login'))
+
+    from models.astro_calc import get_grid_cache_stats
+    from models.http_client import get_stats as get_http_stats
+    from models.single_flight import get_stats as get_single_flight_stats
+    from models.iss_track import get_stats as get_iss_track_stats
+    from models.tide_images import get_stats as get_tide_image_stats
+    from models.charts import get_stats as get_chart_stats
+    return jsonify({
+        'astro_grid': get_grid_cache_stats(),
+        'outbound_http': get_http_stats(),
+        'single_flight': get_single_flight_stats(),
+        'iss_track': get_iss_track_stats(),
+        'tide_images': get_tide_image_stats(),
+        'charts': get_chart_stats(),
+    })
@@ -25,9 +25,17 @@ def index():
     pref_location = request.cookies.get('pref_location', '大阪(大阪府)')
     all_prefectures = load_prefectures()
 
-    # Get data for the selected location dynamically
+    # 月齢は天体暦を使わない近似式でまとめて計算する (どの年でも表示できる)
+    from models.moon_phase import get_moon_ages_month
+    age_data = get_moon_ages_month(year, month)
+
+    # 月の出は Skyfield で計算 (キャッシュがあればそれを使う)。計算できなくても月齢は表示する
     from models.astro_calc import get_moon_data_month
-    db_data = get_moon_data_month(pref_location, year, month)
+    try:
+        db_data = get_moon_data_month(pref_location, year, month)
+    except Exception as e:
+        print(f"Moon rise error: {e}")
+        db_data = {}
 
     moon_images = []
     moon_ages = []
@@ -35,9 +43,9 @@ def index():
     moon_rises = []
 
     for day, weekday in days_in_month:
-        if day > 0 and day in db_data:
-            moon_age = db_data[day]['age']
-            moon_rise = db_data[day]['rise']
+        if day > 0 and day in age_data:
+            moon_age = age_data[day]['age']
+            moon_rise = db_data.get(day, {}).get('rise')
             moon_ages.append(moon_age)
             moon_images.append(index_get_moon_images(moon_age))
             moon_names.append(get_moon_name(moon_age))
@@ -94,13 +102,11 @@ def index():
     # The requirement says "Today's Recommendation", implying the current real-world day.
     
     today_moon_age = None
-    if today.day in db_data and year == today.year and month == today.month:
-        today_moon_age = db_data[today.day]['age']
+    if today.day in age_data and year == today.year and month == today.month:
+        today_moon_age = age_data[today.day]['age']
     else:
-        from models.astro_calc import get_moon_data
-        today_info = get_moon_data(pref_location, f"{today.year}-{today.month:02d}-{today.day:02d}")
-        if today_info and today_info['moon_age'] != '-':
-            today_moon_age = today_info['moon_age']
+        from models.moon_phase import moon_ages as analytic_moon_ages
+        today_moon_age = f"{analytic_moon_ages([today])[0][0]:.1f}"
             
     if today_moon_age is not None:
         try:
@@ -127,12 +133,26 @@ def index():
     weather_info = get_weather_info(pref_location, today.strftime('%Y-%m-%d'))
 
     # Sun events for hourly bounding
+    # 天体暦が読めないなどで計算できなければ、太陽・タイムラインの欄を空にしてページは表示する
     from models.astro_calc import get_sun_events
-    sun_events = get_sun_events(pref_location, today.strftime('%Y-%m-%d'))
+    try:
+        sun_events = get_sun_events(pref_location, today.strftime('%Y-%m-%d'))
+        next_sun_events = get_sun_events(pref_location, tomorrow.strftime('%Y-%m-%d'))
+    except Exception as e:
+        print(f"Sun events error: {e}")
+        sun_events = next_sun_events = None
+
+    # 今夜の暗い時間帯と星空指数のグラフ (SVG, 入力が同じならキャッシュ済みのものを使う)
+    from models.charts import get_chart
+    night_chart, _ = get_chart(today.strftime('%Y-%m-%d'), weather_info, sun_events, next_sun_events)
 
     # Timeline Events
     from models.astro_calc import get_timeline_events
-    timeline_events = get_timeline_events(pref_location, today.strftime('%Y-%m-%d'))
+    try:
+        timeline_events = get_timeline_events(pref_location, today.strftime('%Y-%m-%d'))
+    except Exception as e:
+        print(f"Timeline error: {e}")
+        timeline_events = []
 
     next_month = month + 1 if month < 12 else 1
     next_year = year if month < 12 else year + 1
@@ -160,6 +180,7 @@ def index():
         photo_potential=photo_potential,
         weather_info=weather_info,
         sun_events=sun_events,
+        night_chart=night_chart,
         timeline_events=timeline_events,
         pref_location=pref_location,
         all_prefectures=all_prefectures,
@@ -217,8 +238,15 @@ def moon_detail(year, month, day):
 
 @main_bp.route('/api/iss/track')
 def iss_track():
-    from models.astro_calc import get_iss_ground_track
-    track = get_iss_ground_track()
-    if track:
-        return jsonify(track)
-    return jsonify({"error": "Failed to fetch ISS track"}), 500
+    from models.iss_track import get_track_window, track_cache_headers, TRACK_DEFAULT_MINUTES
+    minutes = request.args.get('minutes', TRACK_DEFAULT_MINUTES, type=int)
+    window = get_track_window(minutes=minutes)
+    if not window or not window[2]:
+        return jsonify({"error": "Failed to fetch ISS track"}), 500
+
+    # 同じ30秒の間 (同じTLE・同じ時間幅) は同じ内容なので、ETag が一致すれば 304 を返す
+    epoch, start, track = window
+    response = jsonify(track)
+    response.set_etag(f"{epoch}-{start}-{len(track)}")
+    response.headers.update(track_cache_headers(start))
+    return response.make_conditional(request)
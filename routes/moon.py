@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, render_template, request, make_response
 import sqlite3
 from models.functions import load_prefectures, get_today, moon_get_moon_images
 
@@ -17,8 +17,13 @@ def moon():
     month = int(selected_date_parts[1])
     day = int(selected_date_parts[2])
 
+    # 天体暦が読めないなどで計算できなければ、月・太陽の欄を空にしてページは表示する
     from models.astro_calc import get_moon_data
-    moon_info = get_moon_data(pref_location, selected_date)
+    try:
+        moon_info = get_moon_data(pref_location, selected_date)
+    except Exception as e:
+        print(f"Moon data error: {e}")
+        moon_info = None
     
     moon_data = None
     moon_image = "moon_00.png"
@@ -37,9 +42,13 @@ def moon():
 
     # Sun & Twilight info
     from models.astro_calc import get_sun_events
-    sun_events = get_sun_events(pref_location, selected_date)
+    try:
+        sun_events = get_sun_events(pref_location, selected_date)
+    except Exception as e:
+        print(f"Sun events error: {e}")
+        sun_events = None
 
-    return render_template(
+    response = make_response(render_template(
         'moon_calendar.html',
         moon_image=moon_image,
         prefectures=prefectures,
@@ -49,7 +58,11 @@ def moon():
         weather_info=weather_info,
         sun_events=sun_events,
         meta_description=f"{pref_location}の{selected_date}の月の出・月の入り・月齢情報と気象予測です。"
-    )
+    ))
+    # 表示内容は Cookie の地点によって変わるため private でキャッシュさせる
+    from models.weather import weather_cache_headers
+    response.headers.update(weather_cache_headers(weather_info, private=True))
+    return response
 
 @moon_bp.route('/moon_calendar', methods=['POST'])
 def moon_calendar():
@@ -62,8 +75,13 @@ def moon_calendar():
     day = int(selected_date_parts[2])
 
     # データベースからの読み込み
+    # 天体暦が読めないなどで計算できなければ、月・太陽の欄を空にしてページは表示する
     from models.astro_calc import get_moon_data
-    moon_info = get_moon_data(prefecture, selected_date)
+    try:
+        moon_info = get_moon_data(prefecture, selected_date)
+    except Exception as e:
+        print(f"Moon data error: {e}")
+        moon_info = None
 
     moon_data = None
     moon_image = "moon_00.png"
@@ -82,7 +100,11 @@ def moon_calendar():
 
     # Sun & Twilight info
     from models.astro_calc import get_sun_events
-    sun_events = get_sun_events(prefecture, selected_date)
+    try:
+        sun_events = get_sun_events(prefecture, selected_date)
+    except Exception as e:
+        print(f"Sun events error: {e}")
+        sun_events = None
 
     return render_template(
         'moon_calendar.html',
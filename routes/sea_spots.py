@@ -2,54 +2,21 @@
 海辺の撮影スポット（フォトスポット）の管理および潮汐・天文データの提供を行うBlueprint。
 スポットの登録、一覧表示、および特定スポットの干満情報の取得を処理します。
 """
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, url_for
+from datetime import datetime
 from database import get_moon_db
-import json
-import math
+from models.geo import get_port_index, port_id
 
 # 海辺の撮影地関連のルートを定義するBlueprint
 sea_spots_bp = Blueprint('sea_spots', __name__)
 
-# タイドグラフ取得に必要な、最寄りの観測所を特定するための座標データをロード
-try:
-    with open("data/region_coordinates.json", "r", encoding="utf-8") as f:
-        region_coords = json.load(f)
-except FileNotFoundError:
-    region_coords = {}
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """
-    ハバーサイン公式（Haversine formula）を用いて、地球上の2点間の距離(km)を計算します。
-    最寄りの港を検索するために使用されます。
-    """
-    R = 6371 # 地球の半径 (km)
-    dLat = math.radians(lat2 - lat1)
-    dLon = math.radians(lon2 - lon1)
-    a = math.sin(dLat/2) * math.sin(dLat/2) + \
-        math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
-        math.sin(dLon/2) * math.sin(dLon/2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
 def find_nearest_port(lat, lng):
     """
     指定された緯度・経度から最も近い潮汐観測所（港）を特定します。
-    region_coordinates.json に定義された地点と比較し、最小距離の地点のコード(pc_hc)を返します。
+    region_coordinates.json の地点の索引 (models.geo) で探し、最寄りの地点のコード(pc_hc)を返します。
     """
-    min_dist = float('inf')
-    nearest_pc = None
-    nearest_hc = None
-    
-    for pc, info in region_coords.items():
-        dist = calculate_distance(lat, lng, info['lat'], info['lng'])
-        if dist < min_dist:
-            min_dist = dist
-            nearest_pc = int(pc)
-            nearest_hc = int(info['hc'])
-            
-    if nearest_pc is not None and nearest_hc is not None:
-        return f"{nearest_pc}_{nearest_hc}"
-    return None
+    port, _ = get_port_index().nearest_key(lat, lng)
+    return port_id(port)
 
 @sea_spots_bp.route('/sea_spots')
 def sea_spots():
@@ -167,37 +134,37 @@ def get_spot_tide(spot_id):
     response_data = {"image_url": None, "weather": None, "sun": None, "moon": None}
     
     # 1. Tide Image URL
-    # 最寄りの港(nearest_port_id)情報を利用して、tide736.net のAPIから当該日付のタイドグラフ画像URLを生成する。
+    # 最寄りの港(nearest_port_id)情報を利用して、当該日付のタイドグラフ画像のURLを生成する。
+    # 画像は tide736.net から一度だけ取得してサーバー側でキャッシュしたもの (/tide_image) を配信する。
     if spot['nearest_port_id']:
         port_parts = spot['nearest_port_id'].split('_')
         if len(port_parts) == 2:
-            pc, hc = port_parts[0], port_parts[1]
             try:
+                pc, hc = int(port_parts[0]), int(port_parts[1])
                 yr, mn, dy = map(int, date_str.split("-"))
-                image_url = (
-                    f"https://api.tide736.net/tide_image.php?pc={pc}&hc={hc}&yr={yr}&mn={mn}&dy={dy}"
-                    f"&rg=day&w=768&h=512&lc=blue&gcs=cyan&gcf=blue&ld=on&ttd=on&tsmd=on"
-                )
-                response_data["image_url"] = image_url
+                tide_date = datetime(yr, mn, dy).strftime("%Y-%m-%d")
+                response_data["image_url"] = url_for("tide.tide_image", pc=pc, hc=hc, date=tide_date)
             except (ValueError, AttributeError):
                 pass
 
-    # 2. Weather & Cloud Data
-    # 緯度・経度と日付を元に、Open-Meteo API で対象地点の21時の天気と星空指数を取得する。
+    # 2〜3. 天気 (Open-Meteo へのHTTP取得) と太陽・月 (Skyfield の計算) は互いに独立しているため、
+    # スレッドプールで同時に実行する。締め切りに間に合わなかった項目は None のまま返す。
     from models.weather import get_weather_by_coords
-    weather_data = get_weather_by_coords(lat, lng, date_str)
-    if weather_data:
-        response_data["weather"] = weather_data
-        
-    # 3. Sun & Moon Data
-    # 同様の座標情報と日付から、日の出・日の入りの時間や、月の出・月の入り・月齢などの天文現象を天体力学的に計算する。
     from models.astro_calc import get_sun_events_by_coords, get_moon_data_by_coords
-    sun_data = get_sun_events_by_coords(lat, lng, date_str)
-    moon_data = get_moon_data_by_coords(lat, lng, date_str)
-    
-    if sun_data:
-        response_data["sun"] = sun_data
-    if moon_data:
-        response_data["moon"] = moon_data
+    from models.fanout import run_parallel, WEATHER_DEADLINE_SECONDS, ASTRO_DEADLINE_SECONDS
+    results, timed_out = run_parallel({
+        # 緯度・経度と日付を元に、Open-Meteo API で対象地点の21時の天気と星空指数を取得する。
+        "weather": (lambda: get_weather_by_coords(lat, lng, date_str), WEATHER_DEADLINE_SECONDS),
+        # 日の出・日の入りの時間や、月の出・月の入り・月齢などの天文現象を天体力学的に計算する。
+        "sun": (lambda: get_sun_events_by_coords(lat, lng, date_str), ASTRO_DEADLINE_SECONDS),
+        "moon": (lambda: get_moon_data_by_coords(lat, lng, date_str), ASTRO_DEADLINE_SECONDS),
+    })
+    weather_data = results["weather"]
+    response_data.update(results)
+    if timed_out:
+        response_data["timed_out"] = timed_out
 
-    return jsonify(response_data)
+    from models.weather import weather_cache_headers
+    response = jsonify(response_data)
+    response.headers.update(weather_cache_headers(weather_data))
+    return response
@@ -4,9 +4,10 @@ import sqlite3
 from flask import Blueprint, render_template, request, jsonify
 from datetime import datetime
 from werkzeug.utils import secure_filename
-from models.weather import get_weather_by_coords
+from models.weather import get_weather_by_coords, weather_cache_headers
 from models.astro_calc import get_sun_events_by_coords, get_moon_data_by_coords
 from models.spots_utils import estimate_bortle_scale
+from models.fanout import run_parallel, WEATHER_DEADLINE_SECONDS, ASTRO_DEADLINE_SECONDS
 from database import get_moon_db
 
 spots_bp = Blueprint('spots', __name__)
@@ -85,14 +86,17 @@ def get_spot_weather():
         return jsonify({"error": "Missing parameters"}), 400
 
     try:
-        weather = get_weather_by_coords(lat, lng, date_str)
-        sun = get_sun_events_by_coords(lat, lng, date_str)
-        moon = get_moon_data_by_coords(lat, lng, date_str)
-
-        return jsonify({
-            "weather": weather,
-            "sun": sun,
-            "moon": moon
+        # 天気のHTTP取得と太陽・月の計算を同時に実行し、締め切りに間に合わない項目は None で返す
+        results, timed_out = run_parallel({
+            "weather": (lambda: get_weather_by_coords(lat, lng, date_str), WEATHER_DEADLINE_SECONDS),
+            "sun": (lambda: get_sun_events_by_coords(lat, lng, date_str), ASTRO_DEADLINE_SECONDS),
+            "moon": (lambda: get_moon_data_by_coords(lat, lng, date_str), ASTRO_DEADLINE_SECONDS),
         })
+        if timed_out:
+            results["timed_out"] = timed_out
+
+        response = jsonify(results)
+        response.headers.update(weather_cache_headers(results["weather"]))
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, redirect, send_file, url_for, abort, make_response
+import os
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
+from database import get_moon_db
+from models.geo import get_port_index
+from models.tide_images import get_image, upstream_url, cache_headers
 
 tide_bp = Blueprint('tide', __name__)
 
@@ -12,18 +16,6 @@ with open("data/pc_hc.json", "r", encoding="utf-8") as f:
 with open("data/region_coordinates.json", "r", encoding="utf-8") as f:
     region_coords = json.load(f)
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    import math
-    # Simple hauling distance formula (good enough for this)
-    R = 6371 # Earth radius in km
-    dLat = math.radians(lat2 - lat1)
-    dLon = math.radians(lon2 - lon1)
-    a = math.sin(dLat/2) * math.sin(dLat/2) + \
-        math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
-        math.sin(dLon/2) * math.sin(dLon/2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
 @tide_bp.route("/tide")
 def tide():
     return render_template(
@@ -47,14 +39,39 @@ def get_image_url():
 
     try:
         yr, mn, dy = map(int, date.split("-"))
-    except ValueError:
+        date_str = datetime(yr, mn, dy).strftime("%Y-%m-%d")
+        pc, hc = int(pc), int(hc)
+    except (ValueError, TypeError, AttributeError):
         return jsonify({"error": "Invalid date format"}), 400
 
-    image_url = (
-        f"https://api.tide736.net/tide_image.php?pc={pc}&hc={hc}&yr={yr}&mn={mn}&dy={dy}"
-        f"&rg=day&w=768&h=512&lc=blue&gcs=cyan&gcf=blue&ld=on&ttd=on&tsmd=on"
-    )
-    return jsonify({"image_url": image_url})
+    # タイドグラフ画像はサーバー側でキャッシュしたもの (/tide_image) を配信する
+    image_url = url_for("tide.tide_image", pc=pc, hc=hc, date=date_str)
+    chart_url = url_for("tide.tide_chart", pc=pc, hc=hc, date=date_str)
+    return jsonify({"image_url": image_url, "chart_url": chart_url})
+
+@tide_bp.route("/tide_image/<int:pc>/<int:hc>/<date>")
+def tide_image(pc, hc, date):
+    """
+    tide736.net のタイドグラフ画像を、ディスクキャッシュ (models.tide_images) から配信する。
+    未取得なら一度だけ取得して保存し、取得できなければ tide736.net の画像へリダイレクトする。
+    """
+    try:
+        date_str = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        abort(404)
+    if str(hc) not in pc_hc.get(str(pc), {}).get("ports", {}):
+        abort(404)
+
+    entry = get_image(get_moon_db(), pc, hc, date_str)
+    if entry is None:
+        response = redirect(upstream_url(pc, hc, date_str))
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    response = send_file(os.path.abspath(entry["path"]), mimetype=entry["content_type"],
+                         etag=entry["sha256"], conditional=True)
+    response.headers.update(cache_headers())
+    return response
 
 @tide_bp.route("/get_nearest_port", methods=["POST"])
 def get_nearest_port():
@@ -65,15 +82,51 @@ def get_nearest_port():
     if user_lat is None or user_lng is None:
         return jsonify({"error": "Missing coordinates"}), 400
 
-    min_dist = float('inf')
-    nearest_pc = None
-    nearest_hc = None
-
-    for pc, info in region_coords.items():
-        dist = calculate_distance(user_lat, user_lng, info['lat'], info['lng'])
-        if dist < min_dist:
-            min_dist = dist
-            nearest_pc = int(pc)
-            nearest_hc = int(info['hc'])
+    # region_coordinates.json の地点の索引 (models.geo) で最寄りの港を探す
+    port, _ = get_port_index().nearest_key(float(user_lat), float(user_lng))
+    nearest_pc, nearest_hc = port if port is not None else (None, None)
 
     return jsonify({"pc": nearest_pc, "hc": nearest_hc})
+
+@tide_bp.route("/tide_chart/<int:pc>/<int:hc>/<date>")
+def tide_chart(pc, hc, date):
+    """
+    その日の夜 (15時〜翌10時) の星空指数・暗い時間帯を1本の時間軸に描いた SVG を返す。
+    天気と太陽は地域 (pc) の代表地点の値を使い、計算・取得できなかったものは描かずに返す。
+    潮位は tide736.net のタイドグラフ画像で表示する。SVG は入力のハッシュでキャッシュし、ETag にも使う。
+    """
+    from models.charts import get_chart
+    from models.weather import get_weather_by_coords
+    from models.astro_calc import get_sun_events_by_coords
+
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d")
+        next_date = (day + timedelta(days=1)).strftime("%Y-%m-%d")
+    except (ValueError, OverflowError):
+        abort(404)
+    if str(hc) not in pc_hc.get(str(pc), {}).get("ports", {}):
+        abort(404)
+    date_str = day.strftime("%Y-%m-%d")
+
+    weather = sun = next_sun = None
+    region = region_coords.get(str(pc))
+    if region is not None:
+        lat, lng = region["lat"], region["lng"]
+        try:
+            weather = get_weather_by_coords(lat, lng, date_str)
+        except Exception as e:
+            print(f"Tide chart weather error: {e}")
+        # 天体暦の範囲外の日付などで計算できなければ、薄明・暗い時間帯の帯を描かない
+        try:
+            sun = get_sun_events_by_coords(lat, lng, date_str)
+            next_sun = get_sun_events_by_coords(lat, lng, next_date)
+        except Exception as e:
+            print(f"Tide chart sun error: {e}")
+            sun = next_sun = None
+
+    svg, key = get_chart(date_str, weather, sun, next_sun)
+    response = make_response(svg)
+    response.mimetype = "image/svg+xml"
+    response.set_etag(key)
+    response.headers["Cache-Control"] = "public, max-age=600"
+    return response.make_conditional(request)
@@ -0,0 +1,83 @@
+"""
+Open-Meteo の forecast / archive API を模したローカルのスタブサーバー。
+外部APIに接続せずに天気取得・一括更新の動作確認を行うために使用します。
+
+    python stub_open_meteo.py --port 8765
+    OPEN_METEO_FORECAST_URL=http://127.0.0.1:8765/v1/forecast \\
+    OPEN_METEO_ARCHIVE_URL=http://127.0.0.1:8765/v1/archive flask --app app weather refresh
+"""
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+def build_location(lat, lng, start_date, end_date):
+    """緯度経度と日付から決まる、再現性のある疑似的な毎時データを作る"""
+    times, cloud_covers, weather_codes = [], [], []
+    current = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+    seed = int(abs(lat) * 100 + abs(lng) * 10)
+    while current < end:
+        cloud = (seed + current.day * 7 + current.hour * 13) % 101
+        times.append(current.strftime('%Y-%m-%dT%H:%M'))
+        cloud_covers.append(cloud)
+        weather_codes.append(0 if cloud < 20 else 1 if cloud < 50 else 2 if cloud < 80 else 3)
+        current += timedelta(hours=1)
+    return {
+        "latitude": lat,
+        "longitude": lng,
+        "timezone": "Asia/Tokyo",
+        "hourly_units": {"time": "iso8601", "cloud_cover": "%", "weather_code": "wmo code"},
+        "hourly": {"time": times, "cloud_cover": cloud_covers, "weather_code": weather_codes},
+    }
+
+class StubHandler(BaseHTTPRequestHandler):
+    request_count = 0
+    # 応答までの遅延 (秒)。実際のAPIの応答時間を模擬する
+    delay = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in ('/v1/forecast', '/v1/archive'):
+            self.send_error(404)
+            return
+
+        params = parse_qs(url.query)
+        lats = [float(v) for v in params['latitude'][0].split(',')]
+        lngs = [float(v) for v in params['longitude'][0].split(',')]
+        if 'forecast_days' in params:
+            # 予報期間指定: 今日から forecast_days 日分
+            start_date = datetime.now().strftime('%Y-%m-%d')
+            end_date = (datetime.now() + timedelta(days=int(params['forecast_days'][0]) - 1)).strftime('%Y-%m-%d')
+        else:
+            start_date = params['start_date'][0]
+            end_date = params['end_date'][0]
+
+        locations = [build_location(lat, lng, start_date, end_date) for lat, lng in zip(lats, lngs)]
+        # 実際の API と同様、1地点ならオブジェクト、複数地点なら配列で返す
+        body = json.dumps(locations[0] if len(locations) == 1 else locations).encode('utf-8')
+
+        StubHandler.request_count += 1
+        time.sleep(StubHandler.delay)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"[stub #{StubHandler.request_count}] {self.command} {self.path[:120]}")
+
+def make_server(port=8765, delay=0.0):
+    StubHandler.delay = delay
+    return ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Open-Meteo stub server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='応答までの遅延 (秒)')
+    args = parser.parse_args()
+    print(f"Open-Meteo stub listening on http://127.0.0.1:{args.port}")
+    make_server(args.port, args.delay).serve_forever()